@@ -20,6 +20,7 @@ __docformat__ = 'restructuredtext'
 # don't leak the world
 __all__ = ['Hyperalignment']
 
+import threading
 from mvpa2.support.copy import deepcopy
 
 import numpy as np
@@ -31,6 +32,7 @@ from mvpa2.datasets import Dataset
 from mvpa2.mappers.base import ChainMapper
 from mvpa2.mappers.zscore import zscore, ZScoreMapper
 from mvpa2.mappers.staticprojection import StaticProjectionMapper
+from mvpa2.misc.support import parallel_map
 
 if __debug__:
     from mvpa2.base import debug
@@ -67,6 +69,15 @@ class Hyperalignment(ClassWithCollections):
     high-dimensional model of the representational space in human ventral
     temporal cortex.*
 
+    With many datasets memory rather than CPU is the limiting factor.  The
+    per-dataset alignments of the 2nd and 3rd level are independent of each
+    other and can be computed by `nproc` threads.  With the default
+    `combiner2` the common space is aggregated as a running sum, and
+    projections are recomputed from the trained mappers instead of being
+    stored.  Any dataset can also be passed as the name of an HDF5 file (see
+    :func:`~mvpa2.base.hdf5.h5save`) to have it loaded only when it is
+    needed.
+
     Examples
     --------
     >>> # get some example data
@@ -155,6 +166,11 @@ class Hyperalignment(ClassWithCollections):
             updated common space, and is subsequently called again after each
             2nd-level iteration.""")
 
+    nproc = Parameter(1, allowedtype='None or int', min=1,
+            doc="""Number of threads to compute the alignments of individual
+            datasets in the 2nd and 3rd level with. If None -- as many as
+            there are cores.""")
+
 
     def __init__(self, **kwargs):
         ClassWithCollections.__init__(self, **kwargs)
@@ -166,7 +182,7 @@ class Hyperalignment(ClassWithCollections):
 
         Parameters
         ----------
-        datasets : sequence of datasets
+        datasets : sequence of datasets or HDF5 filenames
 
         Returns
         -------
@@ -175,9 +191,7 @@ class Hyperalignment(ClassWithCollections):
         params = self.params            # for quicker access ;)
         ca = self.ca
         ndatasets = len(datasets)
-        nfeatures = [ds.nfeatures for ds in datasets]
-        alpha = params.alpha
-        
+
         residuals = None
         if ca['training_residual_errors'].enabled:
             residuals = np.zeros((1 + params.level2_niter, ndatasets))
@@ -192,7 +206,7 @@ class Hyperalignment(ClassWithCollections):
                   % (self, ndatasets))
 
         if params.ref_ds is None:
-            ref_ds = np.argmax(nfeatures)
+            ref_ds = np.argmax([self._load(ds).nfeatures for ds in datasets])
         else:
             ref_ds = params.ref_ds
             if ref_ds < 0 and ref_ds >= ndatasets:
@@ -200,33 +214,19 @@ class Hyperalignment(ClassWithCollections):
                       "bounds. We have only %i datasets provided" \
                       % (ref_ds, ndatasets)
         ca.choosen_ref_ds = ref_ds
-        # zscore all data sets
-        # ds = [ zscore(ds, chunks_attr=None) for ds in datasets]
 
         # TODO since we are doing in-place zscoring create deep copies
         # of the datasets with pruned targets and shallow copies of
         # the collections (if they would come needed in the transformation)
         # TODO: handle floats and non-floats differently to prevent
         #       waste of memory if there is no need (e.g. no z-scoring)
-        #otargets = [ds.sa.targets for ds in datasets]
-        datasets = [ds.copy(deep=False) for ds in datasets]
-        #datasets = [Dataset(ds.samples.astype(float), sa={'targets': [None] * len(ds)})
-        #datasets = [Dataset(ds.samples, sa={'targets': [None] * len(ds)})
-        #            for ds in datasets]
-
-        if params.zscore_all:
-            if __debug__:
-                debug('HPAL', "Z-scoring all datasets")
-            for ids in xrange(len(datasets)):
-                zmapper = ZScoreMapper(chunks_attr=None)
-                zmapper.train(datasets[ids])
-                datasets[ids] = zmapper.forward(datasets[ids])
-
-        if alpha < 1:
-            datasets, wmappers = self._regularize(datasets, alpha)
+        # datasets stored on disk get loaded and preprocessed on demand
+        datasets = [isinstance(ds, basestring) and ds
+                        or self._preprocess(ds.copy(deep=False))[0]
+                    for ds in datasets]
 
         # initial common space is the reference dataset
-        commonspace = datasets[ref_ds].samples
+        commonspace = self._get_dataset(datasets[ref_ds]).samples
         # the reference dataset might have been zscored already, don't do it
         # twice
         if params.zscore_common and not params.zscore_all:
@@ -244,13 +244,13 @@ class Hyperalignment(ClassWithCollections):
         #
         # Level 1 -- initial projection
         #
-        lvl1_projdata = self._level1(datasets, commonspace, ref_ds, mappers,
-                                     residuals)
+        commonspace = self._level1(datasets, commonspace, ref_ds, mappers,
+                                   residuals)
         #
         # Level 2 -- might iterate multiple times
         #
         # this is the final common space
-        self.commonspace = self._level2(datasets, lvl1_projdata, mappers,
+        self.commonspace = self._level2(datasets, commonspace, mappers,
                                         residuals)
 
 
@@ -259,7 +259,7 @@ class Hyperalignment(ClassWithCollections):
 
         Parameters
         ----------
-        datasets : sequence of datasets
+        datasets : sequence of datasets or HDF5 filenames
 
         Returns
         -------
@@ -268,88 +268,107 @@ class Hyperalignment(ClassWithCollections):
         if self.commonspace is None:
             self.train(datasets)
 
-        # place datasets into a copy of the list since items
-        # will be reassigned
-        datasets = list(datasets)
-
-        params = self.params            # for quicker access ;)
-        alpha = params.alpha             # for letting me be lazy ;)
-        if params.zscore_all:
-            if __debug__:
-                debug('HPAL', "Z-scoring all datasets")
-            # zscore them once while storing corresponding ZScoreMapper's
-            # so we can assemble a comprehensive mapper at the end
-            # (together with procrustes)
-            zmappers = []
-            for ids in xrange(len(datasets)):
-                zmapper = ZScoreMapper(chunks_attr=None)
-                zmappers.append(zmapper)
-                zmapper.train(datasets[ids])
-                datasets[ids] = zmapper.forward(datasets[ids])
-
-        if alpha < 1:
-            datasets, wmappers = self._regularize(datasets, alpha)
-
         #
         # Level 3 -- final, from-scratch, alignment to final common space
         #
-        mappers = self._level3(datasets)
         # return trained mappers for projection from all datasets into the
         # common space
-        if params.zscore_all:
-            # We need to construct new mappers which would chain
-            # zscore and then final transformation
-            if params.alpha < 1:
-                return [ChainMapper([zm, wm, m]) for zm, wm, m in zip(zmappers, wmappers, mappers)]
-            else:
-                return [ChainMapper([zm, m]) for zm, m in zip(zmappers, mappers)]
-        else:
-            if params.alpha < 1:
-                return [ChainMapper([wm, m]) for wm, m in zip(wmappers, mappers)]
-            else:
-                return mappers
+        return self._level3(datasets)
+
 
+    def _load(self, ds):
+        """Return a dataset, loading it from an HDF5 file if necessary"""
+        if isinstance(ds, basestring):
+            from mvpa2.base.hdf5 import h5load
+            if __debug__:
+                debug('HPAL_', "Loading dataset from %s" % ds)
+            ds = h5load(ds)
+        return ds
 
-    def _regularize(self, datasets, alpha):
+
+    def _get_dataset(self, ds):
+        """Return a preprocessed dataset, loading it if necessary"""
+        if isinstance(ds, basestring):
+            ds = self._preprocess(self._load(ds))[0]
+        return ds
+
+
+    def _preprocess(self, ds):
+        """Z-score and regularize a dataset as configured.
+
+        Returns the preprocessed dataset and the list of mappers applied to
+        it.
+        """
+        params = self.params            # for quicker access ;)
+        mappers = []
+        if params.zscore_all:
+            if __debug__:
+                debug('HPAL_', "Z-scoring dataset")
+            zmapper = ZScoreMapper(chunks_attr=None)
+            zmapper.train(ds)
+            ds = zmapper.forward(ds)
+            mappers.append(zmapper)
+        if params.alpha < 1:
+            ds, wmapper = self._regularize(ds, params.alpha)
+            mappers.append(wmapper)
+        return ds, mappers
+
+
+    def _regularize(self, ds, alpha):
         if __debug__:
             debug('HPAL', "Using regularized hyperalignment with alpha of %d"
                     % alpha)
-        wmappers = []
-        for ids in xrange(len(datasets)):
-            U, S, Vh = np.linalg.svd(datasets[ids])
-            S = 1/np.sqrt( (1-alpha)*np.square(S) + alpha )
-            S.resize(len(Vh))
-            S = np.matrix(np.diag(S))
-            W = np.matrix(Vh.T)*S*np.matrix(Vh)
-            wmapper = StaticProjectionMapper(proj=W)
-            wmappers.append(wmapper)
-            datasets[ids] = wmapper.forward(datasets[ids])
-        return datasets, wmappers
+        U, S, Vh = np.linalg.svd(ds)
+        S = 1/np.sqrt( (1-alpha)*np.square(S) + alpha )
+        S.resize(len(Vh))
+        S = np.matrix(np.diag(S))
+        W = np.matrix(Vh.T)*S*np.matrix(Vh)
+        wmapper = StaticProjectionMapper(proj=W)
+        return wmapper.forward(ds), wmapper
+
+
+    def _align(self, mapper, ds, commonspace):
+        """Train a mapper to align a dataset with the common space"""
+        # assign common space to ``space`` of the mapper, because this is
+        # where it will be looking for it -- on a shallow copy, since the
+        # very same dataset might be aligned concurrently
+        ds = ds.copy(deep=False)
+        ds.sa[mapper.get_space()] = commonspace
+        mapper.train(ds)
+
+
+    def _project(self, mapper, ds):
+        """Project a dataset into the common space"""
+        if not mapper.is_trained:
+            # reference dataset of the 1st level
+            return ds.samples
+        proj = mapper.forward(ds.samples)
+        if self.params.zscore_common:
+            zscore(proj, chunks_attr=None)
+        return proj
+
+
+    def _get_aggregator(self):
+        """Return an aggregator of projections into a new common space"""
+        params = self.params            # for quicker access ;)
+        if params['combiner2'].is_default:
+            # averaging can be done on the fly
+            return _Aggregator()
+        return _Aggregator(params.combiner2)
 
 
     def _level1(self, datasets, commonspace, ref_ds, mappers, residuals):
         params = self.params            # for quicker access ;)
-        data_mapped = [ds.samples for ds in datasets]
-        for i, (m, ds_new) in enumerate(zip(mappers, datasets)):
+        for i, m in enumerate(mappers):
             if __debug__:
                 debug('HPAL_', "Level 1: ds #%i" % i)
             if i == ref_ds:
                 continue
-            # assign common space to ``space`` of the mapper, because this is
-            # where it will be looking for it
-            ds_new.sa[m.get_space()] = commonspace
+            ds_new = self._get_dataset(datasets[i])
             # find transformation of this dataset into the current common space
-            m.train(ds_new)
-            # remove common space attribute again to save on memory when the
-            # common space is updated for the next iteration
-            del ds_new.sa[m.get_space()]
+            self._align(m, ds_new, commonspace)
             # project this dataset into the current common space
-            ds_ = m.forward(ds_new.samples)
-            if params.zscore_common:
-                zscore(ds_, chunks_attr=None)
-            # replace original dataset with mapped one -- only the reference
-            # dataset will remain unchanged
-            data_mapped[i] = ds_
+            ds_ = self._project(m, ds_new)
 
             # compute first-level residuals wrt to the initial common space
             if residuals is not None:
@@ -363,15 +382,17 @@ class Hyperalignment(ClassWithCollections):
             commonspace = params.combiner1(ds_, commonspace)
             if params.zscore_common:
                 zscore(commonspace, chunks_attr=None)
-        return data_mapped
+
+        # aggregate all processed 1st-level datasets into a new 2nd-level
+        # common space -- only the reference dataset remains unprojected
+        aggregator = self._get_aggregator()
+        for i, (m, ds) in enumerate(zip(mappers, datasets)):
+            aggregator.add(i, self._project(m, self._get_dataset(ds)))
+        return aggregator.get()
 
 
-    def _level2(self, datasets, lvl1_data, mappers, residuals):
+    def _level2(self, datasets, commonspace, mappers, residuals):
         params = self.params            # for quicker access ;)
-        data_mapped = lvl1_data
-        # aggregate all processed 1st-level datasets into a new 2nd-level
-        # common space
-        commonspace = params.combiner2(data_mapped)
 
         # XXX Why is this commented out? Who knows what combiner2 is doing and
         # whether it changes the distribution of the data
@@ -380,39 +401,42 @@ class Hyperalignment(ClassWithCollections):
 
         ndatasets = len(datasets)
         for loop in xrange(params.level2_niter):
-            # 2nd-level alignment starts from the original/unprojected datasets
-            # again
-            for i, (m, ds_new) in enumerate(zip(mappers, datasets)):
+            # the common space of this iteration is not altered before all
+            # datasets are aligned to it, hence they can be processed in
+            # parallel while aggregating the new common space on the fly
+            aggregator = self._get_aggregator()
+
+            def align(i):
                 if __debug__:
-                    debug('HPAL_', "Level 2 (%i-th iteration): ds #%i" % (loop, i))
+                    debug('HPAL_',
+                          "Level 2 (%i-th iteration): ds #%i" % (loop, i))
+                m = mappers[i]
+                # 2nd-level alignment starts from the original/unprojected
+                # datasets again
+                ds_new = self._get_dataset(datasets[i])
 
                 # Optimization speed up heuristic
                 # Slightly modify the common space towards other feature
                 # spaces and reduce influence of this feature space for the
                 # to-be-computed projection
-                temp_commonspace = (commonspace * ndatasets - data_mapped[i]) \
+                temp_commonspace = (commonspace * ndatasets
+                                    - self._project(m, ds_new)) \
                                     / (ndatasets - 1)
 
                 if params.zscore_common:
                     zscore(temp_commonspace, chunks_attr=None)
-                # assign current common space
-                ds_new.sa[m.get_space()] = temp_commonspace
                 # retrain the mapper for this dataset
-                m.train(ds_new)
-                # remove common space attribute again to save on memory when the
-                # common space is updated for the next iteration
-                del ds_new.sa[m.get_space()]
+                self._align(m, ds_new, temp_commonspace)
                 # obtain the 2nd-level projection
-                ds_ =  m.forward(ds_new.samples)
-                if params.zscore_common:
-                    zscore(ds_, chunks_attr=None)
-                # store for 2nd-level combiner
-                data_mapped[i] = ds_
+                ds_ = self._project(m, ds_new)
                 # compute residuals
                 if residuals is not None:
                     residuals[1+loop, i] = np.linalg.norm(ds_ - commonspace)
+                # pass on to the 2nd-level combiner
+                aggregator.add(i, ds_)
 
-            commonspace = params.combiner2(data_mapped)
+            parallel_map(align, range(ndatasets), nproc=params.nproc)
+            commonspace = aggregator.get()
 
         # and again
         if params.zscore_common:
@@ -424,8 +448,6 @@ class Hyperalignment(ClassWithCollections):
 
     def _level3(self, datasets):
         params = self.params            # for quicker access ;)
-        # create a mapper per dataset
-        mappers = [deepcopy(params.alignment) for ds in datasets]
 
         # key different from level-2; the common space is uniform
         #temp_commonspace = commonspace
@@ -435,21 +457,68 @@ class Hyperalignment(ClassWithCollections):
             residuals = np.zeros((1, len(datasets)))
             self.ca.residual_errors = Dataset(samples=residuals)
 
-        # start from original input datasets again
-        for i, (m, ds_new) in enumerate(zip(mappers, datasets)):
+        def align(i):
             if __debug__:
                 debug('HPAL_', "Level 3: ds #%i" % i)
-
-            # retrain mapper on final common space
-            ds_new.sa[m.get_space()] = self.commonspace
-            m.train(ds_new)
-            # remove common space attribute again to save on memory
-            del ds_new.sa[m.get_space()]
+            # start from original input datasets again, with the
+            # preprocessing mappers to be prepended to the final one
+            ds_new, mappers = self._preprocess(self._load(datasets[i]))
+            # create a mapper and train it on the final common space
+            m = deepcopy(params.alignment)
+            self._align(m, ds_new, self.commonspace)
 
             if residuals is not None:
                 # obtain final projection
                 data_mapped = m.forward(ds_new.samples)
                 residuals[0, i] = np.linalg.norm(data_mapped - self.commonspace)
 
-        return mappers
+            if len(mappers):
+                # chain zscore and/or regularization and then the final
+                # transformation
+                return ChainMapper(mappers + [m])
+            return m
+
+        return parallel_map(align, range(len(datasets)), nproc=params.nproc)
 
+
+
+class _Aggregator(object):
+    """Thread-safe collection of projections for a common space combiner.
+    """
+    def __init__(self, combiner=None):
+        """
+        Parameters
+        ----------
+        combiner : callable or None
+          Called with the sequence of all projections (in the order of the
+          datasets) to compute the common space.  If None, projections are
+          averaged by keeping a running sum only.
+        """
+        self._combiner = combiner
+        self._lock = threading.Lock()
+        self._projections = {}
+        self._sum = None
+        self._count = 0
+
+
+    def add(self, i, proj):
+        """Add the projection of the `i`-th dataset"""
+        self._lock.acquire()
+        try:
+            if self._combiner is not None:
+                self._projections[i] = proj
+            elif self._sum is None:
+                self._sum = np.array(proj, dtype=float)
+            else:
+                self._sum += proj
+            self._count += 1
+        finally:
+            self._lock.release()
+
+
+    def get(self):
+        """Return the common space"""
+        if self._combiner is not None:
+            return self._combiner([self._projections[i]
+                                   for i in sorted(self._projections)])
+        return self._sum / self._count
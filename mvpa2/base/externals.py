@@ -126,7 +126,7 @@ def __check_pywt(features=None):
     ----------
     features : list of str
       List of known features to check such as 'wp reconstruct',
-      'wp reconstruct fixed'
+      'wp reconstruct fixed', 'dwt axis'
     """
     import pywt
     import numpy as np
@@ -137,6 +137,14 @@ def __check_pywt(features=None):
                      0.49598417,  0.39935064,  0.26370727,  0.05572373,  0.40194438,
                      0.47004551,  0.60327258,  0.25628266,  0.32964893,  0.24009889,])
     mode = 'per'
+    if 'dwt axis' in features:
+        try:
+            pywt.dwt(np.vstack((data, data)), 'sym2', mode, axis=-1)
+        except TypeError:
+            raise ImportError, \
+                  "pywt.dwt does not support transformation along an axis"
+        if len(features) == 1:
+            return True
     wp = pywt.WaveletPacket(data, 'sym2', mode)
     wp2 = pywt.WaveletPacket(data=None, wavelet='sym2', mode=mode)
     try:
@@ -510,6 +518,7 @@ _KNOWN = {'libsvm':'import mvpa2.clfs.libsvmc._svm as __; x=__.seq_to_svm_node',
           'pywt': "import pywt as __",
           'pywt wp reconstruct': "__check_pywt(['wp reconstruct'])",
           'pywt wp reconstruct fixed': "__check_pywt(['wp reconstruct fixed'])",
+          'pywt dwt axis': "__check_pywt(['dwt axis'])",
           #'rpy': "__check_rpy()",
           'rpy2': "__check_rpy2()",
           'lars': "exists('rpy2', raise_='always');" \
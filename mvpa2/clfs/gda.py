@@ -215,6 +215,76 @@ class LDA(GDA):
         return np.dot(data, self._w) + self._b
 
 
+    def predict_candidates(self, train, test, selected, candidates):
+        """Predict `test` for every candidate feature set.
+
+        Every candidate feature set consists of all `selected` features plus
+        a single feature from `candidates`.  Its pooled covariance borders
+        the one of the selected features by a single row and column, hence
+        the decision function of every candidate follows from the one of
+        the selected features by a rank-one update (Schur complement)
+        without inverting a covariance matrix per candidate.
+
+        Returns
+        -------
+        array
+          Predictions with one row per candidate.
+        """
+        targets_sa = train.sa[self.get_space()]
+        labels = targets_sa.value
+        ulabels = targets_sa.unique
+        nlabels = len(ulabels)
+        nselected = len(selected)
+
+        ids = list(selected) + list(candidates)
+        X = train.samples[:, ids]
+        means = np.zeros((nlabels, len(ids)))
+        nsamples_per_class = np.zeros((nlabels, 1))
+        Xdm = np.empty(X.shape)
+        for il, l in enumerate(ulabels):
+            mask = labels == l
+            nsamples_per_class[il] = np.sum(mask)
+            means[il] = np.mean(X[mask], axis=0)
+            Xdm[mask] = X[mask] - means[il]
+        priors = self._get_priors(nlabels, len(X), nsamples_per_class)
+        norm = len(X) - nlabels
+
+        Xdm_s, Xdm_c = Xdm[:, :nselected], Xdm[:, nselected:]
+        means_s, means_c = means[:, :nselected], means[:, nselected:]
+        # pooled covariance of the selected features and its border
+        cov_ss = np.dot(Xdm_s.T, Xdm_s) / norm
+        cov_sc = np.dot(Xdm_s.T, Xdm_c) / norm
+        var_c = np.sum(Xdm_c**2, axis=0) / norm
+        if nselected:
+            try:
+                a = np.linalg.solve(cov_ss, cov_sc)
+                w = np.linalg.solve(cov_ss, means_s.T)
+            except np.linalg.LinAlgError, e:
+                raise DegenerateInputError, \
+                      "Data is probably singular, since inverse fails. Got %s"\
+                      % (e,)
+        else:
+            # LAPACK does not like empty systems
+            a = np.zeros(cov_sc.shape)
+            w = np.zeros(means_s.T.shape)
+        # Schur complements for every candidate
+        schur = var_c - np.sum(cov_sc * a, axis=0)
+
+        data = test.samples[:, ids]
+        data_s, data_c = data[:, :nselected], data[:, nselected:]
+        # decision function of the selected features (sample x class)
+        g = np.dot(data_s, w) - 0.5 * np.sum(means_s * w.T, axis=1) \
+            + np.log(priors)
+        # residuals of candidates not explained by the selected features
+        rdata = data_c - np.dot(data_s, a)
+        rmeans = means_c - np.dot(means_s, a)
+        # sample x class x candidate
+        g = g[:, :, np.newaxis] \
+            + (rdata[:, np.newaxis] * rmeans - 0.5 * rmeans**2) / schur
+        winners = g.argmax(axis=1)
+        return np.asanyarray(ulabels)[winners.T]
+
+
 class QDA(GDA):
     """Quadratic Discriminant Analysis.
     """
@@ -290,6 +290,37 @@ class GNB(Classifier):
         return predictions
 
 
+    def predict_candidates(self, train, test, selected, candidates):
+        """Predict `test` for every candidate feature set.
+
+        Every candidate feature set consists of all `selected` features plus
+        a single feature from `candidates`.  Since features are modeled
+        independently, a single training on all of them provides the
+        statistics for every candidate set, and the log-likelihoods of the
+        selected features get computed only once.
+
+        Returns
+        -------
+        array
+          Predictions with one row per candidate.
+        """
+        ids = list(selected) + list(candidates)
+        nselected = len(selected)
+        self.train(train[:, ids])
+
+        means = self.means[:, np.newaxis]
+        variances = self.variances[:, np.newaxis]
+        # log-likelihoods as class x sample x feature
+        lprob_csf = -0.5 * np.log(2 * np.pi * variances) \
+                    - 0.5 * (test.samples[:, ids] - means)**2 / variances
+        lprob_cs = lprob_csf[:, :, :nselected].sum(axis=2) \
+                   + np.log(self.priors[:, np.newaxis])
+        # class x sample x candidate
+        lprob_csc = lprob_cs[:, :, np.newaxis] + lprob_csf[:, :, nselected:]
+        winners = lprob_csc.argmax(axis=0)
+        return np.asanyarray(self.ulabels)[winners.T]
+
+
     # XXX Later come up with some
     #     could be a simple t-test maps using distributions
     #     per each class
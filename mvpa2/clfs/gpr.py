@@ -17,7 +17,7 @@ import numpy as np
 from mvpa2.base import externals, warning
 
 from mvpa2.base.state import ConditionalAttribute
-from mvpa2.clfs.base import Classifier, accepts_dataset_as_samples
+from mvpa2.clfs.base import Classifier
 from mvpa2.base.param import Parameter
 from mvpa2.kernels.np import SquaredExponentialKernel, GeneralizedLinearKernel, \
      LinearKernel
@@ -128,6 +128,17 @@ class GPR(Classifier):
         Increase this when the kernel matrix is not positive definite. If None,
         some regularization will be provided upon necessity""")
 
+    inducing = Parameter(None, min=1, allowedtype='None or int',
+        doc="""Number of inducing points for a low-rank approximation.
+        If None, the exact GPR is trained on the full kernel matrix.
+        Otherwise a random subset of that many training samples is used
+        as inducing points of a subset-of-regressors (Nystrom)
+        approximation, which brings training down to O(n m^2) time and
+        O(n m) memory for n samples and m inducing points.  The gradient
+        of the log marginal likelihood is not available for the
+        approximation, hence it cannot be used for gradient-based model
+        selection (e.g. the 'model_select' sensitivity analyzer).""")
+
 
     def __init__(self, kernel=None, **kwargs):
         """Initialize a GPR regression analysis.
@@ -180,12 +191,17 @@ class GPR(Classifier):
         To be used in constructor and untrain()
         """
         self._train_fv = None
+        self._train_ds = None
         self._labels = None
         self._km_train_train = None
         self._train_labels = None
         self._alpha = None
         self._L = None
         self._LL = None
+        # factors of the low-rank approximation (if `inducing` is used)
+        self._Lm = None
+        self._LB = None
+        self._lml_inducing = None
         # XXX EO: useful for model selection but not working in general
         # self.__kernel.reset()
         pass
@@ -204,6 +220,10 @@ class GPR(Classifier):
         """
         if __debug__:
             debug("GPR", "Computing log_marginal_likelihood")
+        if self._Lm is not None:
+            # was computed while training the low-rank approximation
+            self.ca.log_marginal_likelihood = self._lml_inducing
+            return self.ca.log_marginal_likelihood
         self.ca.log_marginal_likelihood = \
                                  -0.5*Ndot(self._train_labels, self._alpha) - \
                                   Nlog(self._L.diagonal()).sum() - \
@@ -216,6 +236,10 @@ class GPR(Classifier):
         version use a more compact formula provided by Williams and
         Rasmussen book.
         """
+        if self._Lm is not None:
+            raise ValueError(
+                "Gradient of the log marginal likelihood is not available "
+                "for GPR trained with inducing points")
         # XXX EO: check whether the precomputed self.alpha self.Kinv
         # are actually the ones corresponding to the hyperparameters
         # used to compute this gradient!
@@ -252,6 +276,10 @@ class GPR(Classifier):
         hyperparameters are in logscale. This version use a more
         compact formula provided by Williams and Rasmussen book.
         """
+        if self._Lm is not None:
+            raise ValueError(
+                "Gradient of the log marginal likelihood is not available "
+                "for GPR trained with inducing points")
         # Kinv = np.linalg.inv(self._C)
         # Faster:
         Kinv = SLcho_solve(self._LL, np.eye(self._L.shape[0]))
@@ -299,6 +327,11 @@ class GPR(Classifier):
         if flavor == 'linear':
             return GPRLinearWeights(self, **kwargs)
         elif flavor == 'model_select':
+            if self.params.inducing is not None:
+                raise ValueError(
+                    "model_select flavor relies on the gradient of the log "
+                    "marginal likelihood, which is not available for GPR "
+                    "with inducing points")
             # sanity check
             if not ('has_sensitivity' in self.__tags__):
                 raise ValueError, \
@@ -315,12 +348,16 @@ class GPR(Classifier):
 
         # local bindings for faster lookup
         params = self.params
+        if params.inducing is not None and params.inducing < len(data):
+            return self._train_inducing(data)
+        self._Lm = self._LB = self._lml_inducing = None
         retrainable = params.retrainable
         if retrainable:
             newkernel = False
             newL = False
             _changedData = self._changedData
 
+        self._train_ds = data
         self._train_fv = train_fv = data.samples
         # GRP relies on numerical labels
         # yoh: yeah -- GPR now is purely regression so no conversion
@@ -332,7 +369,8 @@ class GPR(Classifier):
                or _changedData.get('kernel_params', False):
             if __debug__:
                 debug("GPR", "Computing train train kernel matrix")
-            self.__kernel.compute(train_fv)
+            # pass the dataset itself so a CachedKernel could reuse values
+            self.__kernel.compute(data)
             self._km_train_train = km_train_train = asarray(self.__kernel)
             newkernel = True
             if retrainable:
@@ -425,7 +463,75 @@ class GPR(Classifier):
         pass
 
 
-    @accepts_dataset_as_samples
+    def _train_inducing(self, data):
+        """Train the subset-of-regressors approximation of GPR.
+
+        Only the n x m cross-kernel between training samples and inducing
+        points and the m x m kernel among inducing points are computed.
+        Predictive means use the same code path as the exact GPR, with
+        inducing points taking the place of the training samples.
+        """
+        params = self.params
+        train_fv = data.samples
+        train_labels = data.sa[self.get_space()].value
+        self._train_labels = train_labels
+        nsamples = len(train_fv)
+        s2 = params.sigma_noise ** 2
+
+        # random subset of the training samples serves as inducing points
+        ids = np.sort(np.random.permutation(nsamples)[:params.inducing])
+        self._train_ds = inducing = data[ids]
+        self._train_fv = inducing.samples
+        if __debug__:
+            debug("GPR", "Computing kernel matrices for %d inducing points"
+                  % len(ids))
+        self.__kernel.compute(inducing)
+        km_m = asarray(self.__kernel)
+        self.__kernel.compute(inducing, data)
+        km_mn = asarray(self.__kernel)
+        # there is no square train-train kernel to reuse any longer
+        self._km_train_train = None
+        self._km_train_test = None
+
+        try:
+            if params.lm is not None:
+                self._Lm = Lm = SLcholesky(
+                    km_m + params.lm * np.eye(len(km_m)), lower=True)
+            else:
+                self._Lm = Lm = _SLcholesky_autoreg(km_m, nsteps=None,
+                                                    lower=True)
+        except SLAError:
+            raise SLAError("Kernel matrix of inducing points is not "
+                           "positive, definite. Try increasing the lm "
+                           "parameter.")
+        # V = Lm^-1 K_mn, B = I + V V^T / sigma^2
+        V = SL.solve_triangular(Lm, km_mn, lower=True)
+        B = np.eye(len(Lm)) + Ndot(V, V.T) / s2
+        self._LB = LB = SLcholesky(B, lower=True)
+        Vy = Ndot(V, train_labels)
+        LBVy = SL.solve_triangular(LB, Vy, lower=True)
+        # weights of the inducing points (play the role of alpha)
+        self._alpha = SL.solve_triangular(
+            Lm, SL.solve_triangular(LB, LBVy, lower=True, trans=1),
+            lower=True, trans=1) / s2
+        self._L = self._LL = None
+
+        # Woodbury identity and matrix determinant lemma for Q + sigma^2 I
+        quad = (Ndot(train_labels, train_labels) - Ndot(LBVy, LBVy) / s2) / s2
+        self._lml_inducing = -0.5 * quad \
+                             - Nlog(LB.diagonal()).sum() \
+                             - 0.5 * nsamples * Nlog(s2) \
+                             - nsamples * _halflog2pi
+        if self.ca.is_enabled('log_marginal_likelihood'):
+            self.compute_log_marginal_likelihood()
+
+        if params.retrainable:
+            self.ca.retrained = False
+
+        if __debug__:
+            debug("GPR", "Done training with inducing points")
+
+
     def _predict(self, data):
         """
         Predict the output for the provided data.
@@ -437,7 +543,7 @@ class GPR(Classifier):
                or self._km_train_test is None:
             if __debug__:
                 debug('GPR', "Computing train test kernel matrix")
-            self.__kernel.compute(self._train_fv, data)
+            self.__kernel.compute(self._train_ds, data)
             km_train_test = asarray(self.__kernel)
             if retrainable:
                 self._km_train_test = km_train_test
@@ -468,18 +574,27 @@ class GPR(Classifier):
 
             if __debug__:
                 debug("GPR", "Computing predicted variances")
-            L = self._L
-            # v = NLAsolve(L, km_train_test)
-            # Faster:
-            piv = np.arange(L.shape[0])
-            v = SL.lu_solve((L.T, piv), km_train_test, trans=1)
-            # self.predicted_variances = \
-            #     Ndiag(km_test_test - Ndot(v.T, v)) \
-            #     + self.sigma_noise**2
-            # Faster formula: np.diag(Ndot(v.T, v)) = (v**2).sum(0):
-            ca.predicted_variances = Ndiag(km_test_test) - (v ** 2).sum(0) \
-                                       + self.params.sigma_noise ** 2
-            pass
+            if self._Lm is not None:
+                # deterministic training conditional (DTC) variances
+                W = SL.solve_triangular(self._Lm, km_train_test, lower=True)
+                U = SL.solve_triangular(self._LB, W, lower=True)
+                ca.predicted_variances = Ndiag(km_test_test) \
+                                         - (W ** 2).sum(0) \
+                                         + (U ** 2).sum(0) \
+                                         + self.params.sigma_noise ** 2
+            else:
+                L = self._L
+                # v = NLAsolve(L, km_train_test)
+                # Faster:
+                piv = np.arange(L.shape[0])
+                v = SL.lu_solve((L.T, piv), km_train_test, trans=1)
+                # self.predicted_variances = \
+                #     Ndiag(km_test_test - Ndot(v.T, v)) \
+                #     + self.sigma_noise**2
+                # Faster formula: np.diag(Ndot(v.T, v)) = (v**2).sum(0):
+                ca.predicted_variances = Ndiag(km_test_test) \
+                                         - (v ** 2).sum(0) \
+                                         + self.params.sigma_noise ** 2
 
         if __debug__:
             debug("GPR", "Done predicting")
@@ -555,7 +670,20 @@ class GPRLinearWeights(Sensitivity):
         weights = Ndot(Sigma_p,
                         Ndot(train_fv.T, clf._alpha))
 
-        if self.ca.is_enabled('variances'):
+        if self.ca.is_enabled('variances') and clf._Lm is not None:
+            # deterministic training conditional (DTC) posterior:
+            # Sigma_p - Sigma_p X_m^T (K_mm^-1 - (K_mm + K_mn K_nm / s2)^-1)
+            # X_m Sigma_p, with K_mm + K_mn K_nm / s2 = Lm B Lm^T
+            if np.ndim(Sigma_p) == 2:
+                prior = Ndiag(Sigma_p)
+            else:
+                prior = Sigma_p
+            W = SL.solve_triangular(clf._Lm, Ndot(train_fv, Sigma_p),
+                                    lower=True)
+            WB = SL.solve_triangular(clf._LB, W, lower=True)
+            self.ca.variances = prior - np.sum(W * W, axis=0) \
+                                + np.sum(WB * WB, axis=0)
+        elif self.ca.is_enabled('variances'):
             # super ugly formulas that can be quite surely improved:
             tmp = np.linalg.inv(clf._L)
             Kyinv = Ndot(tmp.T, tmp)
@@ -31,27 +31,31 @@ else:
     smlrlib = np.ctypeslib.load_library('smlrc', os.path.dirname(__file__))
 
 # wrap the stepwise function
-def stepwise_regression(*args):
-    func = smlrlib.stepwise_regression
-    func.argtypes = [C.c_int, C.c_int, c_darray,
-                     C.c_int, C.c_int, c_darray,
-                     C.c_int, C.c_int, c_darray,
-                     C.c_int, C.c_int, c_darray,
-                     C.c_int, C.c_int, c_darray,
-                     C.c_int, c_darray,
-                     C.c_int, c_darray,
-                     C.c_int, c_darray,
-                     C.c_int,
-                     C.c_int,
-                     C.c_double,
-                     C.c_float,
-                     C.c_float,
-                     C.c_int64]
-    func.restype = C.c_long
+# argtypes are assigned once (and not upon every call) so multiple threads
+# could call it at the same time -- ctypes releases the GIL for the
+# duration of the call, so multiple fits run concurrently
+_stepwise_regression = smlrlib.stepwise_regression
+_stepwise_regression.argtypes = [C.c_int, C.c_int, c_darray,
+                                 C.c_int, C.c_int, c_darray,
+                                 C.c_int, C.c_int, c_darray,
+                                 C.c_int, C.c_int, c_darray,
+                                 C.c_int, C.c_int, c_darray,
+                                 C.c_int, c_darray,
+                                 C.c_int, c_darray,
+                                 C.c_int, c_darray,
+                                 C.c_int,
+                                 C.c_int,
+                                 C.c_double,
+                                 C.c_float,
+                                 C.c_float,
+                                 C.c_int64,
+                                 C.c_int]
+_stepwise_regression.restype = C.c_long
 
+def stepwise_regression(*args):
     # get the new arglist
     arglist = extend_args(*args)
-    return func(*arglist)
+    return _stepwise_regression(*arglist)
 
 if __debug__:
     debug('INIT', 'mvpa2.clfs.libsmlrc end')
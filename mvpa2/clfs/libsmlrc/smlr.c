@@ -9,6 +9,10 @@
 
 #include <Python.h>
 
+#ifdef _OPENMP
+#include <omp.h>
+#endif
+
 /* Following code is for compatibility with Python3
    Example taken from: http://docs.python.org/py3k/howto/cporting.html#module-initialization-and-state
 */
@@ -100,6 +104,23 @@ initsmlr(void)
 #define DL_EXPORT(RTYPE) RTYPE
 #endif
 
+/* Minimal number of samples to split loops over samples among threads.
+   Below it, overhead of starting parallel regions outweighs the gain */
+#define SMLR_PARALLEL_MIN_SAMPLES 4096
+
+/* Random number generator with explicit state (xorshift64*), so concurrent
+   calls (e.g. from multiple Python threads) do not interfere with each
+   other, as they would through the global state of rand() */
+static double uniform_rand(unsigned long long *state)
+{
+  unsigned long long x = *state;
+  x ^= x >> 12;
+  x ^= x << 25;
+  x ^= x >> 27;
+  *state = x;
+  return (double)((x * 2685821657736338717ULL) >> 11) / 9007199254740992.0;
+}
+
 DL_EXPORT(int)
 stepwise_regression(int w_rows, int w_cols, double w[],
 			int X_rows, int X_cols, double X[],
@@ -115,7 +136,8 @@ stepwise_regression(int w_rows, int w_cols, double w[],
 			float resamp_decay,
 			float min_resamp,
 			int verbose,
-			long long int seed)
+			long long int seed,
+			int nthreads)
 {
   // initialize the iterative optimization
   double incr = DBL_MAX;
@@ -138,11 +160,18 @@ stepwise_regression(int w_rows, int w_cols, double w[],
   int basis = 0;
   int m = 0;
   float rval = 0;
+  unsigned long long rstate;
 
   // get the num features and num classes
   int nd = w_rows;
   int ns = E_rows;
 
+  // either to split loops over samples among threads
+  int parallel = 0;
+#ifdef _OPENMP
+  parallel = (nthreads > 1) && (ns >= SMLR_PARALLEL_MIN_SAMPLES);
+#endif
+
   // loop indexes
   int i = 0;
 
@@ -169,7 +198,10 @@ stepwise_regression(int w_rows, int w_cols, double w[],
     fflush(stdout);
   }
 
-  srand (seed);
+  // xorshift must not be seeded with 0
+  rstate = (unsigned long long)seed ^ 0x9E3779B97F4A7C15ULL;
+  if (rstate == 0)
+    rstate = 0x9E3779B97F4A7C15ULL;
 
   // loop over cycles
 
@@ -198,11 +230,20 @@ stepwise_regression(int w_rows, int w_cols, double w[],
 	}
 
 	// see if we're gonna update
-	rval = (float)rand()/(float)RAND_MAX;
+	rval = (float)uniform_rand(&rstate);
 	if ((w_old != 0) || (rval < p_resamp[basis][m]))
 	{
 	  // calc the probability
 	  XdotP = 0.0;
+#ifdef _OPENMP
+	  if (parallel)
+	  {
+#pragma omp parallel for reduction(+:XdotP) num_threads(nthreads) schedule(static)
+	    for (i=0; i<ns; i++)
+	      XdotP += X[X_cols*i+basis] * E[E_cols*i+m]/S[i];
+	  }
+	  else
+#endif
 	  for (i=0, Xp=X+basis, Ep=E+m;
 	       i<ns; i++)
 	  {
@@ -287,6 +328,21 @@ stepwise_regression(int w_rows, int w_cols, double w[],
 	  {
 	    // update the expected values
 	    w_diff = w_new - w_old;
+#ifdef _OPENMP
+	    if (parallel)
+	    {
+#pragma omp parallel for num_threads(nthreads) schedule(static)
+	      for (i=0; i<ns; i++)
+	      {
+		double E_new_i;
+		Xw[Xw_cols*i+m] += X[X_cols*i+basis]*w_diff;
+		E_new_i = exp(Xw[Xw_cols*i+m]);
+		S[i] += E_new_i - E[E_cols*i+m];
+		E[E_cols*i+m] = E_new_i;
+	      }
+	    }
+	    else
+#endif
 	    for (Sp=S, Xp=X+basis, Ep=E+m, Xwp=Xw+m;
 		 Sp<S+S_rows; Sp++)
 	    {
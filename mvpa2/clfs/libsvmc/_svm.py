@@ -217,6 +217,16 @@ class SVMProblem:
         self.prob = prob = svmc.new_svm_problem()
         self.size = size = len(y)
 
+        if isinstance(x, np.ndarray) and x.ndim == 2:
+            # convert the whole data matrix in a single call
+            svmc.svm_problem_set_dense(
+                prob,
+                np.ascontiguousarray(y, dtype=np.float64),
+                np.ascontiguousarray(x, dtype=np.float64))
+            self.data = None
+            self.maxlen = x.shape[1]
+            return
+
         self.y_array = y_array = svmc.new_double(size)
         for i in xrange(size):
             svmc.double_setitem(y_array, i, y[i])
@@ -251,11 +261,14 @@ class SVMProblem:
         if __debug__:
             debug('SVM_', 'Destroying libsvm.SVMProblem %s' % `self`)
 
+        if self.data is None:
+            svmc.svm_problem_free_dense(self.prob)
+        else:
+            svmc.delete_double(self.y_array)
+            for i in range(self.size):
+                svmc.svm_node_array_destroy(self.data[i])
+            svmc.svm_node_matrix_destroy(self.x_matrix)
         svmc.delete_svm_problem(self.prob)
-        svmc.delete_double(self.y_array)
-        for i in range(self.size):
-            svmc.svm_node_array_destroy(self.data[i])
-        svmc.svm_node_matrix_destroy(self.x_matrix)
 
 
 
@@ -310,6 +323,34 @@ class SVMModel:
         return ret
 
 
+    def predict_dense(self, x, values=False):
+        """Predict all samples (rows) of `x` in a single call
+
+        Parameters
+        ----------
+        x : array
+          2D array of samples.
+        values : bool
+          Either to return decision values as well.
+
+        Returns
+        -------
+        predictions : array
+        values : array or None
+          Decision values (nsamples x nvalues) as returned by
+          `predict_values_raw` for every sample, if `values` is True.
+        """
+        x = np.ascontiguousarray(x, dtype=np.float64)
+        predictions = np.empty(len(x))
+        if values:
+            n = self.nr_class*(self.nr_class-1)//2
+            dec_values = np.empty((len(x), n))
+        else:
+            dec_values = None
+        svmc.svm_predict_dense(self.model, x, predictions, dec_values)
+        return predictions, dec_values
+
+
     ##REF: Name was automagically refactored
     def get_nr_class(self):
         return self.nr_class
@@ -344,7 +385,12 @@ class SVMModel:
 
     ##REF: Name was automagically refactored
     def predict_values(self, x):
-        v = self.predict_values_raw(x)
+        return self.values_raw_to_values(self.predict_values_raw(x))
+
+
+    def values_raw_to_values(self, v):
+        """Convert raw decision values into the form of `predict_values`
+        """
         if self.svm_type == NU_SVR \
            or self.svm_type == EPSILON_SVR \
            or self.svm_type == ONE_CLASS:
@@ -360,8 +406,7 @@ class SVMModel:
             return  d
 
 
-    ##REF: Name was automagically refactored
-    def predict_probability(self, x):
+    def _check_probability(self):
         #c code will do nothing on wrong type, so we have to check ourself
         if self.svm_type == NU_SVR or self.svm_type == EPSILON_SVR:
             raise TypeError, "call get_svr_probability or get_svr_pdf " \
@@ -373,6 +418,11 @@ class SVMModel:
         if not self.probability:
             raise TypeError, "model does not support probabiliy estimates"
 
+
+    ##REF: Name was automagically refactored
+    def predict_probability(self, x):
+        self._check_probability()
+
         #convert x into SVMNode, alloc a double array to receive probabilities
         data = seq_to_svm_node(x)
         dblarr = svmc.new_double(self.nr_class)
@@ -386,6 +436,25 @@ class SVMModel:
         return pred, p
 
 
+    def predict_probability_dense(self, x):
+        """Predict all samples (rows) of `x` with probability estimates
+
+        Returns
+        -------
+        list
+          (prediction, {label: probability}) for every sample as returned
+          by `predict_probability`.
+        """
+        self._check_probability()
+        x = np.ascontiguousarray(x, dtype=np.float64)
+        predictions = np.empty(len(x))
+        probabilities = np.empty((len(x), self.nr_class))
+        svmc.svm_predict_probability_dense(self.model, x, predictions,
+                                           probabilities)
+        return [(pred, dict(zip(self.labels, pv)))
+                for pred, pv in zip(predictions, probabilities)]
+
+
     ##REF: Name was automagically refactored
     def get_svr_probability(self):
         #leave the Error checking to svm.cpp code
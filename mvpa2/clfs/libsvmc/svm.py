@@ -37,7 +37,7 @@ from mvpa2.clfs.libsvmc._svmc import \
      PRECOMPUTED, ONE_CLASS
 
 def _data2ls(data):
-    return np.asarray(data).astype(float)
+    return np.ascontiguousarray(data, dtype=np.float64)
 
 class SVM(_SVM):
     """Support Vector Machine Classifier.
@@ -193,12 +193,16 @@ class SVM(_SVM):
         # libsvm needs doubles
         src = _data2ls(data)
         ca = self.ca
+        model = self.model
 
-        predictions = [ self.model.predict(p) for p in src ]
+        # predict all samples at once, along with decision values if
+        # estimates are requested (avoids computing them twice)
+        predictions, values = model.predict_dense(
+            src, values=ca.is_enabled('estimates'))
 
         if ca.is_enabled('estimates'):
             if self.__is_regression__:
-                estimates = [ self.model.predict_values_raw(p)[0] for p in src ]
+                estimates = values[:, 0]
             else:
                 # if 'trained_targets' are literal they have to be mapped
                 if ( np.issubdtype(self.ca.trained_targets.dtype, 'c') or
@@ -208,39 +212,29 @@ class SVM(_SVM):
                 else:
                     trained_targets = self.ca.trained_targets
                 nlabels = len(trained_targets)
-                # XXX We do duplicate work. model.predict calls
-                # predict_values_raw internally and then does voting or
-                # thresholding. So if speed becomes a factor we might
-                # want to move out logic from libsvm over here to base
-                # predictions on obtined values, or adjust libsvm to
-                # spit out values from predict() as well
                 if nlabels == 2:
                     # Apperently libsvm reorders labels so we need to
                     # track (1,0) values instead of (0,1) thus just
                     # lets take negative reverse
-                    estimates = [ self.model.predict_values(p)[(trained_targets[1],
-                                                            trained_targets[0])]
-                               for p in src ]
-                    if len(estimates) > 0:
-                        if __debug__:
-                            debug("SVM",
-                                  "Forcing estimates to be ndarray and reshaping"
-                                  " them into 1D vector")
-                        estimates = np.asarray(estimates).reshape(len(estimates))
+                    if __debug__:
+                        debug("SVM",
+                              "Forcing estimates to be ndarray and reshaping"
+                              " them into 1D vector")
+                    if (trained_targets[1], trained_targets[0]) \
+                           == tuple(model.labels[:2]):
+                        estimates = values[:, 0].copy()
+                    else:
+                        estimates = -values[:, 0]
                 else:
                     # In multiclass we return dictionary for all pairs
                     # of labels, since libsvm does 1-vs-1 pairs
-                    estimates = [ self.model.predict_values(p) for p in src ]
+                    estimates = [ model.values_raw_to_values(v)
+                                  for v in values ]
             ca.estimates = estimates
 
         if ca.is_enabled("probabilities"):
-            # XXX Is this really necesssary? yoh don't think so since
-            # assignment to ca is doing the same
-            #self.probabilities = [ self.model.predict_probability(p)
-            #                       for p in src ]
             try:
-                ca.probabilities = [ self.model.predict_probability(p)
-                                         for p in src ]
+                ca.probabilities = model.predict_probability_dense(src)
             except TypeError:
                 warning("Current SVM %s doesn't support probability " %
                         self + " estimation.")
@@ -101,6 +101,80 @@ static PyObject* doubleppcarray2numpy_array(double** carray, int rows, int cols)
 	return PyArray_Return ( (PyArrayObject*) array	);
 }
 
+/* fill an svm_node array with a dense row of values: features get
+ * indices 0..cols-1 and the array is terminated with index -1 */
+static void fill_dense_nodes(struct svm_node *nodes, const double *values,
+							 npy_intp cols)
+{
+	npy_intp j;
+	for (j = 0; j<cols; ++j)
+	{
+		nodes[j].index = (int)j;
+		nodes[j].value = values[j];
+	}
+	nodes[cols].index = -1;
+	nodes[cols].value = 0.0;
+}
+
+/* check that obj is a C-contiguous float64 array of given dimensionality */
+static int check_double_array(PyObject *obj, int ndim, int writeable,
+							  const char *name)
+{
+	PyArrayObject *a = (PyArrayObject*) obj;
+	if (!PyArray_Check(obj) || PyArray_NDIM(a) != ndim
+		|| PyArray_TYPE(a) != NPY_DOUBLE
+		|| !(writeable ? PyArray_ISCARRAY(a) : PyArray_ISCARRAY_RO(a)))
+	{
+		PyErr_Format(PyExc_ValueError,
+					 "%s must be a C-contiguous %d-dimensional float64 array",
+					 name, ndim);
+		return 0;
+	}
+	return 1;
+}
+
+/* number of decision values per sample */
+static int get_nr_dec_values(const struct svm_model *model)
+{
+	int svm_type = svm_get_svm_type(model);
+	int nr_class = svm_get_nr_class(model);
+	if (svm_type == ONE_CLASS || svm_type == EPSILON_SVR || svm_type == NU_SVR)
+		return 1;
+	return nr_class*(nr_class-1)/2;
+}
+
+#if LIBSVM_VERSION < 300
+/* mirrors svm_predict() of libsvm 2.x given decision values, so they need
+ * not to be computed twice */
+static double predict_from_dec_values(const struct svm_model *model,
+									  const double *dec_values, int *vote)
+{
+	int svm_type = svm_get_svm_type(model);
+	if (svm_type == ONE_CLASS)
+		return (dec_values[0]>0)?1:-1;
+	if (svm_type == EPSILON_SVR || svm_type == NU_SVR)
+		return dec_values[0];
+
+	int i, j, pos = 0;
+	int nr_class = model->nr_class;
+	for (i = 0; i<nr_class; i++)
+		vote[i] = 0;
+	for (i = 0; i<nr_class; i++)
+		for (j = i+1; j<nr_class; j++)
+		{
+			if (dec_values[pos++] > 0)
+				++vote[i];
+			else
+				++vote[j];
+		}
+	int vote_max_idx = 0;
+	for (i = 1; i<nr_class; i++)
+		if (vote[i] > vote[vote_max_idx])
+			vote_max_idx = i;
+	return model->label[vote_max_idx];
+}
+#endif
+
 /* rely on built-in facility to control verbose output
  * in the versions of libsvm >= 2.89
  */
@@ -227,6 +301,15 @@ void svm_destroy_model(struct svm_model *model);
 const char *svm_check_parameter(const struct svm_problem *prob, const struct svm_parameter *param);
 int svm_check_probability_model(const struct svm_model *model);
 
+/* Helpers which use Python API must be called while holding the GIL.
+   Bulk helpers below release the GIL themselves while crunching numbers */
+%nothread svm_node_matrix2numpy_array;
+%nothread doubleppcarray2numpy_array;
+%nothread svm_node_array_set;
+%nothread svm_problem_set_dense;
+%nothread svm_predict_dense;
+%nothread svm_predict_probability_dense;
+
 static PyObject* svm_node_matrix2numpy_array(struct svm_node** matrix, int rows, int cols);
 static PyObject* doubleppcarray2numpy_array(double** data, int rows, int cols);
 
@@ -279,6 +362,172 @@ void svm_node_matrix_destroy(struct svm_node **matrix)
 	free(matrix);
 }
 
+/* Set up the problem from targets y and samples x (rows) given as
+   C-contiguous float64 arrays.  All nodes are allocated in a single block,
+   thus the problem must be freed with svm_problem_free_dense() */
+PyObject *svm_problem_set_dense(struct svm_problem *prob,
+								PyObject *y, PyObject *x)
+{
+	if (!check_double_array(y, 1, 0, "y") || !check_double_array(x, 2, 0, "x"))
+		return NULL;
+	npy_intp rows = PyArray_DIM((PyArrayObject*)x, 0);
+	npy_intp cols = PyArray_DIM((PyArrayObject*)x, 1);
+	if (PyArray_DIM((PyArrayObject*)y, 0) != rows)
+	{
+		PyErr_SetString(PyExc_ValueError,
+						"Number of targets and samples must match");
+		return NULL;
+	}
+	const double *ydata = (const double*)PyArray_DATA((PyArrayObject*)y);
+	const double *xdata = (const double*)PyArray_DATA((PyArrayObject*)x);
+
+	npy_intp nrows = rows ? rows : 1;
+	double *prob_y = (double *)malloc(sizeof(double)*nrows);
+	struct svm_node **prob_x =
+		(struct svm_node **)malloc(sizeof(struct svm_node *)*nrows);
+	struct svm_node *nodes =
+		(struct svm_node *)malloc(sizeof(struct svm_node)*nrows*(cols+1));
+	if (!prob_y || !prob_x || !nodes)
+	{
+		free(prob_y);
+		free(prob_x);
+		free(nodes);
+		return PyErr_NoMemory();
+	}
+
+	npy_intp i;
+	Py_BEGIN_ALLOW_THREADS
+	prob_x[0] = nodes;
+	for (i = 0; i<rows; ++i)
+	{
+		prob_y[i] = ydata[i];
+		prob_x[i] = nodes + i*(cols+1);
+		fill_dense_nodes(prob_x[i], xdata + i*cols, cols);
+	}
+	Py_END_ALLOW_THREADS
+
+	prob->l = (int)rows;
+	prob->y = prob_y;
+	prob->x = prob_x;
+	Py_RETURN_NONE;
+}
+
+void svm_problem_free_dense(struct svm_problem *prob)
+{
+	if (prob->x)
+	{
+		free(prob->x[0]);
+		free(prob->x);
+	}
+	free(prob->y);
+	prob->x = NULL;
+	prob->y = NULL;
+	prob->l = 0;
+}
+
+/* Predict all samples (rows) of x storing results into predictions and,
+   unless None, decision values into dec_values (rows x #decision values) */
+PyObject *svm_predict_dense(const struct svm_model *model, PyObject *x,
+							PyObject *predictions, PyObject *dec_values)
+{
+	int with_values = dec_values != Py_None;
+	int nr_dec = get_nr_dec_values(model);
+	if (!check_double_array(x, 2, 0, "x")
+		|| !check_double_array(predictions, 1, 1, "predictions")
+		|| (with_values && !check_double_array(dec_values, 2, 1, "dec_values")))
+		return NULL;
+	npy_intp rows = PyArray_DIM((PyArrayObject*)x, 0);
+	npy_intp cols = PyArray_DIM((PyArrayObject*)x, 1);
+	if (PyArray_DIM((PyArrayObject*)predictions, 0) != rows
+		|| (with_values
+			&& (PyArray_DIM((PyArrayObject*)dec_values, 0) != rows
+				|| PyArray_DIM((PyArrayObject*)dec_values, 1) != nr_dec)))
+	{
+		PyErr_SetString(PyExc_ValueError, "Output arrays have wrong shape");
+		return NULL;
+	}
+	const double *xdata = (const double*)PyArray_DATA((PyArrayObject*)x);
+	double *pdata = (double*)PyArray_DATA((PyArrayObject*)predictions);
+	double *ddata = with_values
+		? (double*)PyArray_DATA((PyArrayObject*)dec_values) : NULL;
+
+	struct svm_node *nodes =
+		(struct svm_node *)malloc(sizeof(struct svm_node)*(cols+1));
+	int *vote = (int *)malloc(sizeof(int)*(svm_get_nr_class(model)+1));
+	if (!nodes || !vote)
+	{
+		free(nodes);
+		free(vote);
+		return PyErr_NoMemory();
+	}
+
+	npy_intp i;
+	Py_BEGIN_ALLOW_THREADS
+	for (i = 0; i<rows; ++i)
+	{
+		fill_dense_nodes(nodes, xdata + i*cols, cols);
+		if (with_values)
+		{
+			double *dec = ddata + i*nr_dec;
+#if LIBSVM_VERSION >= 300
+			pdata[i] = svm_predict_values(model, nodes, dec);
+#else
+			svm_predict_values(model, nodes, dec);
+			pdata[i] = predict_from_dec_values(model, dec, vote);
+#endif
+		}
+		else
+			pdata[i] = svm_predict(model, nodes);
+	}
+	Py_END_ALLOW_THREADS
+
+	free(vote);
+	free(nodes);
+	Py_RETURN_NONE;
+}
+
+/* Predict all samples (rows) of x with probability estimates, which get
+   stored into probabilities (rows x nr_class) */
+PyObject *svm_predict_probability_dense(const struct svm_model *model,
+										PyObject *x, PyObject *predictions,
+										PyObject *probabilities)
+{
+	int nr_class = svm_get_nr_class(model);
+	if (!check_double_array(x, 2, 0, "x")
+		|| !check_double_array(predictions, 1, 1, "predictions")
+		|| !check_double_array(probabilities, 2, 1, "probabilities"))
+		return NULL;
+	npy_intp rows = PyArray_DIM((PyArrayObject*)x, 0);
+	npy_intp cols = PyArray_DIM((PyArrayObject*)x, 1);
+	if (PyArray_DIM((PyArrayObject*)predictions, 0) != rows
+		|| PyArray_DIM((PyArrayObject*)probabilities, 0) != rows
+		|| PyArray_DIM((PyArrayObject*)probabilities, 1) != nr_class)
+	{
+		PyErr_SetString(PyExc_ValueError, "Output arrays have wrong shape");
+		return NULL;
+	}
+	const double *xdata = (const double*)PyArray_DATA((PyArrayObject*)x);
+	double *pdata = (double*)PyArray_DATA((PyArrayObject*)predictions);
+	double *prdata = (double*)PyArray_DATA((PyArrayObject*)probabilities);
+
+	struct svm_node *nodes =
+		(struct svm_node *)malloc(sizeof(struct svm_node)*(cols+1));
+	if (!nodes)
+		return PyErr_NoMemory();
+
+	npy_intp i;
+	Py_BEGIN_ALLOW_THREADS
+	for (i = 0; i<rows; ++i)
+	{
+		fill_dense_nodes(nodes, xdata + i*cols, cols);
+		pdata[i] = svm_predict_probability(model, nodes, prdata + i*nr_class);
+	}
+	Py_END_ALLOW_THREADS
+
+	free(nodes);
+	Py_RETURN_NONE;
+}
+
 void svm_destroy_model_helper(svm_model *model_ptr)
 {
 #if LIBSVM_VERSION >= 300
@@ -15,7 +15,7 @@ Meta Classifiers can be grouped according to their function as
 :group ProxyClassifiers: ProxyClassifier BinaryClassifier MappedClassifier
   FeatureSelectionClassifier
 :group PredictionsCombiners for CombinedClassifier: PredictionsCombiner
-  MaximalVote MeanPrediction
+  MaximalVote MaximalEstimate MeanPrediction
 
 """
 
@@ -31,12 +31,13 @@ from mvpa2.generators.splitters import Splitter
 from mvpa2.generators.partition import NFoldPartitioner
 from mvpa2.datasets.miscfx import get_samples_by_attr
 from mvpa2.misc.attrmap import AttributeMap
-from mvpa2.base.dochelpers import _str
+from mvpa2.base.dochelpers import _str, _repr_attrs
 from mvpa2.base.state import ConditionalAttribute, ClassWithCollections
 
 from mvpa2.clfs.base import Classifier
 from mvpa2.clfs.distance import cartesian_distance
 from mvpa2.misc.transformers import first_axis_mean
+from mvpa2.misc.support import parallel_map
 
 from mvpa2.measures.base import \
     BoostedClassifierSensitivityAnalyzer, ProxyClassifierSensitivityAnalyzer, \
@@ -66,7 +67,7 @@ class BoostedClassifier(Classifier):
         doc="Estimates obtained from each classifier")
 
 
-    def __init__(self, clfs=None, propagate_ca=True,
+    def __init__(self, clfs=None, propagate_ca=True, nproc=1,
                  **kwargs):
         """Initialize the instance.
 
@@ -79,6 +80,11 @@ class BoostedClassifier(Classifier):
           It is in effect only when slaves get assigned - so if state
           is enabled not during construction, it would not necessarily
           propagate into slaves
+        nproc : None or int
+          How many slave classifiers to train (and to predict with)
+          concurrently.  Workers are threads sharing the same dataset,
+          so no data gets copied or pickled.  If None -- all available
+          cores will be used.
         kwargs : dict
           dict of keyworded arguments which might get used
           by State or Classifier
@@ -94,6 +100,9 @@ class BoostedClassifier(Classifier):
         self.__propagate_ca = propagate_ca
         """Enable current enabled ca in slave classifiers"""
 
+        self.nproc = nproc
+        """Number of concurrent workers for slave classifiers"""
+
         self._set_classifiers(clfs)
         """Store the list of classifiers"""
 
@@ -104,14 +113,15 @@ class BoostedClassifier(Classifier):
             prefix_ = []
         else:
             prefix_ = ["clfs=[%s,...]" % repr(self.__clfs[0])]
-        return super(BoostedClassifier, self).__repr__(prefix_ + prefixes)
+        return super(BoostedClassifier, self).__repr__(
+            prefix_ + _repr_attrs(self, ['nproc'], default=1) + prefixes)
 
 
     def _train(self, dataset):
         """Train `BoostedClassifier`
         """
-        for clf in self.__clfs:
-            clf.train(dataset)
+        parallel_map(lambda clf: clf.train(dataset), self.__clfs,
+                     nproc=self.nproc)
 
 
     def _posttrain(self, dataset):
@@ -137,7 +147,8 @@ class BoostedClassifier(Classifier):
     def _predict(self, dataset):
         """Predict using `BoostedClassifier`
         """
-        raw_predictions = [ clf.predict(dataset) for clf in self.__clfs ]
+        raw_predictions = parallel_map(lambda clf: clf.predict(dataset),
+                                       self.__clfs, nproc=self.nproc)
         self.ca.raw_predictions = raw_predictions
         assert(len(self.__clfs)>0)
         if self.ca.is_enabled("estimates"):
@@ -447,6 +458,69 @@ class MaximalVote(PredictionsCombiner):
 
 
 
+class MaximalEstimate(PredictionsCombiner):
+    """Provides a decision using the maximal estimate of a positive label
+
+    Meant for 1-vs-all combinations of `BinaryClassifier` instances with a
+    single positive label each: every sample gets the positive label of the
+    binary classifier which is most confident about it, so samples rejected
+    by all classifiers are still assigned unambiguously.
+    """
+
+    predictions = ConditionalAttribute(enabled=True,
+        doc="Predictions of the most confident classifiers")
+    estimates = ConditionalAttribute(enabled=False,
+        doc="Estimates of the positive label for each sample/classifier")
+
+    def __call__(self, clfs, dataset):
+        """Actuall callable - select the maximal estimates
+
+        Slave classifiers of the `BinaryClassifier` instances must have
+        state 'estimates' enabled, providing either a single value per
+        sample (positive for the positive label), or a value per label.
+        """
+        if len(clfs)==0:
+            return []                   # to don't even bother
+
+        all_estimates = []
+        for clf in clfs:
+            slave = clf.clf
+            if not slave.ca.is_enabled("estimates"):
+                raise ValueError, "MaximalEstimate needs classifiers (such " \
+                      "as %s) with state 'estimates' enabled" % slave
+            estimates = np.asanyarray(slave.ca.estimates)
+            if not _is_numeric(estimates):
+                raise ValueError, "MaximalEstimate needs numeric estimates, " \
+                      "but %s provides estimates of dtype %s" \
+                      % (slave, estimates.dtype)
+            if estimates.ndim == 2 and estimates.shape[1] == 2:
+                # estimates per label in the order of the trained targets
+                ipos = list(slave.ca.trained_targets).index(+1)
+                estimates = estimates[:, ipos] - estimates[:, 1 - ipos]
+            elif estimates.ndim != 1:
+                raise ValueError, "Cannot deduce estimates of the positive " \
+                      "label from estimates of shape %s provided by %s" \
+                      % (estimates.shape, slave)
+            all_estimates.append(estimates)
+
+        all_estimates = np.array(all_estimates).T
+        predictions = [clfs[i].poslabels[0]
+                       for i in np.argmax(all_estimates, axis=1)]
+
+        ca = self.ca
+        ca.estimates = all_estimates
+        ca.predictions = predictions
+        return predictions
+
+
+
+def _is_numeric(estimates):
+    """Whether `estimates` (an array) could be compared by value"""
+    return np.issubdtype(estimates.dtype, np.number) \
+           and not np.issubdtype(estimates.dtype, np.complexfloating)
+
+
+
 class MeanPrediction(PredictionsCombiner):
     """Provides a decision by taking mean of the results
     """
@@ -569,8 +643,7 @@ class CombinedClassifier(BoostedClassifier):
         return super(CombinedClassifier, self).__repr__(
             ["combiner=%s" % repr(self.__combiner)] + prefixes)
 
-    @property
-    def combiner(self):
+    def _get_combiner(self):
         # Decide either we are dealing with regressions
         # by looking at 1st learner
         if self.__combiner is None:
@@ -580,6 +653,10 @@ class CombinedClassifier(BoostedClassifier):
         return self.__combiner
 
 
+    def _set_combiner(self, combiner):
+        self.__combiner = combiner
+
+
     def summary(self):
         """Provide summary for the `CombinedClassifier`.
         """
@@ -614,9 +691,15 @@ class CombinedClassifier(BoostedClassifier):
     def _predict(self, dataset):
         """Predict using `CombinedClassifier`
         """
+        BoostedClassifier._predict(self, dataset)
+        return self._combine(dataset)
+
+
+    def _combine(self, dataset):
+        """Combine predictions of the slave classifiers
+        """
         ca = self.ca
         cca = self.combiner.ca
-        BoostedClassifier._predict(self, dataset)
         if ca.is_enabled("estimates"):
             cca.enable('estimates')
         # combiner will make use of conditional attributes instead of only predictions
@@ -636,6 +719,8 @@ class CombinedClassifier(BoostedClassifier):
                             % self)
         return predictions
 
+    combiner = property(fget=_get_combiner, fset=_set_combiner)
+
 
 
 class TreeClassifier(ProxyClassifier):
@@ -1047,8 +1132,9 @@ class MulticlassClassifier(CombinedClassifier):
     """`CombinedClassifier` to perform multiclass using a list of
     `BinaryClassifier`.
 
-    such as 1-vs-1 (ie in pairs like libsvm doesn) or 1-vs-all (which
-    is yet to think about)
+    such as 1-vs-1 (ie in pairs like libsvm does) or 1-vs-all (each
+    label against all the others).  Binary classifiers could be trained
+    concurrently (see `nproc`).
     """
 
     def __init__(self, clf, bclf_type="1-vs-1", **kwargs):
@@ -1061,8 +1147,17 @@ class MulticlassClassifier(CombinedClassifier):
           for multiclass
         bclf_type
           "1-vs-1" or "1-vs-all", determines the way to generate binary
-          classifiers
+          classifiers.  Unless a `combiner` is given, "1-vs-all" takes
+          the label of the binary classifier with the maximal estimate
+          (see `MaximalEstimate`) instead of a maximal vote -- if `clf`
+          provides numeric estimates.  Otherwise it falls back to the
+          maximal vote.
         """
+        self.__estimate_fallback = bclf_type == "1-vs-all" \
+                                   and kwargs.get('combiner') is None
+        """Whether to vote if default `MaximalEstimate` is not applicable"""
+        if self.__estimate_fallback:
+            kwargs['combiner'] = MaximalEstimate()
         CombinedClassifier.__init__(self, **kwargs)
 
         self.__clf = clf
@@ -1075,11 +1170,7 @@ class MulticlassClassifier(CombinedClassifier):
             self.__tags__ += ['multiclass']
 
         # Some checks on known ways to do multiclass
-        if bclf_type == "1-vs-1":
-            pass
-        elif bclf_type == "1-vs-all": # TODO
-            raise NotImplementedError
-        else:
+        if not bclf_type in ("1-vs-1", "1-vs-all"):
             raise ValueError, \
                   "Unknown type of classifier %s for " % bclf_type + \
                   "BoostedMulticlassClassifier"
@@ -1110,19 +1201,46 @@ class MulticlassClassifier(CombinedClassifier):
                         BinaryClassifier(
                             clf,
                             poslabels=[ulabels[i]], neglabels=[ulabels[j]]))
-            if __debug__:
-                debug("CLFMC", "Created %d binary classifiers for %d labels",
-                      (len(biclfs), len(ulabels)))
+        elif self.__bclf_type == "1-vs-all":
+            # each label against all the others
+            biclfs = []
+            for l in ulabels:
+                clf = self.__clf.clone()
+                if isinstance(self.combiner, MaximalEstimate):
+                    clf.ca.enable('estimates')
+                biclfs.append(
+                    BinaryClassifier(
+                        clf,
+                        poslabels=[l],
+                        neglabels=[x for x in ulabels if x != l]))
 
-            self.clfs = biclfs
+        if __debug__:
+            debug("CLFMC", "Created %d binary classifiers for %d labels",
+                  (len(biclfs), len(ulabels)))
 
-        elif self.__bclf_type == "1-vs-all":
-            raise NotImplementedError
+        self.clfs = biclfs
 
         # perform actual training
         CombinedClassifier._train(self, dataset)
 
 
+    def _predict(self, dataset):
+        """Predict using `MulticlassClassifier`
+        """
+        BoostedClassifier._predict(self, dataset)
+        if self.__estimate_fallback \
+               and isinstance(self.combiner, MaximalEstimate):
+            # only now we know what estimates slave classifiers provide
+            estimates = np.asanyarray(self.clfs[0].clf.ca.estimates)
+            if not _is_numeric(estimates):
+                if __debug__:
+                    debug("CLFMC", "%s provides estimates of dtype %s -- "
+                          "falling back to maximal vote",
+                          (self.__clf, estimates.dtype))
+                self.combiner = MaximalVote()
+        return self._combine(dataset)
+
+
 
 class SplitClassifier(CombinedClassifier):
     """`BoostedClassifier` to work on splits of the data
@@ -1144,6 +1262,13 @@ class SplitClassifier(CombinedClassifier):
     splits = ConditionalAttribute(enabled=False, doc=
        """Store the actual splits of the data. Can be memory expensive""")
 
+    split_training_times = ConditionalAttribute(enabled=False,
+        doc="Time (in seconds) it took to train the classifier of each split")
+
+    split_predicting_times = ConditionalAttribute(enabled=False,
+        doc="Time (in seconds) it took the classifier of each split to "
+            "predict its testing part (available only along with `stats`)")
+
     # ??? couldn't be training_stats since it has other meaning
     #     here, BUT it is named so within CrossValidatedTransferError
     #     -- unify
@@ -1167,6 +1292,10 @@ class SplitClassifier(CombinedClassifier):
           for multiclass
         splitter : Splitter
           `Splitter` to use to split the dataset prior training
+        nproc : None or int
+          How many splits to process concurrently.  All workers share the
+          same (read-only) dataset.  If None -- all available cores will
+          be used.
         """
 
         CombinedClassifier.__init__(self, **kwargs)
@@ -1185,8 +1314,6 @@ class SplitClassifier(CombinedClassifier):
     def _train(self, dataset):
         """Train `SplitClassifier`
         """
-        targets_sa_name = self.get_space()
-
         # generate pairs and corresponding classifiers
         bclfs = []
 
@@ -1200,8 +1327,6 @@ class SplitClassifier(CombinedClassifier):
             clf_template.ca.enable(['training_stats'])
             ca.training_stats = clf_template.__summary_class__()
 
-        clf_hastestdataset = hasattr(clf_template, 'testdataset')
-
         # for proper and easier debugging - first define classifiers and then
         # train them
         for split in self.__partitioner.get_partition_specs(dataset):
@@ -1209,38 +1334,39 @@ class SplitClassifier(CombinedClassifier):
                 debug("CLFSPL_", "Deepcopying %s for %s",
                       (clf_template, self))
             clf = clf_template.clone()
+            if ca.is_enabled('split_training_times'):
+                clf.ca.enable('training_time')
+            if ca.is_enabled('split_predicting_times'):
+                clf.ca.enable('predicting_time')
             bclfs.append(clf)
         self.clfs = bclfs
 
         self.ca.splits = []
-
-        for i, pset in enumerate(self.__partitioner.generate(dataset)):
-            if __debug__:
-                debug("CLFSPL", "Training classifier for split %d", (i,))
-
-            # split partitioned dataset
-            split = [d for d in self.__splitter.generate(pset)]
+        if ca.is_enabled('split_training_times'):
+            ca.split_training_times = []
+        if ca.is_enabled('split_predicting_times'):
+            ca.split_predicting_times = []
+
+        # partitioned datasets are only shallow copies, so they are cheap
+        # to generate upfront and to share among the workers
+        psets = list(enumerate(self.__partitioner.generate(dataset)))
+        results = parallel_map(self._train_split, psets, nproc=self.nproc)
+
+        # harvest results in the order of splits
+        for i, (split, targets, predictions, estimates) \
+                in enumerate(results):
+            clf = self.clfs[i]
 
             if ca.is_enabled("splits"):
                 self.ca.splits.append(split)
 
-            clf = self.clfs[i]
-
-            # assign testing dataset if given classifier can digest it
-            if clf_hastestdataset:
-                clf.testdataset = split[1]
-
-            clf.train(split[0])
-
-            # unbind the testdataset from the classifier
-            if clf_hastestdataset:
-                clf.testdataset = None
+            if ca.is_enabled('split_training_times'):
+                ca.split_training_times.append(clf.ca.training_time)
 
             if ca.is_enabled("stats"):
-                predictions = clf.predict(split[1])
-                self.ca.stats.add(split[1].sa[targets_sa_name].value,
-                                          predictions,
-                                          clf.ca.get('estimates', None))
+                self.ca.stats.add(targets, predictions, estimates)
+                if ca.is_enabled('split_predicting_times'):
+                    ca.split_predicting_times.append(clf.ca.predicting_time)
                 if __debug__:
                     dact = debug.active
                     if 'CLFSPL_' in dact:
@@ -1255,6 +1381,44 @@ class SplitClassifier(CombinedClassifier):
                 ca.training_stats += clf.ca.training_stats
 
 
+    def _train_split(self, args):
+        """Train (and test if `stats` are enabled) the classifier of a split
+
+        `args` is a tuple of the split index and the partitioned dataset.
+        Returns the split (only if `splits` are enabled, to not keep all
+        of them around), and targets, predictions and estimates on its
+        testing part (only if `stats` are enabled).
+        """
+        i, pset = args
+        if __debug__:
+            debug("CLFSPL", "Training classifier for split %d", (i,))
+
+        # split partitioned dataset
+        split = [d for d in self.__splitter.generate(pset)]
+
+        clf = self.clfs[i]
+        clf_hastestdataset = hasattr(clf, 'testdataset')
+
+        # assign testing dataset if given classifier can digest it
+        if clf_hastestdataset:
+            clf.testdataset = split[1]
+
+        clf.train(split[0])
+
+        # unbind the testdataset from the classifier
+        if clf_hastestdataset:
+            clf.testdataset = None
+
+        targets, predictions, estimates = None, None, None
+        if self.ca.is_enabled("stats"):
+            targets = split[1].sa[self.get_space()].value
+            predictions = clf.predict(split[1])
+            estimates = clf.ca.get('estimates', None)
+        if not self.ca.is_enabled("splits"):
+            split = None
+        return split, targets, predictions, estimates
+
+
     @group_kwargs(prefixes=['slave_'], passthrough=True)
     def get_sensitivity_analyzer(self, slave_kwargs={}, **kwargs):
         """Return an appropriate SensitivityAnalyzer for `SplitClassifier`
@@ -93,6 +93,11 @@ class ModelSelector(object):
         optimization problem (NLP). This fact is confirmed by Dmitrey,
         author of OpenOpt.
         """
+        params = getattr(self.parametric_model, 'params', None)
+        if use_gradient and getattr(params, 'inducing', None) is not None:
+            raise ValueError("Gradient of the log marginal likelihood is "
+                             "not available for %s with inducing points"
+                             % self.parametric_model.__class__.__name__)
         self.problem = None
         self.use_gradient = use_gradient
         self.logscale = logscale # use log-scale on hyperparameters to enhance numerical stability
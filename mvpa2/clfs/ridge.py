@@ -94,6 +94,49 @@ class RidgeReg(Classifier):
                               % self.__implementation
 
 
+    def predict_candidates(self, train, test, selected, candidates):
+        """Predict `test` for every candidate feature set.
+
+        Every candidate feature set consists of all `selected` features plus
+        a single feature from `candidates`.  The penalized normal equations
+        of a candidate set border the ones of the selected features by a
+        single row and column, hence all candidate solutions follow from a
+        single solve by rank-one updates.
+
+        Returns
+        -------
+        array
+          Predictions with one row per candidate.
+        """
+        nselected = len(selected)
+        if self.__lm is None:
+            lm = .05 * (nselected + 1)
+        else:
+            lm = self.__lm
+        # penalty on the squared weights (but not on the intercept)
+        penalty = lm**2
+
+        y = train.sa[self.get_space()].value
+        Xs = np.concatenate((train.samples[:, selected],
+                             np.ones((train.nsamples, 1))), 1)
+        Xc = train.samples[:, candidates]
+
+        G = np.dot(Xs.T, Xs)
+        G[np.arange(nselected), np.arange(nselected)] += penalty
+        g = np.dot(Xs.T, Xc)
+        w = np.linalg.solve(G, np.dot(Xs.T, y))
+        a = np.linalg.solve(G, g)
+        # Schur complements and weights of the candidate features
+        schur = np.sum(Xc**2, axis=0) + penalty - np.sum(g * a, axis=0)
+        wc = (np.dot(Xc.T, y) - np.dot(g.T, w)) / schur
+
+        Ts = np.concatenate((test.samples[:, selected],
+                             np.ones((test.nsamples, 1))), 1)
+        Tc = test.samples[:, candidates]
+        pred = np.dot(Ts, w)[:, np.newaxis] + (Tc - np.dot(Ts, a)) * wc
+        return pred.T
+
+
     @accepts_dataset_as_samples
     def _predict(self, data):
         """
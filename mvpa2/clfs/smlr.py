@@ -20,6 +20,7 @@ from mvpa2.misc.exceptions import ConvergenceError
 from mvpa2.base.param import Parameter
 from mvpa2.base.state import ConditionalAttribute
 from mvpa2.datasets.base import Dataset
+from mvpa2.misc.support import get_nproc
 
 __all__ = [ "SMLR", "SMLRWeights" ]
 
@@ -135,6 +136,18 @@ class SMLR(Classifier):
              doc="""Standard deviation threshold of weights to keep when
              unsparsifying.""")
 
+    nproc = Parameter(1, allowedtype='None or int', min=1,
+             doc="""Number of threads to be used by the C implementation (if
+             it was built with OpenMP support) to process samples of large
+             datasets.  If None -- all available CPUs are used.""")
+
+    warm_start = Parameter(False, allowedtype='bool',
+             doc="""Whether to start the optimization from the weights of the
+             previous training (if it was done on the same number of features
+             and the same labels) instead of zeros.  Speeds up retraining on
+             similar data (e.g. cross-validation folds) or with a different
+             `lm`.""")
+
     def __init__(self, **kwargs):
         """Initialize an SMLR classifier.
         """
@@ -161,6 +174,10 @@ class SMLR(Classifier):
         """Just the weights, without the biases"""
         self.__biases = None
         """The biases, will remain none if has_bias is False"""
+        self.__init_weights = None
+        """Initial weights for the next training, as provided by fit_path"""
+        self.__feature_ids = None
+        """Origids of the features of the training dataset (if present)"""
 
 
     ##REF: Name was automagically refactored
@@ -174,10 +191,11 @@ class SMLR(Classifier):
                                   resamp_decay,
                                   min_resamp,
                                   verbose,
-                                  seed = None):
+                                  seed = None,
+                                  nthreads = 1):
         """The (much slower) python version of the stepwise
         regression.  I'm keeping this around for now so that we can
-        compare results."""
+        compare results.  `nthreads` is ignored."""
 
         # get the data information into easy vars
         ns, nd = X.shape
@@ -307,8 +325,15 @@ class SMLR(Classifier):
         return cycles
 
 
-    def _train(self, dataset):
-        """Train the classifier using `dataset` (`Dataset`).
+    def _prepare_training(self, dataset):
+        """Precompute everything what does not depend on `lm`
+
+        Returns
+        -------
+        dict
+          X (samples with the bias column if requested), XY, auto_corr,
+          M (number of labels), c_to_fit, ulabels and the implementation
+          of stepwise_regression to be used.
         """
         targets_sa_name = self.get_space()    # name of targets sa
         targets_sa = dataset.sa[targets_sa_name] # actual targets sa
@@ -316,10 +341,9 @@ class SMLR(Classifier):
         # Process the labels to turn into 1 of N encoding
         uniquelabels = targets_sa.unique
         labels = _label2oneofm(targets_sa.value, uniquelabels)
-        self._ulabels = uniquelabels.copy()
 
         Y = labels
-        M = len(self._ulabels)
+        M = len(uniquelabels)
 
         # get the dataset information into easy vars
         X = dataset.samples
@@ -357,9 +381,6 @@ class SMLR(Classifier):
                   "Unknown implementation %s of stepwise_regression" % \
                   self.params.implementation
 
-        # set the feature dimensions
-        ns, nd = X.shape
-
         # decide the size of weights based on num classes estimated
         if self.params.fit_all_weights:
             c_to_fit = M
@@ -369,13 +390,49 @@ class SMLR(Classifier):
         # Precompute what we can
         auto_corr = ((M-1.)/(2.*M))*(np.sum(X*X, 0))
         XY = np.dot(X.T, Y[:, :c_to_fit])
-        lambda_over_2_auto_corr = (self.params.lm/2.)/auto_corr
 
-        # set starting values
-        w = np.zeros((nd, c_to_fit), dtype=np.double)
-        Xw = np.zeros((ns, c_to_fit), dtype=np.double)
-        E = np.ones((ns, c_to_fit), dtype=np.double)
-        S = M*np.ones(ns, dtype=np.double)
+        if 'origids' in dataset.fa:
+            feature_ids = dataset.fa.origids
+        else:
+            feature_ids = None
+
+        return dict(X=X, XY=XY, auto_corr=auto_corr, M=M, c_to_fit=c_to_fit,
+                    ulabels=uniquelabels, feature_ids=feature_ids,
+                    stepwise_regression=_stepwise_regression)
+
+
+    def _init_state(self, prep, w=None):
+        """Starting values for the stepwise regression
+
+        If initial weights `w` are given, `Xw`, `E` and `S` are computed
+        for them, otherwise optimization starts from all zero weights.
+        """
+        X, M, c_to_fit = prep['X'], prep['M'], prep['c_to_fit']
+        ns, nd = X.shape
+        if w is None:
+            w = np.zeros((nd, c_to_fit), dtype=np.double)
+            Xw = np.zeros((ns, c_to_fit), dtype=np.double)
+            E = np.ones((ns, c_to_fit), dtype=np.double)
+            S = M*np.ones(ns, dtype=np.double)
+        else:
+            w = np.array(w, dtype=np.double, order='C')
+            Xw = np.dot(X, w)
+            E = np.exp(Xw)
+            # class which is not fitted contributes exp(0)
+            S = E.sum(1) + (M - c_to_fit)
+        return w, Xw, E, S
+
+
+    def _fit(self, prep, lm, state):
+        """Run stepwise regression for `lm` updating `state` in-place
+
+        Returns
+        -------
+        int
+          Number of cycles it took to converge.
+        """
+        w, Xw, E, S = state
+        lambda_over_2_auto_corr = (lm/2.)/prep['auto_corr']
 
         # set verbosity
         if __debug__:
@@ -385,27 +442,125 @@ class SMLR(Classifier):
             verbosity = 0
 
         # call the chosen version of stepwise_regression
-        cycles = _stepwise_regression(w,
-                                      X,
-                                      XY,
+        cycles = prep['stepwise_regression'](w,
+                                      prep['X'],
+                                      prep['XY'],
                                       Xw,
                                       E,
-                                      auto_corr,
+                                      prep['auto_corr'],
                                       lambda_over_2_auto_corr,
                                       S,
-                                      M,
+                                      prep['M'],
                                       self.params.maxiter,
                                       self.params.convergence_tol,
                                       self.params.resamp_decay,
                                       self.params.min_resamp,
                                       verbosity,
-                                      self.params.seed)
+                                      self.params.seed,
+                                      get_nproc(self.params.nproc))
 
         if cycles >= self.params.maxiter:
             # did not converge
             raise ConvergenceError, \
                   "More than %d Iterations without convergence" % \
                   (self.params.maxiter)
+        return cycles
+
+
+    def _get_warm_weights(self, prep):
+        """Weights of the previous training if they fit the new problem
+
+        If both previous and current training datasets have features'
+        origids, weights get matched by them, so warm start works also
+        for a subset (or a different set) of features, e.g. within RFE.
+        Weights of features which were not seen before start from 0.
+        """
+        w = self.__weights_all
+        nd = prep['X'].shape[1]
+        old_ids, new_ids = self.__feature_ids, prep['feature_ids']
+        if w is None or self._ulabels is None \
+               or w.shape[1] != prep['c_to_fit'] \
+               or len(self._ulabels) != len(prep['ulabels']) \
+               or np.any(self._ulabels != prep['ulabels']):
+            w = None
+        elif old_ids is not None and new_ids is not None:
+            nbias = nd - len(new_ids)
+            if w.shape[0] - len(old_ids) != nbias:
+                # has_bias was changed
+                w = None
+            else:
+                old_index = dict(zip(old_ids, xrange(len(old_ids))))
+                new_rows, old_rows = [], []
+                for i, fid in enumerate(new_ids):
+                    if fid in old_index:
+                        new_rows.append(i)
+                        old_rows.append(old_index[fid])
+                w_new = np.zeros((nd, w.shape[1]), dtype=np.double)
+                w_new[new_rows] = w[old_rows]
+                if nbias:
+                    w_new[-1] = w[-1]
+                w = w_new
+        elif w.shape[0] != nd:
+            w = None
+        if __debug__ and w is None:
+            debug('SMLR_', "No suitable weights for a warm start")
+        return w
+
+
+    def fit_path(self, dataset, lms):
+        """Compute weights for a series of penalty terms (regularization path)
+
+        Optimization for every `lm` starts from the solution for the
+        previous one, while all the quantities which do not depend on `lm`
+        are computed only once.  It works best if `lms` are sorted in
+        decreasing order, i.e. from the most sparse solution on.  Upon
+        return, the classifier is trained with the last value of `lms`
+        (which is assigned to the `lm` parameter).
+
+        Parameters
+        ----------
+        dataset : Dataset
+          Training dataset.
+        lms : sequence of float
+          Values of the penalty term lambda.
+
+        Returns
+        -------
+        list of arrays
+          Weights (features x labels, followed by a row of biases if
+          `has_bias`) for every value of `lms`.
+        """
+        prep = self._prepare_training(dataset)
+        state = self._init_state(prep)
+        path = []
+        for lm in lms:
+            cycles = self._fit(prep, lm, state)
+            if __debug__:
+                debug('SMLR', "Regularization path: lm=%g took %d cycles"
+                      % (lm, cycles))
+            path.append(state[0].copy())
+        # assign resultant state, training would merely verify convergence
+        self.params.lm = lms[-1]
+        self.__init_weights = path[-1]
+        self.train(dataset)
+        return path
+
+
+    def _train(self, dataset):
+        """Train the classifier using `dataset` (`Dataset`).
+        """
+        prep = self._prepare_training(dataset)
+        X = prep['X']
+
+        w = self.__init_weights
+        self.__init_weights = None
+        if w is None and self.params.warm_start:
+            w = self._get_warm_weights(prep)
+        state = self._init_state(prep, w)
+        self._ulabels = prep['ulabels'].copy()
+
+        cycles = self._fit(prep, self.params.lm, state)
+        w = state[0]
 
         # see if unsparsify the weights
         if self.params.unsparsify:
@@ -439,6 +594,7 @@ class SMLR(Classifier):
 
         # save the weights
         self.__weights_all = w
+        self.__feature_ids = prep['feature_ids']
         self.__weights = w[:dataset.nfeatures, :]
 
         if self.ca.is_enabled('feature_ids'):
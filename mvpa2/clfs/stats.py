@@ -21,6 +21,7 @@ from mvpa2.base.state import ClassWithCollections, ConditionalAttribute
 from mvpa2.generators.permutation import AttributePermutator
 from mvpa2.base.types import is_datasetlike
 from mvpa2.datasets import Dataset
+from mvpa2.kernels.base import prepare_sample_ids
 
 if __debug__:
     from mvpa2.base import debug
@@ -371,6 +372,10 @@ class MCNullDist(NullDist):
         dist_samples = []
         """Holds the values for randomized labels."""
 
+        # permuted datasets would share identity of samples
+        # (so kernel values could be reused by a CachedKernel)
+        ds = prepare_sample_ids(ds, measure)
+
         # estimate null-distribution
         # TODO this really needs to be more clever! If data samples are
         # shuffled within a class it really makes no difference for the
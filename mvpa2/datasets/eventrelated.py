@@ -10,7 +10,6 @@
 
 __docformat__ = 'restructuredtext'
 
-import copy
 import numpy as np
 from mvpa2.misc.support import Event, value2idx
 from mvpa2.base.dataset import _expand_attribute
@@ -182,34 +181,12 @@ def eventrelated_dataset(ds, events=None, time_attr=None, match='prev',
                      'next': 'ceil',
                      'closest': 'round'}[match]
 
-    if not time_attr is None:
-        tvec = ds.sa[time_attr].value
-        # we are asked to convert onset time into sample ids
-        descr_events = []
-        for ev in events:
-            # do not mess with the input data
-            ev = copy.deepcopy(ev)
-            # best matching sample
-            idx = value2idx(ev['onset'], tvec, conv_strategy)
-            # store offset of sample time and real onset
-            ev['orig_offset'] = ev['onset'] - tvec[idx]
-            # rescue the real onset into a new attribute
-            ev['orig_onset'] = ev['onset']
-            ev['orig_duration'] = ev['duration']
-            # figure out how many samples we need
-            ev['duration'] = \
-                    len(tvec[idx:][tvec[idx:] < ev['onset'] + ev['duration']])
-            # new onset is sample index
-            ev['onset'] = idx
-            descr_events.append(ev)
-    else:
-        descr_events = events
     # convert the event specs into the format expected by BoxcarMapper
     # take the first event as an example of contained keys
     evvars = {}
-    for k in descr_events[0]:
+    for k in events[0]:
         try:
-            evvars[k] = [e[k] for e in descr_events]
+            evvars[k] = [e[k] for e in events]
         except KeyError:
             raise ValueError("Each event property must be present for all "
                              "events (could not find '%s')" % k)
@@ -218,6 +195,33 @@ def eventrelated_dataset(ds, events=None, time_attr=None, match='prev',
         if not p in evvars:
             raise ValueError("'%s' is a required property for all events."
                              % p)
+
+    if not time_attr is None:
+        tvec = ds.sa[time_attr].value
+        # we are asked to convert onset time into sample ids
+        onsets = np.asanyarray(evvars['onset'])
+        durations = np.asanyarray(evvars['duration'])
+        if np.all(tvec[1:] >= tvec[:-1]):
+            # best matching samples
+            idx = _values2idx(onsets, tvec, conv_strategy)
+            # figure out how many samples we need
+            nsamples = np.maximum(
+                np.searchsorted(tvec, onsets + durations, side='left') - idx,
+                0)
+        else:
+            idx = np.array([value2idx(onset, tvec, conv_strategy)
+                                for onset in onsets])
+            nsamples = np.array(
+                [len(tvec[i:][tvec[i:] < onset + duration])
+                    for i, onset, duration in zip(idx, onsets, durations)])
+        # store offset of sample time and real onset
+        evvars['orig_offset'] = onsets - tvec[idx]
+        # rescue the real onset into a new attribute
+        evvars['orig_onset'] = evvars['onset']
+        evvars['orig_duration'] = evvars['duration']
+        evvars['duration'] = nsamples
+        # new onset is sample index
+        evvars['onset'] = idx
     boxlength = max(evvars['duration'])
     if __debug__:
         if not max(evvars['duration']) == min(evvars['duration']):
@@ -250,3 +254,33 @@ def eventrelated_dataset(ds, events=None, time_attr=None, match='prev',
         else:
             ds.sa[a] = evvars[a]
     return ds
+
+
+def _values2idx(values, x, solv='round'):
+    """Vectorized `value2idx` for an ascending array `x`.
+
+    Ties are resolved as by `value2idx`, i.e. in favor of the first
+    matching element.
+    """
+    nx = len(x)
+    # closest larger (or equal) element
+    ceil = np.searchsorted(x, values, side='left')
+    # closest smaller (or equal) element -- the first of identical ones
+    floor = np.searchsorted(x, values, side='right') - 1
+    floor = np.searchsorted(x, x[np.maximum(floor, 0)], side='left')
+    if solv == 'ceil':
+        # value2idx yields the first element if there is no larger one
+        idx = np.where(ceil < nx, ceil, 0)
+    elif solv == 'floor':
+        idx = np.where(x[0] <= values, floor, 0)
+    elif solv == 'round':
+        has_ceil = ceil < nx
+        ceil = np.minimum(ceil, nx - 1)
+        idx = np.where(has_ceil & (x[0] <= values)
+                         & (np.abs(x[ceil] - values) < np.abs(x[floor] - values)),
+                       ceil, floor)
+        # no smaller element
+        idx = np.where(x[0] <= values, idx, ceil)
+    else:
+        raise ValueError("Unkown resolving method '%s'." % solv)
+    return idx
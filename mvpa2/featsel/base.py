@@ -86,6 +86,13 @@ class FeatureSelection(SliceMapper):
         return mdata
 
 
+    def _get_fused_ops(self, data, shape):
+        # with a space, the input dataset gets modified
+        if not self.get_space() is None or not len(shape) == 1:
+            return None
+        return [('select', self._slicearg)]
+
+
     def _forward_dataset(self, dataset):
         # XXX this should probably not affect the source dataset, but right now
         # init_origid is not flexible enough
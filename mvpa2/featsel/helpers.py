@@ -19,6 +19,28 @@ from mvpa2.base.state import ClassWithCollections, ConditionalAttribute
 if __debug__:
     from mvpa2.base import debug
 
+def _argpartition(a, kth):
+    """Indices that would partition `a` around its `kth` smallest element.
+
+    Falls back to a full `argsort` for NumPy versions without
+    `argpartition`.
+    """
+    if hasattr(np, 'argpartition'):
+        return np.argpartition(a, kth)
+    return np.argsort(a)
+
+
+def _get_tail_ids(values, nelements, tail):
+    """IDs of the `nelements` lowest or highest values in no particular order.
+    """
+    nvalues = len(values)
+    if nelements >= nvalues:
+        return np.arange(nvalues)
+    if tail == 'lower':
+        return _argpartition(values, nelements)[:nelements]
+    else:
+        return _argpartition(values, nvalues - nelements)[nvalues - nelements:]
+
 #
 # Functors to be used for FeatureSelection
 #
@@ -274,8 +296,24 @@ class ElementSelector(ClassWithCollections):
         ----------
         seq
            Sequence based on values of which to perform the selection.
-           If `Dataset`, then only 1st sample is taken.
+           If `Dataset`, then only 1st sample is taken.  Any other iterable,
+           which is neither a list, a tuple nor an array (e.g. a generator),
+           is taken as a stream of consecutive chunks of the sequence, each
+           of them being a sequence or a `Dataset` itself.
+
+        Returns
+        -------
+        array
+          IDs of the selected elements.
         """
+        if isinstance(seq, (AttrDataset, np.ndarray, list, tuple)):
+            return self._call(self._get_values(seq))
+        return self._call_chunks(self._get_values(chunk) for chunk in seq)
+
+
+    @staticmethod
+    def _get_values(seq):
+        """Verify a sequence and extract the values from a `Dataset`"""
         if isinstance(seq, AttrDataset):
             if len(seq)>1:
                 raise ValueError(
@@ -292,14 +330,24 @@ class ElementSelector(ClassWithCollections):
                     "inputs (such as ndarrays with more than a single "
                     "dimension.  We got %s with shape %s "
                     "as input." % (seq.__class__, shape))
-        return self._call(seq)
+        return seq
+
 
     def _call(self, seq):
-        """Implementations in derived classed have to return a list of selected
-        element IDs based on the given sequence.
+        """Implementations in derived classed have to return an array of
+        selected element IDs based on the given sequence.
         """
         raise NotImplementedError
 
+
+    def _call_chunks(self, chunks):
+        """Select elements from a sequence given as consecutive chunks.
+
+        By default the chunks get concatenated into a single sequence.
+        Derived classes might override it to avoid holding all values at once.
+        """
+        return self._call(np.concatenate([np.atleast_1d(c) for c in chunks]))
+
     mode = property(fget=lambda self:self.__mode, fset=_set_mode)
 
 
@@ -385,10 +433,26 @@ class RangeElementSelector(ElementSelector):
         return result
 
 
+    def _call_chunks(self, chunks):
+        """Select elements chunk by chunk -- values are judged individually.
+        """
+        results = []
+        offset = 0
+        for chunk in chunks:
+            chunk = np.atleast_1d(chunk)
+            results.append(self._call(chunk) + offset)
+            offset += len(chunk)
+        if not len(results):
+            return np.array([], dtype=int)
+        return np.concatenate(results)
+
+
 class TailSelector(ElementSelector):
     """Select elements from a tail of a distribution.
 
     The default behaviour is to discard the lower tail of a given distribution.
+    The tail is determined by partial selection, hence the full distribution
+    never needs to be sorted.
     """
 
     # TODO: 'both' to select from both tails
@@ -436,35 +500,36 @@ class TailSelector(ElementSelector):
         """
         # TODO: Think about selecting features which have equal values but
         #       some are selected and some are not
-        len_seq = len(seq)
+        seq = np.asanyarray(seq)
         # how many to select (cannot select more than available)
-        nelements = min(self._get_n_elements(seq), len_seq)
-
-        # make sure that data is ndarray and compute a sequence rank matrix
-        # lowest value is first
-        seqrank = np.array(seq).argsort()
-
-        if self.mode == 'discard' and self.__tail == 'upper':
-            good_ids = seqrank[:-1*nelements]
-            self.ca.ndiscarded = nelements
-        elif self.mode == 'discard' and self.__tail == 'lower':
-            good_ids = seqrank[nelements:]
-            self.ca.ndiscarded = nelements
-        elif self.mode == 'select' and self.__tail == 'upper':
-            good_ids = seqrank[-1*nelements:]
-            self.ca.ndiscarded = len_seq - nelements
-        else: # select lower tail
-            good_ids = seqrank[:nelements]
-            self.ca.ndiscarded = len_seq - nelements
+        nelements = min(self._get_n_elements(seq), len(seq))
+        # partial selection of the tail is sufficient, no need to sort it all
+        tail_ids = _get_tail_ids(seq, nelements, self.__tail)
+        return self._select_tail(tail_ids, len(seq))
+
+
+    def _select_tail(self, tail_ids, len_seq):
+        """Returns selected IDs given the IDs of the elements in the tail.
+        """
+        if self.mode == 'select':
+            good_ids = tail_ids
+            self.ca.ndiscarded = len_seq - len(tail_ids)
+        else:
+            # the complement is already in order
+            mask = np.ones(len_seq, dtype=np.bool)
+            mask[tail_ids] = False
+            good_ids = mask.nonzero()[0]
+            self.ca.ndiscarded = len(tail_ids)
 
         # sort ids to keep order
         # XXX should we do here are leave to other place
         if self.__sort:
-            good_ids.sort()
+            good_ids = np.sort(good_ids)
+
+        return good_ids
+
 
-        # only return proper slice args: this is a list of int ids, hence return
-        # a list not an array
-        return list(good_ids)
+    tail = property(fget=lambda self: self.__tail, fset=_set_tail)
 
 
 
@@ -495,6 +560,27 @@ class FixedNElementTailSelector(TailSelector):
         return self.__nelements
 
 
+    def _call_chunks(self, chunks):
+        """Select elements while keeping only the tail in memory.
+        """
+        nelements = self.__nelements
+        tail = self.tail
+        values = np.array([])
+        ids = np.array([], dtype=int)
+        len_seq = 0
+        for chunk in chunks:
+            chunk = np.atleast_1d(chunk)
+            values = np.concatenate((values, chunk))
+            ids = np.concatenate((ids, np.arange(len_seq,
+                                                 len_seq + len(chunk))))
+            len_seq += len(chunk)
+            # forget whatever cannot be part of the tail anymore
+            if len(values) > nelements:
+                keep = _get_tail_ids(values, nelements, tail)
+                values, ids = values[keep], ids[keep]
+        return self._select_tail(ids, len_seq)
+
+
     ##REF: Name was automagically refactored
     def _set_n_elements(self, nelements):
         if __debug__:
@@ -16,7 +16,8 @@ set and include important features successively.
 __docformat__ = 'restructuredtext'
 
 import numpy as np
-from mvpa2.support.copy import copy
+from mvpa2.support.copy import copy, deepcopy
+from mvpa2.misc.support import get_nproc, parallel_map
 from mvpa2.featsel.base import StaticFeatureSelection, IterativeFeatureSelection
 from mvpa2.featsel.helpers import NBackHistoryStopCrit, \
                                  FixedNElementTailSelector, \
@@ -44,6 +45,14 @@ class IFS(IterativeFeatureSelection):
     For each feature selection the transfer error on some testdatset is
     computed. This procedure is repeated until a given `StoppingCriterion`
     is reached.
+
+    Candidate features are scored on the training part of the dataset
+    produced by the splitter.  If the feature measure provides a
+    ``call_candidates()`` method (e.g. `CrossValidation` of GNB, LDA or
+    RidgeReg) all candidates are evaluated at once from sufficient
+    statistics of the already selected features.  Otherwise the measure
+    gets computed for every candidate, optionally spread across `nproc`
+    threads, each working with its own copy of the measure.
     """
     def __init__(self,
                  fmeasure,
@@ -51,6 +60,7 @@ class IFS(IterativeFeatureSelection):
                  splitter,
                  fselector=FixedNElementTailSelector(1, tail='upper',
                                                      mode='select'),
+                 nproc=1,
                  **kwargs):
         """Initialize incremental feature search
 
@@ -66,15 +76,49 @@ class IFS(IterativeFeatureSelection):
           This splitter instance has to generate at least two dataset splits
           when called with the input dataset. The first split serves as the
           training dataset and the second as the evaluation dataset.
+        nproc : None or int
+          Number of threads to evaluate candidate features with.  If None
+          -- as many as there are cores.
         """
         # bases init first
         IterativeFeatureSelection.__init__(self, fmeasure, pmeasure, splitter,
                                            fselector, **kwargs)
+        self.nproc = nproc
+
+
+    def _get_candidate_measures(self, ds, selected, candidates):
+        """Compute the feature measure for all candidate feature sets
+
+        Every candidate set consists of all `selected` features plus a single
+        feature from `candidates`.
+        """
+        fmeasure = self._fmeasure
+        if hasattr(fmeasure, 'call_candidates'):
+            measures = fmeasure.call_candidates(ds, selected, candidates)
+            if measures is not None:
+                return measures
+
+        nproc = min(get_nproc(self.nproc), len(candidates))
+
+        def measure_block(block):
+            # stateful measures cannot be shared across threads
+            if nproc > 1:
+                measure = deepcopy(fmeasure)
+            else:
+                measure = fmeasure
+            measures = []
+            for candidate in block:
+                if __debug__:
+                    debug('IFSC', "Tested %i" % candidate, cr=True)
+                measures.append(measure(ds[:, selected + [candidate]]))
+            return measures
+
+        blocks = [list(b) for b in np.array_split(candidates, nproc)]
+        return sum(parallel_map(measure_block, blocks, nproc=nproc), [])
 
 
     def _train(self, ds):
         # local binding
-        fmeasure = self._fmeasure
         fselector = self._fselector
         scriterion = self._stopping_criterion
         bestdetector = self._bestdetector
@@ -89,33 +133,17 @@ class IFS(IterativeFeatureSelection):
         # results in here please
         results = None
 
+        # the splitter only selects samples, hence the training part can be
+        # split off once and sliced for every candidate feature set
+        fmeasure_ds = self._splitter.generate(ds).next()
+
         # as long as there are candidates left
         # the loop will most likely get broken earlier if the stopping
         # criterion is reached
         while len(candidates):
             # measures for all candidates
-            measures = []
-
-            # for all possible candidates
-            for i, candidate in enumerate(candidates):
-                if __debug__:
-                    debug('IFSC', "Tested %i" % i, cr=True)
-
-                # take the new candidate and all already selected features
-                # select a new temporay feature subset from the dataset
-                # slice the full dataset, because for the initial iteration
-                # steps this will be much mure effecient than splitting the
-                # full ds into train and test at first
-                fslm = StaticFeatureSelection(selected + [candidate])
-                fslm.train(ds)
-                candidate_ds = fslm(ds)
-                # activate the dataset splitter
-                dsgen = self._splitter.generate(candidate_ds)
-                # and derived the dataset part that is used for computing the selection
-                # criterion
-                trainds = dsgen.next()
-                # compute data measure on the training part of this feature set
-                measures.append(fmeasure(trainds))
+            measures = self._get_candidate_measures(fmeasure_ds, selected,
+                                                    candidates)
 
             # relies on ds.item() to work properly
             measures = [np.asscalar(m) for m in measures]
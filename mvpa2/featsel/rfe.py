@@ -88,6 +88,16 @@ class RFE(IterativeFeatureSelection):
     ...           # custom description
     ...           descr='LinSVM+RFE(splits_avg)' )
 
+    Working datasets of each step are sliced out of the original training
+    and testing datasets by the ids of the surviving features, so no
+    chains of intermediate copies are created.  Features of the training
+    dataset get origids assigned (unless present), so classifiers capable
+    of warm starts (e.g. ``SMLR(warm_start=True)``) could start from the
+    weights of the previous step restricted to the surviving features.
+    `FractionTailSelector` (with ``mode='discard'``) as `fselector`
+    provides a geometric elimination schedule, i.e. a constant fraction of
+    the features is removed at every step, which requires only a
+    logarithmic number of steps.
     """
 
     history = ConditionalAttribute(
@@ -158,6 +168,12 @@ class RFE(IterativeFeatureSelection):
         # get the initial split into train and test
         dataset, testdataset = self._get_traintest_ds(ds)
 
+        if not 'origids' in dataset.fa:
+            # allow learners to match features among the steps (e.g. for
+            # warm starts) without altering the input dataset
+            dataset = dataset.copy(deep=False)
+            dataset.init_origids('features')
+
         if __debug__:
             debug('RFEC',
                   "Initiating RFE with training on %s and testing using %s",
@@ -199,11 +215,13 @@ class RFE(IterativeFeatureSelection):
         sensitivity = None
         """Contains the latest sensitivity map."""
 
+        base_sensitivity = None
+        """Sensitivity map of all features if it is not recomputed."""
+
         result_selected_ids = orig_feature_ids
         """Resultant ids of selected features. Since the best is not
         necessarily is the last - we better keep this one around. By
         default -- all features are there"""
-        selected_ids = result_selected_ids
 
         while wdataset.nfeatures > 0:
 
@@ -217,7 +235,7 @@ class RFE(IterativeFeatureSelection):
             ca.history[orig_feature_ids] = step
 
             # Compute sensitivity map
-            if self.__update_sensitivity or sensitivity == None:
+            if self.__update_sensitivity or base_sensitivity is None:
                 sensitivity = self._fmeasure(wdataset)
                 if len(sensitivity) > 1:
                     raise ValueError(
@@ -225,6 +243,12 @@ class RFE(IterativeFeatureSelection):
                             "'%s' returned %i sensitivities."
                             % (self._fmeasure.__class__.__name__,
                                len(sensitivity)))
+                if not self.__update_sensitivity:
+                    base_sensitivity = sensitivity
+            else:
+                # select corresponding sensitivity values since they are
+                # not recomputed
+                sensitivity = base_sensitivity[:, orig_feature_ids]
 
             if ca.is_enabled("sensitivities"):
                 ca.sensitivities.append(sensitivity)
@@ -265,14 +289,13 @@ class RFE(IterativeFeatureSelection):
                       "Sensitivity: %s, nfeatures_selected=%d, selected_ids: %s" %
                       (sensitivity, len(selected_ids), selected_ids))
 
+            # keep the original order of the features
+            selected_ids = np.sort(selected_ids)
+            orig_feature_ids = orig_feature_ids[selected_ids]
 
-            # Create a dataset only with selected features
-            wdataset = wdataset[:, selected_ids]
-
-            # select corresponding sensitivity values if they are not
-            # recomputed
-            if not self.__update_sensitivity:
-                sensitivity = sensitivity[selected_ids]
+            # Create a dataset only with selected features straight from
+            # the original one
+            wdataset = dataset[:, orig_feature_ids]
 
             # need to update the test dataset as well
             # XXX why should it ever become None?
@@ -282,16 +305,10 @@ class RFE(IterativeFeatureSelection):
             #      on a wdataset
             # TODO: document these cases in this class
             if not testdataset is None:
-                wtestdataset = wtestdataset[:, selected_ids]
+                wtestdataset = testdataset[:, orig_feature_ids]
 
             step += 1
 
-            # WARNING: THIS MUST BE THE LAST THING TO DO ON selected_ids
-            selected_ids.sort()
-            if self.ca.is_enabled("history") \
-                   or self.ca.is_enabled('selected_ids'):
-                orig_feature_ids = orig_feature_ids[selected_ids]
-
             # we already have the initial sensitivities, so even for a shared
             # classifier we can cleanup here
             self._pmeasure.untrain()
@@ -20,18 +20,22 @@ Concerns:
 
 __docformat__ = 'restructuredtext'
 
+import threading
 import numpy as np
 
+from mvpa2.base import cfg
 from mvpa2.base.types import is_datasetlike
 from mvpa2.base.state import ClassWithCollections
 from mvpa2.base.param import Parameter
-from mvpa2.misc.sampleslookup import SamplesLookup # required for CachedKernel
+from mvpa2.misc.sampleslookup import SamplesLookup, \
+     assure_sample_ids # required for CachedKernel
 
 if __debug__:
     from mvpa2.base import debug
 
 __all__ = ['Kernel', 'NumpyKernel', 'CustomKernel', 'PrecomputedKernel',
-           'CachedKernel']
+           'CachedKernel', 'KernelCache', 'kernel_cache',
+           'holds_cached_kernel', 'prepare_sample_ids']
 
 class Kernel(ClassWithCollections):
     """Abstract class which calculates a kernel function between datasets
@@ -265,35 +269,175 @@ class PrecomputedKernel(NumpyKernel):
         pass
 
 
+class KernelCache(object):
+    """Memory-bounded storage of kernel matrices shared among `CachedKernel`\s
+
+    Entries are kept in the order of their use and the least recently used
+    ones get discarded whenever the total size of the stored kernel matrices
+    (and samples they were computed on) exceeds `maxbytes`.  Access is
+    guarded by a (reentrant) `lock`, so the cache can be shared among
+    threads.  `CachedKernel` holds it only to look up and update entries,
+    not while computing kernel values.  Copies of a cache refer to the same
+    storage.
+    """
+
+    def __init__(self, maxbytes=None):
+        """
+        Parameters
+        ----------
+        maxbytes : None or int
+          Upper bound on the memory occupied by the cache.  If None, the
+          value (in megabytes) of the 'cache size' option of the 'kernels'
+          section of the configuration is used (default: 512).
+        """
+        if maxbytes is None:
+            maxbytes = int(float(cfg.get('kernels', 'cache size',
+                                         default=512)) * 1024 ** 2)
+        self.maxbytes = maxbytes
+        self._entries = {}
+        self._order = []
+        """Keys from the least to the most recently used"""
+        self.lock = threading.RLock()
+
+
+    def __deepcopy__(self, memo):
+        # cache is meant to be shared among copies of the kernels
+        return self
+
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['lock']
+        return state
+
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.RLock()
+
+
+    def __len__(self):
+        return len(self._entries)
+
+
+    def __contains__(self, key):
+        return key in self._entries
+
+
+    def __repr__(self):
+        return "%s(maxbytes=%d)" % (self.__class__.__name__, self.maxbytes)
+
+
+    @property
+    def nbytes(self):
+        """Memory currently occupied by the cached entries"""
+        with self.lock:
+            return sum([e.nbytes for e in self._entries.itervalues()])
+
+
+    def _touch(self, key):
+        # to be called with the lock held
+        order = self._order
+        if key in order:
+            order.remove(key)
+        order.append(key)
+
+
+    def get(self, key):
+        """Return entry stored under `key` (or None) and mark it as used"""
+        with self.lock:
+            entry = self._entries.get(key, None)
+            if entry is not None:
+                self._touch(key)
+            return entry
+
+
+    def put(self, key, entry):
+        """Store `entry` under `key` evicting least recently used entries
+        """
+        with self.lock:
+            self._entries[key] = entry
+            self._touch(key)
+            self.shrink()
+
+
+    def shrink(self):
+        """Evict least recently used entries until the cache fits its bounds
+
+        The most recently used entry is never evicted, even if it alone
+        exceeds `maxbytes`.
+        """
+        with self.lock:
+            entries = self._entries
+            while len(entries) > 1 and self.nbytes > self.maxbytes:
+                key = self._order.pop(0)
+                entry = entries.pop(key)
+                if __debug__:
+                    debug('KRN', "Evicting cached kernel %s of %d bytes"
+                          % (key[1:], entry.nbytes))
+
+
+    def clear(self):
+        """Drop all cached entries"""
+        with self.lock:
+            self._entries.clear()
+            self._order = []
+
+
+kernel_cache = KernelCache()
+"""Default cache used by all `CachedKernel`\s"""
+
+
+class _KernelCacheEntry(object):
+    """Kernel matrix among all the seen samples of a single dataset"""
+
+    def __init__(self, ds):
+        self.lookup = SamplesLookup(ds)
+        self.samples = ds.samples.copy()
+        self.kfull = None
+        """Gets computed upon first use"""
+
+    @property
+    def nbytes(self):
+        nbytes = self.samples.nbytes
+        if self.kfull is not None:
+            nbytes += self.kfull.nbytes
+        return nbytes
+
+
 class CachedKernel(NumpyKernel):
     """Kernel which caches all data to avoid duplicate computation
 
     This kernel is very useful for any analysis which will retrain or
     repredict the same data multiple times, as this kernel will avoid
     recalculating the kernel function.  Examples of such analyses include cross
-    validation, bootstrapping, and model selection (assuming the kernel function
-    itself does not change, e.g. when selecting for C in an SVM).
-
-    The kernel will automatically cache any new data sent through compute, and
-    will be able to use this cache whenever a subset of this data is sent
-    through compute again.  If new (uncached) data is sent through compute, then
-    the cache is recreated from scratch.  Therefore, you should compute the
-    kernel on the entire superset of your data before using this kernel
-    normally (computing a new cache invalidates any previous cached data).
-
-    The cache is asymmetric for lhs and rhs, so compute(d1, d2) does not create
-    a cache usable for compute(d2, d1).
+    validation, bootstrapping, permutation testing and model selection.
+
+    Kernel values are stored per original dataset (as identified by its
+    `magic_id` and samples' origids, see
+    :class:`~mvpa2.misc.sampleslookup.SamplesLookup`) and values of the
+    kernel parameters in a `KernelCache`.  Whenever samples of a dataset
+    are not yet known to the cache (e.g. testing samples of the first fold
+    in a cross-validation), only kernel values between new and already
+    cached samples get computed and the cached matrix gets extended.  Hence
+    there is no need to precompute the kernel on the superset of the data,
+    and changing kernel parameters (or coming back to previous values) does
+    not invalidate other cached matrices.
+
+    Plain arrays (without origids) and pairs of unrelated datasets are
+    passed to the underlying kernel without caching.
+
+    .. note::
+       The underlying kernel function is assumed to be symmetric, which
+       is the case for all Mercer kernels.
     """
 
-    # TODO: Figure out how to design objects like CrossValidation etc to
-    # precompute this kernel automatically, making it transparent to the user
-
     @property
     def __kernel_name__(self):
         """Allows checking name of subkernel"""
         return self._kernel.__kernel_name__
 
-    def __init__(self, kernel=None, *args, **kwargs):
+    def __init__(self, kernel=None, cache=None, *args, **kwargs):
         """Initialize `CachedKernel`
 
         Parameters
@@ -301,35 +445,138 @@ class CachedKernel(NumpyKernel):
         kernel : Kernel
           Base kernel to cache.  Any kernel which can be converted to a
           `NumpyKernel` is allowed
+        cache : KernelCache, optional
+          Storage for computed kernel matrices.  By default the module-wide
+          `kernel_cache` is used, so kernel matrices get shared among
+          all `CachedKernel` instances (and copies of them).
         """
         super(CachedKernel, self).__init__(*args, **kwargs)
         self._kernel = kernel
+        self._cache_storage = cache
         self.params.update(self._kernel.params)
-        self._rhsids = self._lhsids = self._kfull = None
         self._recomputed = None
 
-    def _cache(self, ds1, ds2=None):
-        """Initializes internal lookups + _kfull via caching the kernel matrix
-        """
-        if __debug__ and 'KRN' in debug.active:
-            debug('KRN', "Caching %(inst)s for ds1=%(ds1)s, ds2=%(ds1)s"
-                  % dict(inst=self, ds1=ds1, ds2=ds2))
-
-        self._lhsids = SamplesLookup(ds1)
-        if (ds2 is None) or (ds2 is ds1):
-            self._rhsids = self._lhsids
-        else:
-            self._rhsids = SamplesLookup(ds2)
-
+    @property
+    def cache(self):
+        """`KernelCache` used by this kernel"""
+        if self._cache_storage is None:
+            return kernel_cache
+        return self._cache_storage
+
+    def _get_params_key(self):
+        """Hashable representation of the kernel and its parameter values"""
+        key = [self._kernel.__class__.__name__]
+        for name in sorted(self._kernel.params.keys()):
+            value = self._kernel.params[name].value
+            if isinstance(value, np.ndarray):
+                value = (value.dtype.str, value.shape, value.tostring())
+            key.append((name, value))
+        return tuple(key)
+
+    def _compute_raw(self, d1, d2):
+        """Compute underlying kernel and return it as a plain array"""
         ckernel = self._kernel
-        ckernel.compute(ds1, ds2)
-        self._kfull = ckernel.as_raw_np()
+        ckernel.compute(d1, d2)
+        k = ckernel.as_raw_np()
         ckernel.cleanup()
-        self._k = self._kfull
+        return k
 
-        self._recomputed = True
-        self.params.reset()
-        # TODO: store params representation for later comparison
+    def _is_valid(self, entry, ds):
+        """Whether cached samples agree with the ones of `ds`
+
+        Guards against stale entries, e.g. if data was changed in-place.
+        """
+        ids = entry.lookup.lookup_ids(ds.sa.origids)
+        known = ids >= 0
+        if not np.any(known):
+            return True
+        return np.array_equal(entry.samples[ids[known]], ds.samples[known])
+
+    def _update_entry(self, cache, entry, ds):
+        """Extend cached kernel matrix with samples of `ds` yet unknown
+
+        Kernel values get computed without holding the lock of the `cache`,
+        so other users of the cache are not blocked meanwhile.  If somebody
+        else extended `entry` in the meantime, whatever is still missing
+        gets computed anew.
+        """
+        while True:
+            # snapshot of the entry -- extensions replace, but never modify
+            # its samples and kernel matrix
+            with cache.lock:
+                samples, kfull = entry.samples, entry.kfull
+                if kfull is not None:
+                    new = entry.lookup.get_missing(ds)
+                    if not np.any(new):
+                        return
+                    new_samples = ds.samples[new]
+
+            if kfull is None:
+                kfull_ = self._compute_raw(samples, samples)
+            else:
+                nold, nnew = len(samples), len(new_samples)
+                if __debug__:
+                    debug('KRN', "Extending cached kernel of %d samples with "
+                          "%d new samples" % (nold, nnew))
+                kfull_ = np.empty((nold + nnew, nold + nnew))
+                kfull_[:nold, :nold] = kfull
+                kfull_[nold:, :nold] = self._compute_raw(new_samples, samples)
+                kfull_[:nold, nold:] = kfull_[nold:, :nold].T
+                kfull_[nold:, nold:] = self._compute_raw(new_samples,
+                                                         new_samples)
+            self._recomputed = True
+
+            with cache.lock:
+                if entry.samples is not samples or entry.kfull is not kfull:
+                    # got extended concurrently -- start over
+                    continue
+                if kfull is not None:
+                    entry.lookup.extend(ds)
+                    entry.samples = np.concatenate((samples, new_samples))
+                entry.kfull = kfull_
+
+    def _compute_cached(self, cache, ds1, ds2, force):
+        """Extract the kernel from (and extend) the cached one into self._k
+        """
+        with cache.lock:
+            key, entry = None, None
+            if 'magic_id' in ds1.a and 'origids' in ds1.sa:
+                key = (ds1.a.magic_id,) + self._get_params_key()
+                entry = None if force else cache.get(key)
+            if entry is not None and not self._is_valid(entry, ds1):
+                if __debug__:
+                    debug('KRN', "Discarding stale cached kernel for %s" % ds1)
+                entry = None
+            if entry is None:
+                entry = _KernelCacheEntry(ds1)
+                if key is None:
+                    # magic_id got assigned by the lookup
+                    key = (ds1.a.magic_id,) + self._get_params_key()
+                # make it available to others right away
+                cache.put(key, entry)
+            unrelated = ds2 is not None and ds2 is not ds1 \
+                        and not entry.lookup.is_derived(ds2)
+
+        if unrelated:
+            # kernel between unrelated datasets
+            self._k = self._compute_raw(ds1, ds2)
+            self._recomputed = True
+            return
+
+        self._update_entry(cache, entry, ds1)
+        if not (ds2 is None or ds2 is ds1):
+            self._update_entry(cache, entry, ds2)
+
+        with cache.lock:
+            lhsids = entry.lookup(ds1)
+            if ds2 is None or ds2 is ds1:
+                rhsids = lhsids
+            else:
+                rhsids = entry.lookup(ds2)
+            kfull = entry.kfull
+            # account for the grown entry
+            cache.put(key, entry)
+        self._k = kfull[np.ix_(lhsids, rhsids)]
 
     def compute(self, ds1, ds2=None, force=False):
         """Automatically computes and caches the kernel or extracts the
@@ -339,45 +586,83 @@ class CachedKernel(NumpyKernel):
         ----------
         force : bool
           If True it forces re-caching of the kernel.  It is advised
-          to be used whenever explicitly pre-caching the kernel and
-          it is known that data was changed.
+          to be used whenever it is known that the data was changed
+          in-place.
         """
         if __debug__ and 'KRN' in debug.active:
-            debug('KRN', "Computing kernel %(inst)s on ds1=%(ds1)s, ds2=%(ds1)s"
+            debug('KRN', "Computing kernel %(inst)s on ds1=%(ds1)s, ds2=%(ds2)s"
                   % dict(inst=self, ds1=ds1, ds2=ds2))
 
         # Flag lets us know whether cache was recomputed
         self._recomputed = False
 
-        #if self._ds_cached_info is not None:
-        # Check either those ds1, ds2 are coming from the same
-        # dataset as before
-
-        # TODO: figure out if data were modified...
-        # params_modified = True
-        changedData = False or force
-        if len(self.params.which_set()) or changedData \
-           or self._lhsids is None:
-            self._cache(ds1, ds2)# hopefully this will never reset values, just
-            # changed status
-        else:
-            # figure d1, d2
-            try:
-                lhsids = self._lhsids(ds1) #
-                if ds2 is None:
-                    rhsids = lhsids
-                else:
-                    rhsids = self._rhsids(ds2)
-                self._k = self._kfull[np.ix_(lhsids, rhsids)]
-            except KeyError:
-                self._cache(ds1, ds2)
+        if not is_datasetlike(ds1) \
+               or not (ds2 is None or is_datasetlike(ds2)):
+            # no identity of samples -- nothing to cache
+            self._k = self._compute_raw(ds1, ds2)
+            self._recomputed = True
+            return
+
+        self._compute_cached(self.cache, ds1, ds2, force)
 
         if __debug__ and self._recomputed:
             debug('KRN',
-                  "Kernel %(inst)s was recomputed on ds1=%(ds1)s, ds2=%(ds1)s"
+                  "Kernel %(inst)s was recomputed on ds1=%(ds1)s, ds2=%(ds2)s"
                   % dict(inst=self, ds1=ds1, ds2=ds2))
 
 
+def holds_cached_kernel(obj):
+    """Whether `obj` (e.g. a measure or a classifier) uses a `CachedKernel`
+
+    Attributes and parameters of `obj` are searched recursively.  Callers
+    (e.g. cross-validation) establish samples identity only if it is of
+    any use for a kernel cache.
+    """
+    return _holds_cached_kernel(obj, set())
+
+
+def prepare_sample_ids(ds, obj):
+    """Provide `ds` with samples identity if `obj` uses a `CachedKernel`
+
+    Datasets generated from the returned one (e.g. splits or permutations)
+    can then be matched against each other by the kernel cache.  Identity
+    is established on a shallow copy, so `ds` itself is never modified.
+
+    Returns
+    -------
+    Dataset
+      `ds` itself, or its shallow copy with samples' origids and dataset's
+      magic_id.
+    """
+    if not is_datasetlike(ds) or not holds_cached_kernel(obj) \
+           or ('origids' in ds.sa and 'magic_id' in ds.a):
+        return ds
+    ds = ds.copy(deep=False)
+    assure_sample_ids(ds)
+    return ds
+
+
+def _holds_cached_kernel(obj, seen):
+    if id(obj) in seen:
+        return False
+    seen.add(id(obj))
+    if isinstance(obj, CachedKernel):
+        return True
+    if isinstance(obj, (list, tuple)):
+        values = obj
+    elif isinstance(obj, ClassWithCollections):
+        attrs = vars(obj)
+        values = [v for k, v in attrs.iteritems() if k != '_collections']
+        params = attrs.get('_collections', {}).get('params', {})
+        values += [p.value for p in params.itervalues()]
+    else:
+        return False
+    for v in values:
+        if _holds_cached_kernel(v, seen):
+            return True
+    return False
+
+
 __BOGUS_NOTES__ = """
 if ds1 is the "derived" dataset as it was computed on:
     * ds2 is None
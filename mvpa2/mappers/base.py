@@ -18,6 +18,7 @@ from mvpa2.base.node import ChainNode
 from mvpa2.base.types import is_datasetlike, accepts_dataset_as_samples
 from mvpa2.base.dochelpers import _str, _repr_attrs
 from mvpa2.base.dochelpers import borrowdoc
+from mvpa2.misc.support import get_group_slicers
 
 if __debug__:
     from mvpa2.base import debug
@@ -87,6 +88,34 @@ class Mapper(Learner):
     # The following methods are candidates for reimplementation in derived
     # classes, in cases where the provided default behavior is not appropriate.
     #
+    def _get_fused_ops(self, data, shape):
+        """Describe forward-mapping as a sequence of array operations.
+
+        This is a private method that can be reimplemented in derived
+        classes to allow `ChainMapper` to fuse them with other mappers into
+        a single pass over the samples (see `FusedForward`). The default
+        implementation returns None, i.e. the mapper cannot be fused.
+
+        Parameters
+        ----------
+        data : Dataset-like or array
+          Input of the chain segment that is to be fused. Only the number of
+          samples and the sample attributes are meaningful, since the
+          features might have been transformed by preceding mappers in the
+          segment.
+        shape : tuple
+          Shape of a single sample as it would be passed to this mapper.
+
+        Returns
+        -------
+        list or None
+          Operations as (name, arguments...) tuples (see
+          `FusedForward.add()`), or None if forward-mapping `data` cannot be
+          expressed in terms of these operations.
+        """
+        return None
+
+
     def _forward_dataset(self, dataset):
         """Forward-map a dataset.
 
@@ -250,16 +279,336 @@ class Mapper(Learner):
 
 
 
+class FusedForward(object):
+    """Forward-mapping of several mappers as a single pass over the samples.
+
+    Mappers describe their forward-mapping as array operations (see
+    `Mapper._get_fused_ops()`), which are merged whenever possible:
+    subsequent feature selections are merged into a single gather (that is
+    moved before any feature-wise scaling), feature-wise scaling is folded
+    into subsequent linear projections, and consecutive projections are
+    multiplied. All remaining operations work on a single copy of the
+    samples (none for mere contiguous selections).
+    """
+    def __init__(self, shape):
+        """
+        Parameters
+        ----------
+        shape : tuple
+          Shape of a single input sample.
+        """
+        self.shape = tuple(shape)
+        self.needs_dataset = False
+        self._ops = []
+
+
+    def __len__(self):
+        return len(self._ops)
+
+
+    def add(self, ops):
+        """Append operations.
+
+        Known operations are:
+
+        ('flatten',)
+          Flattening of multidimensional samples. Only possible as the
+          first operation.
+        ('select', slicearg)
+          Feature selection by any numpy slicing argument.
+        ('scale', scale, shift, dtype)
+          Feature-wise ``samples * scale + shift``. Integer samples are
+          converted into `dtype` first.
+        ('chunkscale', chunks_attr, params, dtype)
+          As 'scale', but with a ``(scale, shift)`` tuple per value of the
+          samples attribute `chunks_attr` in the `params` dict.
+        ('project', proj, offset)
+          ``np.dot(samples, proj) + offset`` (offset might be None).
+        ('rows', fx)
+          In-place operation along the samples axis, that commutes with
+          feature selections and has to be applied to floating point
+          samples.
+
+        Parameters
+        ----------
+        ops : list
+
+        Returns
+        -------
+        bool
+          False if the operations cannot be appended, in which case the
+          instance is not modified.
+        """
+        if len(self.shape) != 1 \
+           and not (len(ops) and ops[0][0] == 'flatten' and not len(self)):
+            # operations are defined for 2D samples only
+            return False
+        for op in ops:
+            getattr(self, '_add_' + op[0])(*op[1:])
+        return True
+
+
+    def _add_flatten(self):
+        self.shape = (int(np.prod(self.shape)),)
+
+
+    def _add_select(self, slicearg):
+        ids = np.arange(self.shape[0])[slicearg]
+        self.shape = (len(ids),)
+        # selections commute with all but projections and previous selections
+        for op in reversed(self._ops):
+            kind = op[0]
+            if kind == 'select':
+                op[1] = op[1][ids]
+                return
+            elif kind == 'project':
+                op[1] = op[1][:, ids]
+                op[2] = op[2][ids]
+                return
+            elif kind == 'scale':
+                op[1], op[2] = op[1][ids], op[2][ids]
+            elif kind == 'chunkscale':
+                op[2] = dict([(c, (scale[ids], shift[ids]))
+                              for c, (scale, shift) in op[2].iteritems()])
+        self._ops.insert(0, ['select', ids])
+
+
+    def _add_scale(self, scale, shift, dtype):
+        nfeatures = self.shape[0]
+        scale = np.ones(nfeatures) * scale
+        shift = np.zeros(nfeatures) + shift
+        last = self._ops[-1] if len(self._ops) else [None]
+        if last[0] in ('scale', 'project'):
+            last[1] = last[1] * scale
+            last[2] = last[2] * scale + shift
+        elif last[0] == 'chunkscale':
+            last[2] = dict([(c, (s * scale, o * scale + shift))
+                            for c, (s, o) in last[2].iteritems()])
+        else:
+            self._ops.append(['scale', scale, shift, dtype])
+
+
+    def _add_chunkscale(self, chunks_attr, params, dtype):
+        nfeatures = self.shape[0]
+        params = dict([(c, (np.ones(nfeatures) * scale,
+                            np.zeros(nfeatures) + shift))
+                       for c, (scale, shift) in params.iteritems()])
+        last = self._ops[-1] if len(self._ops) else [None]
+        if last[0] == 'scale':
+            # fold global scaling into each chunk's
+            self._ops[-1] = ['chunkscale', chunks_attr,
+                             dict([(c, (last[1] * s, last[2] * s + o))
+                                   for c, (s, o) in params.iteritems()]),
+                             last[3]]
+        else:
+            self._ops.append(['chunkscale', chunks_attr, params, dtype])
+        self.needs_dataset = True
+
+
+    def _add_project(self, proj, offset):
+        proj = np.asarray(proj)
+        if offset is None:
+            offset = np.zeros(proj.shape[1])
+        last = self._ops[-1] if len(self._ops) else [None]
+        if last[0] == 'scale':
+            self._ops[-1] = ['project', last[1][:, np.newaxis] * proj,
+                             np.dot(last[2], proj) + offset, proj.dtype]
+        elif last[0] == 'project' and proj.shape[1] <= proj.shape[0]:
+            # only if the product is not more expensive to apply
+            last[1] = np.dot(last[1], proj)
+            last[2] = np.dot(last[2], proj) + offset
+            last[3] = np.promote_types(last[3], proj.dtype)
+        else:
+            self._ops.append(['project', proj, offset, proj.dtype])
+        self.shape = (proj.shape[1],)
+
+
+    def _add_rows(self, fx):
+        self._ops.append(['rows', fx])
+        self.needs_dataset = True
+
+
+    def __call__(self, samples, sa=None):
+        """Map samples.
+
+        Parameters
+        ----------
+        samples : array
+        sa : Collection or None
+          Sample attributes, required for chunk-wise operations.
+        """
+        mapped = samples.reshape(len(samples), -1)
+        # whether mapped is a copy that can be modified in-place
+        owned = False
+        for op in self._ops:
+            kind = op[0]
+            if kind == 'select':
+                ids = op[1]
+                if len(ids) and ids[-1] - ids[0] == len(ids) - 1 \
+                   and np.all(np.diff(ids) == 1):
+                    # contiguous range -- view
+                    mapped = mapped[:, ids[0]:ids[-1] + 1]
+                else:
+                    mapped = mapped[:, ids]
+                    owned = True
+                continue
+            elif kind == 'project':
+                # precision of the projection matrix, as without fusing
+                dtype = np.result_type(mapped, op[3])
+                mapped = np.dot(mapped, op[1].astype(dtype, copy=False))
+                mapped += op[2]
+                owned = True
+                continue
+            # remaining operations work in-place on floating point data
+            if kind == 'rows':
+                dtype = np.promote_types(mapped.dtype, 'float')
+            elif np.issubdtype(mapped.dtype, np.integer):
+                dtype = op[-1]
+            else:
+                dtype = mapped.dtype
+            if not owned or mapped.dtype != dtype:
+                mapped = mapped.astype(dtype)
+                owned = True
+            if kind == 'scale':
+                mapped *= op[1]
+                mapped += op[2]
+            elif kind == 'chunkscale':
+                params = op[2]
+                chunks, groups = np.unique(sa[op[1]].value,
+                                           return_inverse=True)
+                for c in chunks:
+                    if not c in params:
+                        raise RuntimeError(
+                            "No scaling parameters for chunk '%s'. It "
+                            "probably wasn't present in the training "
+                            "dataset!?" % c)
+                for c, slicer in zip(chunks,
+                                     get_group_slicers(groups, len(chunks))):
+                    scale, shift = params[c]
+                    if isinstance(slicer, slice):
+                        mapped[slicer] *= scale
+                        mapped[slicer] += shift
+                    else:
+                        mapped[slicer] = mapped[slicer] * scale + shift
+            else:
+                op[1](mapped)
+        return mapped
+
+
+
 class ChainMapper(ChainNode):
     """Class that amends ChainNode with a mapper-like interface.
 
     ChainMapper supports sequential training of a mapper chain, as well as
     reverse-mapping and mapping of single samples.
+
+    Optionally, consecutive trained mappers that can describe their
+    forward-mapping as array operations (e.g. `FlattenMapper`, feature
+    selections, `ZScoreMapper`, chunk-wise `PolyDetrendMapper`, and
+    `ProjectionMapper` subclasses) are fused into a single pass over the
+    samples (see `FusedForward`). Instead of creating an intermediate
+    dataset for each mapper, samples are copied (at most) once, and sample
+    attributes are only passed on once. Feature attributes are determined
+    by mapping a single-sample dataset through the fused mappers.
     """
+    def __init__(self, nodes, fuse=False, **kwargs):
+        """
+        Parameters
+        ----------
+        nodes: list
+          Node instances.
+        fuse : bool
+          Whether to fuse the forward-mapping of consecutive mappers.
+          Results are identical, up to floating point rounding.
+        """
+        ChainNode.__init__(self, nodes, **kwargs)
+        self.fuse = fuse
+
+
     def forward(self, ds):
         return self(ds)
 
 
+    def __copy__(self):
+        out = super(ChainMapper, self).__copy__()
+        out.fuse = self.fuse
+        return out
+
+
+    def __repr__(self, prefixes=[]):
+        return super(ChainMapper, self).__repr__(
+            prefixes=prefixes
+            + _repr_attrs(self, ['fuse'], default=False))
+
+
+    def _call(self, ds):
+        if not self.fuse:
+            return super(ChainMapper, self)._call(ds)
+        mp = ds
+        nodes = self.nodes
+        i = 0
+        while i < len(nodes):
+            fused, fused_nodes = self._get_fused(nodes[i:], mp)
+            if fused is None:
+                mp = nodes[i](mp)
+                i += 1
+                continue
+            if __debug__:
+                debug('MAP', "%s: input (%s) -> fused nodes (%i-%i/%i): %s",
+                      (self.__class__.__name__, mp.shape, i + 1,
+                       i + len(fused_nodes), len(self),
+                       '-'.join([str(n) for n, p in fused_nodes])))
+            mp = self._forward_fused(fused, fused_nodes, mp)
+            i += len(fused_nodes)
+        return mp
+
+
+    def _get_fused(self, nodes, ds):
+        """Fuse the leading nodes.
+
+        Returns
+        -------
+        FusedForward, list
+          The fused operations and a list of (node, bool) tuples of the
+          fused nodes, with the flag indicating whether the node might
+          modify feature attributes. None, if less than two nodes can be
+          fused.
+        """
+        is_ds = is_datasetlike(ds)
+        fused = FusedForward(ds.shape[1:])
+        fused_nodes = []
+        for node in nodes:
+            if not isinstance(node, Mapper) or not node.is_trained \
+               or node.force_train or not node.get_postproc() is None:
+                break
+            ops = node._get_fused_ops(ds, fused.shape)
+            if ops is None or not fused.add(ops):
+                break
+            modifies_features = len([op for op in ops
+                                     if op[0] in ('flatten', 'select',
+                                                  'project')]) > 0
+            fused_nodes.append((node, modifies_features))
+        if len(fused_nodes) < 2 or (fused.needs_dataset and not is_ds):
+            return None, None
+        return fused, fused_nodes
+
+
+    def _forward_fused(self, fused, fused_nodes, ds):
+        if not is_datasetlike(ds):
+            return fused(ds)
+        samples = fused(ds.samples, ds.sa)
+        # determine the feature attributes by mapping a single sample
+        probe = ds[:1]
+        for node, modifies_features in fused_nodes:
+            if modifies_features:
+                probe = node.forward(probe)
+        mds = ds.copy(deep=False, fa=[])
+        mds.samples = samples
+        mds.fa.set_length_check(mds.nfeatures)
+        mds.fa.update(probe.fa)
+        return mds
+
+
     def forward1(self, data):
         """Forward data or datasets through the chain.
 
@@ -11,6 +11,7 @@
 __docformat__ = 'restructuredtext'
 
 import numpy as np
+from numpy.lib.stride_tricks import as_strided
 
 from mvpa2.mappers.base import Mapper
 from mvpa2.clfs.base import accepts_dataset_as_samples
@@ -27,6 +28,11 @@ class BoxcarMapper(Mapper):
 
     This mapper is somewhat unconventional since it doesn't preserve number
     of samples (ie the size of 0-th dimension).
+
+    Boxcars are extracted with a single gather of all their elements.  If
+    the startpoints are equally spaced and boxcars do not overlap, e.g.
+    for a continuous recording segmented into consecutive epochs, forward
+    mapping returns a strided view of the input data without copying it.
     """
     # TODO: extend with the possibility to provide real onset vectors and a
     #       samples attribute that is used to determine the actual sample that
@@ -68,22 +74,12 @@ class BoxcarMapper(Mapper):
 
         self.boxlength = int(boxlength)
         self.offset = offset
-        self.__selectors = None
-
-        # build a list of list where each sublist contains the indexes of to be
-        # averaged data elements
-        self.__selectors = [ slice(i + offset, i + offset + boxlength) \
-                             for i in startpoints ]
 
 
     def __reduce__(self):
-        # python < 2.6 cannot copy slices, we will use the constructor the get
-        # them back and additionally reapply the stae of the object (except for
-        # the bad bad slices)
+        # use the constructor to restore the object and additionally reapply
+        # the state of the object
         state = self.__dict__.copy()
-        badguy = '_%s__selectors' % self.__class__.__name__
-        if badguy in state:
-            del state[badguy]
         return (self.__class__,
                     (self.startpoints, self.boxlength, self.offset),
                     state)
@@ -145,7 +141,29 @@ class BoxcarMapper(Mapper):
         """
         # NOTE: _forward_dataset() relies on the assumption that the following
         # also works with 1D arrays and still yields sane results
-        return np.vstack([data[box][np.newaxis] for box in self.__selectors])
+        starts = self.startpoints + self.offset
+        boxlength = self.boxlength
+        if len(starts) > 1 and isinstance(data, np.ndarray) \
+           and not data.dtype == np.dtype('object') \
+           and starts.min() >= 0 and starts.max() + boxlength <= len(data):
+            steps = np.unique(np.diff(starts))
+            if len(steps) == 1 and steps[0] >= boxlength:
+                # equally spaced, non-overlapping boxcars: strided view
+                # without any copy
+                data = data[starts[0]:]
+                return as_strided(
+                    data,
+                    shape=(len(starts), boxlength) + data.shape[1:],
+                    strides=(steps[0] * data.strides[0],) + data.strides)
+        # gather all boxcars at once
+        return data[self._get_box_ids()]
+
+
+    def _get_box_ids(self):
+        """Returns the indices of all boxcar elements (#startpoints x boxlength)
+        """
+        return (self.startpoints + self.offset)[:, np.newaxis] \
+               + np.arange(self.boxlength)
 
 
     def _forward_dataset(self, dataset):
@@ -163,10 +181,9 @@ class BoxcarMapper(Mapper):
             mds.fa[k] = self.forward1(dataset.fa[k].value)
         # map old sample attributes -- which simply get stacked into one for all
         # boxcar elements/samples
+        box_ids = self._get_box_ids()
         for k in dataset.sa:
-            # using _forward_data() instead of forward(), since we know that
-            # this implementation can actually deal with 1D-arrays
-            mds.sa[k] = self._forward_data(dataset.sa[k].value)
+            mds.sa[k] = dataset.sa[k].value[box_ids]
         # create the box offset attribute if space name is given
         if self.get_space():
             mds.fa[self.get_space() + '_offsetidx'] = np.arange(self.boxlength,
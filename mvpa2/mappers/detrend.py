@@ -11,7 +11,7 @@
 __docformat__ = 'restructuredtext'
 
 import numpy as np
-from mvpa2.base.types import is_sequence_type
+from mvpa2.base.types import is_sequence_type, is_datasetlike
 
 from mvpa2.base import externals
 if externals.exists('scipy', raise_=True):
@@ -33,6 +33,7 @@ if externals.exists('scipy', raise_=True):
 
 from mvpa2.base.dochelpers import _str, borrowkwargs
 from mvpa2.mappers.base import Mapper
+from mvpa2.misc.support import get_group_slicers, parallel_map
 
 
 class PolyDetrendMapper(Mapper):
@@ -47,6 +48,12 @@ class PolyDetrendMapper(Mapper):
     determined from the number of unique values of the attribute and all samples
     with the same value are considered to be in the same chunk.
 
+    Unless optional regressors couple them, chunks are detrended
+    independently of each other, by projecting their samples onto the
+    orthogonal complement of the chunk's polynomials.  The projections are
+    shared between chunks with identical polynomials (e.g. of the same
+    length) and can be applied to several chunks in parallel.
+
     It is possible to provide a list of additional sample attribute names that
     will be used as confound regressors during detrending. This, for example,
     allows to use fMRI motion correction parameters to be considered.
@@ -84,7 +91,8 @@ class PolyDetrendMapper(Mapper):
     >>> np.sum(np.abs(mds)) < 0.00001
     True
     """
-    def __init__(self, polyord=1, chunks_attr=None, opt_regs=None, **kwargs):
+    def __init__(self, polyord=1, chunks_attr=None, opt_regs=None,
+                 inplace=False, nproc=1, **kwargs):
         """
         Parameters
         ----------
@@ -117,17 +125,27 @@ class PolyDetrendMapper(Mapper):
           name is already present in the input dataset its values are interpreted
           as sample coordinates in the space that should be spanned by the
           polynomials.
+        inplace : bool
+          If True, samples are detrended in-place, instead of on a copy,
+          reducing memory demands.
+        nproc : None or int
+          Number of chunks to detrend in parallel (threads).  If None -- as
+          many as there are cores.  Has no effect if optional regressors are
+          given, or detrending is not chunk-wise.
         """
         self.__chunks_attr = chunks_attr
         self.__polyord = polyord
         self.__opt_reg = opt_regs
+        self.inplace = inplace
+        self.nproc = nproc
 
         # things that come from train()
         self._polycoords = None
+        # dense regressors (global detrending or optional regressors)
         self._regs = None
-
-        # secret switch to perform in-place detrending
-        self._secret_inplace_detrend = False
+        # (samples slicer, orthonormal basis of the polynomials) per chunk
+        self._chunk_bases = None
+        self._ntrain = None
 
         # need to init last to prevent base class puking
         Mapper.__init__(self, **kwargs)
@@ -135,12 +153,17 @@ class PolyDetrendMapper(Mapper):
 
     def __repr__(self):
         s = super(PolyDetrendMapper, self).__repr__()
-        return s.replace("(",
-                         "(polyord=%i, chunks_attr=%s, opt_regs=%s, "
-                          % (self.__polyord,
-                             repr(self.__chunks_attr),
-                             repr(self.__opt_reg)),
-                         1)
+        s = s.replace("(",
+                      "(polyord=%i, chunks_attr=%s, opt_regs=%s, "
+                       % (self.__polyord,
+                          repr(self.__chunks_attr),
+                          repr(self.__opt_reg)),
+                      1)
+        if self.inplace:
+            s = s.replace("(", "(inplace=True, ", 1)
+        if self.nproc != 1:
+            s = s.replace("(", "(nproc=%r, " % self.nproc, 1)
+        return s
 
 
     def __str__(self):
@@ -159,8 +182,8 @@ class PolyDetrendMapper(Mapper):
         Parameters
         ----------
         ds : dataset
-        chunk_slicer : boolean array
-          True elements indicate samples selected for detrending.
+        chunk_slicer : slice or boolean or index array
+          Samples selected for detrending.
 
         Returns
         -------
@@ -170,8 +193,12 @@ class PolyDetrendMapper(Mapper):
         inspace = self.get_space()
         if chunk_slicer is None:
             nsamples = len(ds)
-        else:
+        elif isinstance(chunk_slicer, slice):
+            nsamples = len(xrange(*chunk_slicer.indices(len(ds))))
+        elif chunk_slicer.dtype == np.bool:
             nsamples = chunk_slicer.sum()
+        else:
+            nsamples = len(chunk_slicer)
 
         # if we don't have to take care of an inspace thing are easy
         if inspace is None:
@@ -199,6 +226,9 @@ class PolyDetrendMapper(Mapper):
         opt_reg = self.__opt_reg
         inspace = self.get_space()
         self._polycoords = None
+        self._regs = None
+        self._chunk_bases = None
+        self._ntrain = len(ds)
 
         # global detrending is desired
         if chunks_attr is None:
@@ -210,8 +240,10 @@ class PolyDetrendMapper(Mapper):
                 reg.append(legendre_(n, polycoords_scaled)[:, np.newaxis])
         # chunk-wise detrending is desired
         else:
-             # get the unique chunks
-            uchunks = ds.sa[chunks_attr].unique
+            # get the unique chunks and their samples
+            uchunks, chunk_ids = np.unique(ds.sa[chunks_attr].value,
+                                           return_inverse=True)
+            chunk_slicers = get_group_slicers(chunk_ids, len(uchunks))
 
             # Process the polyord to be a list with length of the number of
             # chunks
@@ -223,8 +255,14 @@ class PolyDetrendMapper(Mapper):
                                  "they sequence length must match the "
                                  "number of unique chunks in the dataset.")
 
+            # without optional regressors, all chunks can be detrended
+            # independently
+            blockwise = opt_reg is None
             # loop over each chunk
             reg = []
+            chunk_bases = []
+            # bases for identical polynomials
+            bases = {}
             update_polycoords = True
             # if the dataset know about the inspace we can store the
             # polycoords right away
@@ -236,14 +274,19 @@ class PolyDetrendMapper(Mapper):
                 # filled below -- we know that those polycoords are going to
                 # be ints
                 self._polycoords = np.empty(len(ds), dtype='int')
-            for n, chunk in enumerate(uchunks):
-                # get the indices for that chunk
-                cinds = ds.sa[chunks_attr].value == chunk
-
+            for n, cinds in enumerate(chunk_slicers):
                 # create the timespan
                 polycoords, polycoords_scaled = self._get_polycoords(ds, cinds)
                 if update_polycoords and not polycoords is None:
                     self._polycoords[cinds] = polycoords
+                if blockwise:
+                    key = (polyord[n], polycoords_scaled.tostring())
+                    if not key in bases:
+                        bases[key] = _get_basis(np.transpose(
+                            [legendre_(o, polycoords_scaled)
+                             for o in range(polyord[n] + 1)]))
+                    chunk_bases.append((cinds, bases[key]))
+                    continue
                 # create each polyord with the value for that chunk
                 for n in range(polyord[n] + 1):
                     newreg = np.zeros((len(ds), 1))
@@ -260,16 +303,19 @@ class PolyDetrendMapper(Mapper):
             for oreg in opt_reg:
                 reg.append(ds.sa[oreg].value[np.newaxis].T)
 
-        # combine the regs (time x reg)
-        self._regs = np.hstack(reg)
+        if chunks_attr is not None and blockwise:
+            self._chunk_bases = chunk_bases
+        else:
+            # combine the regs (time x reg)
+            self._regs = np.hstack(reg)
 
 
     def _forward_dataset(self, ds):
         # auto-train the mapper if not yet done
-        if self._regs is None:
+        if self._regs is None and self._chunk_bases is None:
             self.train(ds)
 
-        if self._secret_inplace_detrend:
+        if self.inplace:
             mds = ds
         else:
             # shallow copy to put the new stuff in
@@ -281,14 +327,14 @@ class PolyDetrendMapper(Mapper):
         polycoords = self._polycoords
 
         # is it possible to map that dataset?
-        if inspace is None and len(regs) != len(ds):
+        if inspace is None and self._ntrain != len(ds):
             raise ValueError("Cannot detrend the dataset, since it neither "
                              "provides location information of its samples "
                              "in the space spanned by the polynomials, "
                              "nor does it match the number of samples this "
                              "this mapper has been trained on. (got: %i "
                              " and was trained on %i)."
-                             % (len(ds), len(regs)))
+                             % (len(ds), self._ntrain))
         # do we have to handle the polynomial space somehow?
         if not inspace is None:
             if inspace in ds.sa:
@@ -299,7 +345,8 @@ class PolyDetrendMapper(Mapper):
                 # trained ones (that should be the common case and nothing needs
                 # to be done
                 # otherwise look whether we can find the right regressors
-                if not np.all(space_coords == polycoords):
+                if len(space_coords) != len(polycoords) \
+                   or not np.all(space_coords == polycoords):
                     # to make the stuff below work, we'd need to store chunk
                     # info too, otherwise we cannot determine the correct
                     # regressor rows
@@ -314,13 +361,26 @@ class PolyDetrendMapper(Mapper):
                 # let's put that information into the output dataset
                 mds.sa[inspace] = self._polycoords
 
+        if self._chunk_bases is not None:
+            if self.inplace:
+                # cast the data to float, since in-place operations below do
+                # not upcast!
+                if np.issubdtype(mds.samples.dtype, np.integer):
+                    mds.samples = mds.samples.astype('float')
+            else:
+                # important to assign to ensure COW behavior
+                mds.samples = ds.samples.astype(
+                    np.promote_types(ds.samples.dtype, 'float'))
+            self._detrend_chunks(mds.samples)
+            return mds
+
         # regression for each feature
         fit = np.linalg.lstsq(regs, ds.samples)
         # actually we are only interested in the solution
         # res[0] is (nregr x nfeatures)
         y = fit[0]
         # remove all and keep only the residuals
-        if self._secret_inplace_detrend:
+        if self.inplace:
             # if we are in evil mode do evil
 
             # cast the data to float, since in-place operations below do not
@@ -337,12 +397,48 @@ class PolyDetrendMapper(Mapper):
 
 
 
+    def _detrend_chunks(self, samples):
+        """Detrend floating point samples chunk-wise and in-place"""
+        def _detrend_chunk(chunk):
+            cinds, basis = chunk
+            csamples = samples[cinds]
+            # remove the projection onto the chunk's polynomials
+            trend = np.dot(basis, np.dot(basis.T, csamples))
+            if isinstance(cinds, slice):
+                # operate on the view
+                csamples -= trend
+            else:
+                samples[cinds] = csamples - trend
+
+        parallel_map(_detrend_chunk, self._chunk_bases, self.nproc)
+
+
+    def _get_fused_ops(self, data, shape):
+        # only chunk-wise detrending of the training samples commutes with
+        # feature selections
+        if self._chunk_bases is None or not self.get_space() is None \
+           or not is_datasetlike(data) or len(data) != self._ntrain:
+            return None
+        return [('rows', self._detrend_chunks)]
+
+
     def _forward_data(self, data):
         raise RuntimeError("%s cannot map plain data."
                            % self.__class__.__name__)
 
 
 
+def _get_basis(regs):
+    """Orthonormal basis of the space spanned by the regressors.
+
+    Uses the same rank cut-off as `np.linalg.lstsq`, hence projecting onto
+    the basis yields the same fit as a least squares regression.
+    """
+    U, s, Vh = np.linalg.svd(regs, full_matrices=False)
+    return U[:, s > s[0] * np.finfo(U.dtype).eps]
+
+
+
 @borrowkwargs(PolyDetrendMapper, '__init__')
 def poly_detrend(ds, **kwargs):
     """In-place polynomial detrending.
@@ -359,8 +455,7 @@ def poly_detrend(ds, **kwargs):
       For all other arguments, please see the documentation of
       PolyDetrendMapper.
     """
-    dm = PolyDetrendMapper(**kwargs)
-    dm._secret_inplace_detrend = True
+    dm = PolyDetrendMapper(inplace=True, **kwargs)
     # map
     mapped = dm.forward(ds)
     # and append the mapper to the dataset
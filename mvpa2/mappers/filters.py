@@ -10,17 +10,20 @@
 
 __docformat__ = 'restructuredtext'
 
+from fractions import gcd
+
 import numpy as np
 
 from mvpa2.base import externals
 if externals.exists('scipy', raise_=True):
-    from scipy.signal import resample
+    from scipy.signal import resample, firwin, iirfilter, lfilter, lfilter_zi
 
 from mvpa2.base.dochelpers import _str, borrowkwargs
 from mvpa2.mappers.base import Mapper
 from mvpa2.datasets import Dataset
 from mvpa2.base.dataset import vstack
 from mvpa2.generators.splitters import Splitter
+from mvpa2.misc.support import get_group_slicers
 
 
 class FFTResampleMapper(Mapper):
@@ -177,3 +180,536 @@ def fft_resample(ds, num, **kwargs):
     """
     dm = FFTResampleMapper(num, **kwargs)
     return dm.forward(ds)
+
+
+def _get_rows(x, start, stop, padtype=None):
+    """Rows `start:stop` of `x`, extended beyond its ends if necessary.
+
+    Parameters
+    ----------
+    x : array
+    start, stop : int
+      Row range, may extend beyond the first or last row of `x`.
+    padtype : {None, 'odd', 'even', 'constant'}
+      Extension of the signal beyond its ends: None pads with zeros, 'odd'
+      and 'even' reflect the signal at its end points (with and without
+      sign flip), and 'constant' repeats the end points.
+    """
+    n = len(x)
+    if start >= 0 and stop <= n:
+        return x[start:stop]
+    out = np.zeros((stop - start,) + x.shape[1:],
+                   dtype=np.result_type(x, np.float32))
+    lo, hi = max(start, 0), min(stop, n)
+    if lo < hi:
+        out[lo - start:hi - start] = x[lo:hi]
+    if padtype is None:
+        return out
+    # positions beyond either end
+    left = np.arange(start, min(0, stop))
+    right = np.arange(max(n, start), stop)
+    if padtype == 'constant':
+        out[left - start] = x[0]
+        out[right - start] = x[n - 1]
+        return out
+    if (len(left) and -left[0] > n - 1) \
+       or (len(right) and right[-1] > 2 * (n - 1)):
+        raise ValueError("Cannot extend %i samples by reflection beyond "
+                         "%i samples at the edges. Use shorter filters or "
+                         "longer chunks." % (n, max(-start, stop - n)))
+    if padtype == 'odd':
+        out[left - start] = 2 * x[0] - x[-left]
+        out[right - start] = 2 * x[n - 1] - x[2 * (n - 1) - right]
+    elif padtype == 'even':
+        out[left - start] = x[-left]
+        out[right - start] = x[2 * (n - 1) - right]
+    else:
+        raise ValueError("Unknown padtype '%s'." % padtype)
+    return out
+
+
+def _fir_filter(x, taps, out, padtype, block_size):
+    """Zero-phase FIR filtering by overlap-save block convolution.
+
+    The delay of the linear-phase filter (odd number of symmetric `taps`) is
+    compensated by shifting the input, hence every output block only needs
+    the matching input block plus ``len(taps) - 1`` overlapping samples.
+    """
+    ntaps = len(taps)
+    delay = ntaps // 2
+    nfft = 2 ** int(np.ceil(np.log2(block_size + ntaps - 1)))
+    # number of valid output samples per FFT
+    step = nfft - ntaps + 1
+    H = np.fft.rfft(taps, nfft)[:, np.newaxis]
+    for start in xrange(0, len(x), step):
+        stop = min(start + step, len(x))
+        seg = _get_rows(x, start + delay - ntaps + 1, stop + delay, padtype)
+        y = np.fft.irfft(np.fft.rfft(seg, nfft, axis=0) * H, nfft, axis=0)
+        # the first ntaps - 1 samples are wrapped around
+        out[start:stop] = y[ntaps - 1:ntaps - 1 + stop - start]
+
+
+def _iir_filter(x, b, a, out, padtype, padlen, block_size):
+    """Zero-phase IIR filtering by block-wise forward and backward passes.
+
+    Equivalent to ``scipy.signal.filtfilt``, but the filter state is
+    carried across blocks, so only a single block of the input is accessed
+    at a time.
+    """
+    n = len(x)
+    zi = lfilter_zi(b, a)[:, np.newaxis]
+    if padtype is None:
+        padlen = 0
+    # forward pass, starting on the extension beyond the first sample
+    if padlen:
+        ext = _get_rows(x, -padlen, 0, padtype)
+        state = lfilter(b, a, ext, axis=0, zi=zi * ext[0])[1]
+    else:
+        state = zi * x[0]
+    for start in xrange(0, n, block_size):
+        stop = min(start + block_size, n)
+        out[start:stop], state = lfilter(b, a, x[start:stop], axis=0,
+                                         zi=state)
+    # backward pass, starting on the extension beyond the last sample
+    if padlen:
+        ext = lfilter(b, a, _get_rows(x, n, n + padlen, padtype), axis=0,
+                      zi=state)[0]
+        state = lfilter(b, a, ext[::-1], axis=0, zi=zi * ext[-1])[1]
+    else:
+        state = zi * out[n - 1]
+    for stop in xrange(n, 0, -block_size):
+        start = max(stop - block_size, 0)
+        y, state = lfilter(b, a, out[start:stop][::-1], axis=0, zi=state)
+        out[start:stop] = y[::-1]
+
+
+def _polyphase_resample(x, up, down, taps, out, block_size):
+    """Polyphase resampling by a rational factor.
+
+    Equivalent to upsampling by zero insertion, filtering with `taps`
+    (delay compensated) and downsampling, but only the non-zero products
+    are computed, and only a single block of the input is accessed at a
+    time.
+    """
+    ntaps = len(taps)
+    delay = (ntaps - 1) // 2
+    # taps per phase
+    nphase = -(-ntaps // up)
+    # polyphase components, phases[p, j] = taps[p + j * up]
+    phases = np.zeros(nphase * up)
+    phases[:ntaps] = taps
+    phases = phases.reshape(nphase, up).T
+    for start in xrange(0, len(out), block_size):
+        stop = min(start + block_size, len(out))
+        # positions of the output samples in the upsampled signal
+        pos = np.arange(start, stop) * down + delay
+        coefs = phases[pos % up]
+        base = pos // up
+        lo = base[0] - nphase + 1
+        xb = _get_rows(x, lo, base[-1] + 1)
+        base -= lo
+        y = np.zeros((stop - start, x.shape[1]))
+        for j in xrange(nphase):
+            if up == 1:
+                # equally spaced input samples
+                rows = xb[base[0] - j:base[-1] - j + 1:down]
+            else:
+                rows = xb[base - j]
+            y += coefs[:, j:j + 1] * rows
+        out[start:stop] = y
+
+
+class _BlockFilterMapper(Mapper):
+    """Base class for mappers filtering samples block-wise along time.
+
+    Samples are processed in blocks of limited size (plus the overlap
+    required by the filter), so that memory-mapped samples never need to be
+    loaded completely. Only the mapped samples are kept in memory.
+
+    Derived classes implement `_filter()`, and `_get_nout()` if they change
+    the number of samples.
+    """
+    # whether each output sample corresponds to an input sample
+    _keeps_samples = True
+
+    def __init__(self, chunks_attr=None, block_size=4096, **kwargs):
+        """
+        Parameters
+        ----------
+        chunks_attr : str or None
+          If not None, this samples attribute defines chunks that will be
+          filtered individually. Samples of a chunk should be stored
+          contiguously, otherwise each chunk is copied prior to filtering.
+        block_size : int
+          Number of (output) samples processed at once.
+        """
+        Mapper.__init__(self, **kwargs)
+        self._chunks_attr = chunks_attr
+        self.block_size = block_size
+
+
+    def __repr__(self):
+        s = super(_BlockFilterMapper, self).__repr__()
+        if self.block_size != 4096:
+            s = s.replace("(", "(block_size=%r, " % self.block_size, 1)
+        return s.replace("(", "(chunks_attr=%r, " % self._chunks_attr, 1)
+
+
+    def _get_nout(self, n):
+        """Number of output samples for `n` input samples"""
+        return n
+
+
+    def _filter(self, x, out):
+        """Filter 2D `x` along its first axis and store the result in `out`
+        """
+        raise NotImplementedError
+
+
+    def _get_selectors(self, ds):
+        if self._chunks_attr is None:
+            return [slice(None)]
+        uchunks, chunk_ids = np.unique(ds.sa[self._chunks_attr].value,
+                                       return_inverse=True)
+        return get_group_slicers(chunk_ids, len(uchunks))
+
+
+    def _filter_chunks(self, data, selectors):
+        """Filter all chunks and return the results in a single array.
+
+        Results are placed at the positions of the input samples if these
+        are preserved, otherwise they are concatenated in chunk order.
+        """
+        if np.issubdtype(data.dtype, np.inexact):
+            dtype = data.dtype
+        else:
+            dtype = np.float
+        nsamples = [len(xrange(*sel.indices(len(data))))
+                        if isinstance(sel, slice) else len(sel)
+                    for sel in selectors]
+        nouts = [self._get_nout(n) for n in nsamples]
+        out = np.empty((sum(nouts),) + data.shape[1:], dtype=dtype)
+        if self._keeps_samples:
+            out_selectors = selectors
+        else:
+            offsets = np.cumsum([0] + nouts)
+            out_selectors = [slice(o, o + n)
+                             for o, n in zip(offsets[:-1], nouts)]
+        for sel, osel, nout in zip(selectors, out_selectors, nouts):
+            # views for contiguous chunks (e.g. of memory-mapped samples)
+            x = data[sel]
+            x = x.reshape(len(x), -1)
+            if isinstance(osel, slice):
+                # contiguous rows, hence a view
+                self._filter(x, out[osel].reshape(nout, -1))
+            else:
+                chunk_out = np.empty((nout, x.shape[1]), dtype=dtype)
+                self._filter(x, chunk_out)
+                out[osel] = chunk_out.reshape((nout,) + data.shape[1:])
+        return out
+
+
+    def _forward_data(self, data):
+        return self._filter_chunks(data, [slice(None)])
+
+
+    def _forward_dataset(self, ds):
+        mds = ds.copy(deep=False,
+                      sa=self._sa_filter,
+                      fa=self._fa_filter,
+                      a=self._a_filter)
+        mds.samples = self._filter_chunks(ds.samples, self._get_selectors(ds))
+        return mds
+
+
+_btypes = ('lowpass', 'highpass', 'bandpass', 'bandstop')
+
+
+def _check_band(btype, cutoff):
+    if not btype in _btypes:
+        raise ValueError("Unknown filter type '%s'. Known are: %s"
+                         % (btype, ', '.join(_btypes)))
+    if (np.size(cutoff) == 2) != (btype in ('bandpass', 'bandstop')):
+        raise ValueError("'%s' filters need %s cutoff frequencies (got %r)."
+                         % (btype, btype.startswith('band') and 'two' or 'one',
+                            cutoff))
+
+
+class FIRFilterMapper(_BlockFilterMapper):
+    """Mapper for zero-phase FIR filtering.
+
+    A linear-phase FIR filter is designed with the window method
+    (scipy.signal.firwin) and applied by overlap-save FFT convolution,
+    compensating the filter delay. Samples are processed in blocks, hence
+    (long) memory-mapped recordings are never loaded completely.
+
+    Examples
+    --------
+    Band-pass filter 1-40 Hz of EEG recorded at 500 Hz, individually for
+    each recording session:
+
+    >>> from mvpa2.mappers.filters import FIRFilterMapper
+    >>> fm = FIRFilterMapper(501, (1, 40), sampling_rate=500.,
+    ...                      chunks_attr='chunks')
+    """
+    def __init__(self, numtaps, cutoff, btype='bandpass', window='hamming',
+                 sampling_rate=2., padtype='odd', **kwargs):
+        """
+        Parameters
+        ----------
+        numtaps : int
+          Length of the filter. Has to be odd.
+        cutoff : float or (float, float)
+          Cutoff frequency, or (low, high) frequencies for 'bandpass' and
+          'bandstop' filters, in units of `sampling_rate`.
+        btype : {'lowpass', 'highpass', 'bandpass', 'bandstop'}
+          Type of the filter.
+        window : str or tuple
+          Window passed to scipy.signal.firwin.
+        sampling_rate : float
+          Sampling rate of the samples. The default relates cutoff
+          frequencies to the Nyquist frequency.
+        padtype : {'odd', 'even', 'constant', None}
+          Extension of the signal beyond the first and last sample of each
+          chunk: 'odd' and 'even' reflect the signal at the end points (with
+          and without sign flip), 'constant' repeats the end points, None
+          pads with zeros.
+        """
+        _BlockFilterMapper.__init__(self, **kwargs)
+        if not numtaps % 2:
+            raise ValueError("Zero-phase FIR filters need an odd number of "
+                             "taps (got %i)." % numtaps)
+        _check_band(btype, cutoff)
+        self.__numtaps = numtaps
+        self.__cutoff = cutoff
+        self.__btype = btype
+        self.__padtype = padtype
+        self._taps = firwin(numtaps, cutoff, window=window,
+                            pass_zero=btype in ('lowpass', 'bandstop'),
+                            nyq=sampling_rate / 2.)
+
+
+    def __repr__(self):
+        s = super(FIRFilterMapper, self).__repr__()
+        return s.replace("(", "(numtaps=%i, cutoff=%r, btype=%r, "
+                              % (self.__numtaps, self.__cutoff, self.__btype),
+                         1)
+
+
+    def __str__(self):
+        return _str(self, self.__btype, numtaps=self.__numtaps)
+
+
+    def _filter(self, x, out):
+        _fir_filter(x, self._taps, out, self.__padtype, self.block_size)
+
+
+
+class IIRFilterMapper(_BlockFilterMapper):
+    """Mapper for zero-phase IIR filtering.
+
+    The filter is designed by scipy.signal.iirfilter and applied forward
+    and backward, as done by scipy.signal.filtfilt. Both passes process
+    samples in blocks, carrying the filter state across blocks, hence
+    (long) memory-mapped recordings are never loaded completely.
+
+    Notes
+    -----
+    Filters are represented by their transfer function coefficients, which
+    are numerically unstable for high filter orders and very narrow bands.
+    """
+    def __init__(self, order, cutoff, btype='bandpass', ftype='butter',
+                 rp=None, rs=None, sampling_rate=2., padtype='odd',
+                 padlen=None, **kwargs):
+        """
+        Parameters
+        ----------
+        order : int
+          Order of the filter. Due to the forward-backward application, the
+          effective order is twice as high.
+        cutoff : float or (float, float)
+          Cutoff frequency, or (low, high) frequencies for 'bandpass' and
+          'bandstop' filters, in units of `sampling_rate`.
+        btype : {'lowpass', 'highpass', 'bandpass', 'bandstop'}
+          Type of the filter.
+        ftype : str
+          Filter design, e.g. 'butter', 'cheby1', or 'ellip' (see
+          scipy.signal.iirfilter).
+        rp, rs : float or None
+          Maximum ripple in the passband and minimum attenuation in the
+          stopband (dB), if required by `ftype`.
+        sampling_rate : float
+          Sampling rate of the samples. The default relates cutoff
+          frequencies to the Nyquist frequency.
+        padtype : {'odd', 'even', 'constant', None}
+          Extension of the signal beyond the first and last sample of each
+          chunk to reduce transients (see scipy.signal.filtfilt).
+        padlen : int or None
+          Length of the extension. If None, three times the number of
+          filter coefficients.
+        """
+        _BlockFilterMapper.__init__(self, **kwargs)
+        _check_band(btype, cutoff)
+        self.__order = order
+        self.__cutoff = cutoff
+        self.__btype = btype
+        self.__padtype = padtype
+        self._b, self._a = iirfilter(order,
+                                     np.asanyarray(cutoff) * 2. / sampling_rate,
+                                     rp=rp, rs=rs, btype=btype, ftype=ftype)
+        if padlen is None:
+            padlen = 3 * max(len(self._a), len(self._b))
+        self.__padlen = padlen
+
+
+    def __repr__(self):
+        s = super(IIRFilterMapper, self).__repr__()
+        return s.replace("(", "(order=%i, cutoff=%r, btype=%r, "
+                              % (self.__order, self.__cutoff, self.__btype),
+                         1)
+
+
+    def __str__(self):
+        return _str(self, self.__btype, order=self.__order)
+
+
+    def _filter(self, x, out):
+        _iir_filter(x, self._b, self._a, out, self.__padtype, self.__padlen,
+                    self.block_size)
+
+
+
+class PolyphaseResampleMapper(_BlockFilterMapper):
+    """Mapper for polyphase resampling by a rational factor.
+
+    Samples are upsampled by `up`, low-pass filtered by an FIR filter
+    (scipy.signal.firwin, cutoff at the lower of both Nyquist frequencies)
+    and downsampled by `down`, computing only the required output samples.
+    In contrast to `FFTResampleMapper`, samples are processed in blocks,
+    hence (long) memory-mapped recordings are never loaded completely.
+
+    Each chunk of N samples yields ceil(N * up / down) samples. The signal
+    is assumed to be zero beyond the chunk boundaries.
+
+    Examples
+    --------
+    Downsample EEG recorded at 500 Hz to 200 Hz:
+
+    >>> from mvpa2.mappers.filters import PolyphaseResampleMapper
+    >>> rm = PolyphaseResampleMapper(2, 5, attr_strategy='sample')
+    """
+    _keeps_samples = False
+
+    def __init__(self, up, down, window=('kaiser', 5.0),
+                 attr_strategy='remove', **kwargs):
+        """
+        Parameters
+        ----------
+        up : int
+          Upsampling factor.
+        down : int
+          Downsampling factor.
+        window : str or tuple
+          Window of the anti-aliasing filter, passed to
+          scipy.signal.firwin.
+        attr_strategy : {'remove', 'sample'}
+          Strategy to process sample attributes during mapping. 'remove' will
+          cause all sample attributes to be removed. 'sample' will pick the
+          attribute values of the input samples that precede (or coincide
+          with) each output sample.
+        """
+        _BlockFilterMapper.__init__(self, **kwargs)
+        if not attr_strategy in ('remove', 'sample'):
+            raise ValueError("Unkown attribute handling strategy '%s'."
+                             % attr_strategy)
+        g = gcd(up, down)
+        self.__up = up // g
+        self.__down = down // g
+        self.__attr_strategy = attr_strategy
+        max_rate = max(self.__up, self.__down)
+        if max_rate == 1:
+            self._taps = np.ones(1)
+        else:
+            half_len = 10 * max_rate
+            self._taps = firwin(2 * half_len + 1, 1. / max_rate,
+                                window=window) * self.__up
+
+
+    def __repr__(self):
+        s = super(PolyphaseResampleMapper, self).__repr__()
+        return s.replace("(", "(up=%i, down=%i, attr_strategy=%r, "
+                              % (self.__up, self.__down,
+                                 self.__attr_strategy),
+                         1)
+
+
+    def __str__(self):
+        return _str(self, '%i/%i' % (self.__up, self.__down))
+
+
+    def _get_nout(self, n):
+        return -(-n * self.__up // self.__down)
+
+
+    def _filter(self, x, out):
+        _polyphase_resample(x, self.__up, self.__down, self._taps, out,
+                            self.block_size)
+
+
+    def _forward_dataset(self, ds):
+        selectors = self._get_selectors(ds)
+        mds = Dataset(self._filter_chunks(ds.samples, selectors),
+                      fa=ds.fa, a=ds.a)
+        if self.__attr_strategy == 'sample':
+            ids = np.arange(len(ds))
+            ids = np.concatenate(
+                    [ids[sel][np.arange(self._get_nout(len(ids[sel])))
+                              * self.__down // self.__up]
+                     for sel in selectors])
+            mds.sa.update(dict([(k, ds.sa[k].value[ids]) for k in ds.sa]))
+        return mds
+
+
+@borrowkwargs(FIRFilterMapper, '__init__')
+def fir_filter(ds, numtaps, cutoff, **kwargs):
+    """Zero-phase FIR filtering.
+
+    Parameters
+    ----------
+    ds : Dataset
+    **kwargs
+      For all other arguments, please see the documentation of
+      FIRFilterMapper.
+    """
+    fm = FIRFilterMapper(numtaps, cutoff, **kwargs)
+    return fm.forward(ds)
+
+
+@borrowkwargs(IIRFilterMapper, '__init__')
+def iir_filter(ds, order, cutoff, **kwargs):
+    """Zero-phase IIR filtering.
+
+    Parameters
+    ----------
+    ds : Dataset
+    **kwargs
+      For all other arguments, please see the documentation of
+      IIRFilterMapper.
+    """
+    fm = IIRFilterMapper(order, cutoff, **kwargs)
+    return fm.forward(ds)
+
+
+@borrowkwargs(PolyphaseResampleMapper, '__init__')
+def polyphase_resample(ds, up, down, **kwargs):
+    """Polyphase resampling.
+
+    Parameters
+    ----------
+    ds : Dataset
+    **kwargs
+      For all other arguments, please see the documentation of
+      PolyphaseResampleMapper.
+    """
+    rm = PolyphaseResampleMapper(up, down, **kwargs)
+    return rm.forward(ds)
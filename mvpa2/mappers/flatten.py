@@ -117,6 +117,14 @@ class FlattenMapper(Mapper):
 
 
 
+    def _get_fused_ops(self, data, shape):
+        if shape != self.__origshape \
+           or not (self.__maxdims is None or self.__maxdims >= len(shape)):
+            # let _forward_data() deal with partial flattening or errors
+            return None
+        return [('flatten',)]
+
+
     def _forward_dataset(self, dataset):
         # invoke super class _forward_dataset, this calls, _forward_dataset
         # and this calls _forward_data in this class
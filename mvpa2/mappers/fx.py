@@ -18,7 +18,7 @@ from mvpa2.base.node import Node
 from mvpa2.datasets import Dataset
 from mvpa2.base.dochelpers import _str, _repr_attrs
 from mvpa2.mappers.base import Mapper
-from mvpa2.misc.support import array_whereequal
+from mvpa2.misc.support import array_whereequal, get_group_slicers
 from mvpa2.base.dochelpers import borrowdoc
 
 from mvpa2.misc.transformers import sum_of_abs, max_of_abs
@@ -190,7 +190,6 @@ class FxMapper(Mapper):
 
 
     def _forward_dataset_grouped(self, ds):
-        mdata = [] # list of samples array pieces
         if self.__axis == 'samples':
             col = ds.sa
             axis = 0
@@ -200,44 +199,84 @@ class FxMapper(Mapper):
         else:
             raise RuntimeError("This should not have happened!")
 
-        attrs = dict(zip(col.keys(), [[] for i in col]))
-
         # create a dictionary for all unique elements in all attribute this
         # mapper should operate on
         self.__attrcombs = dict(zip(self.__uattrs,
                                 [col[attr].unique for attr in self.__uattrs]))
-        # let it generate all combinations of unique elements in any attr
-        for comb in _orthogonal_permutations(self.__attrcombs):
-            selector = reduce(np.multiply,
-                                [array_whereequal(col[attr].value, value)
-                                 for attr, value in comb.iteritems()])
+        # factorize all attributes into a single group index per
+        # sample/feature. Groups are sorted in the order all combinations of
+        # unique elements used to be enumerated in
+        group_ids = np.zeros(ds.shape[axis], dtype='int')
+        ncombs = 1
+        for attr, uvalues in dict(self.__attrcombs).items():
+            group_ids = np.unique(
+                group_ids * len(uvalues) + _get_value_ids(col[attr].value,
+                                                          uvalues),
+                return_inverse=True)[1]
+            ncombs *= len(uvalues)
+        ngroups = group_ids.max() + 1 if len(group_ids) else 0
+
+        # check if there were any samples for all combinations
+        if ngroups < ncombs:
+            warning('There were no samples for %i of the %i combinations of '
+                    '%s. It might be a sign of a disbalanced dataset %s.'
+                    % (ncombs - ngroups, ncombs, self.__uattrs, ds))
+
+        mdata = self.__grouped_apply(ds.samples, group_ids, ngroups, axis)
+
+        attrs = dict(zip(col.keys(), [[] for i in col]))
+        if not self.__attrfx is None:
+            # and now all samples attributes
+            slicers = None
+            for attr in col:
+                values = col[attr].value
+                if self.__attrfx is _uniquemerge2literal:
+                    try:
+                        attrs[attr] = _grouped_uniquemerge2literal(
+                                            values, group_ids, ngroups)
+                        continue
+                    except (TypeError, ValueError):
+                        # go the slow way below
+                        pass
+                if slicers is None:
+                    slicers = get_group_slicers(group_ids, ngroups)
+                attrs[attr] = [self.__attrfx(values[slicer])
+                                    for slicer in slicers]
+
+        return mdata, attrs
+
+
+    def __grouped_apply(self, data, group_ids, ngroups, axis):
+        """Apply fx to all groups of samples (axis=0) or features (axis=1)
+        """
+        reducer = None
+        if not len(self.__fxargs) and data.ndim == 2 and ngroups:
+            reducer = _grouped_reducers.get(self.__fx)
+        if reducer is not None:
+            if __debug__:
+                debug('FX', "Applying grouped %s to %i groups",
+                      (self.__fx, ngroups))
+            counts = np.bincount(group_ids, minlength=ngroups)
+            if not np.all(group_ids[1:] >= group_ids[:-1]):
+                # bring the elements of each group together
+                data = data.take(np.argsort(group_ids, kind='mergesort'),
+                                 axis=axis)
+            return reducer(data, counts, axis)
+
+        mdata = [] # list of samples array pieces
+        for slicer in get_group_slicers(group_ids, ngroups):
             # process the samples
             if axis == 0:
-                samples = ds.samples[selector]
+                samples = data[slicer]
             else:
-                samples = ds.samples[:, selector]
-
-            # check if there were any samples for such a combination,
-            # if not -- warning and skip the rest of the loop body
-            if not len(samples):
-                warning('There were no samples for combination %s. It might be '
-                        'a sign of a disbalanced dataset %s.' % (comb, ds))
-                continue
-
-            fxed_samples = self.__smart_apply_along_axis(samples)
-            mdata.append(fxed_samples)
-            if not self.__attrfx is None:
-                # and now all samples attributes
-                fxed_attrs = [self.__attrfx(col[attr].value[selector])
-                                    for attr in col]
-                for i, attr in enumerate(col):
-                    attrs[attr].append(fxed_attrs[i])
+                samples = data[:, slicer]
+            mdata.append(self.__smart_apply_along_axis(samples))
 
         if axis == 0:
             mdata = np.vstack(mdata)
         else:
             mdata = np.vstack(np.transpose(mdata))
-        return mdata, attrs
+        return mdata
 
 
     def _forward_dataset_full(self, ds):
@@ -355,7 +394,8 @@ def mean_group_feature(attrs, attrfx='merge'):
     The feature groups are identified by the unique combination of all values of
     a set of provided feature attributes.  Order of output
     features might differ from original and correspond to sorted order
-    of corresponding `attrs`.
+    of corresponding `attrs`.  Combinations of attribute values without
+    any feature do not yield an output feature.
 
     Parameters
     ----------
@@ -430,46 +470,103 @@ def _uniquemerge2literal(attrs):
         return None
 
 
-def _orthogonal_permutations(a_dict):
-    """
-    Takes a dictionary with lists as values and returns all permutations
-    of these list elements in new dicts.
-
-    This function is useful, when a method with several arguments
-    shall be tested and all of the arguments can take several values.
-
-    The order is not defined, therefore the elements should be
-    orthogonal to each other.
-
-    >>> for i in _orthogonal_permutations({'a': [1,2,3], 'b': [4,5]}):
-    ...     print i
-    {'a': 1, 'b': 4}
-    {'a': 1, 'b': 5}
-    {'a': 2, 'b': 4}
-    {'a': 2, 'b': 5}
-    {'a': 3, 'b': 4}
-    {'a': 3, 'b': 5}
+def _get_value_ids(values, uvalues):
+    """Index of each value in a sequence of unique values"""
+    values = np.asanyarray(values)
+    if values.ndim == 1 and values.dtype != np.dtype('object'):
+        try:
+            uvalues_, ids = np.unique(values, return_inverse=True)
+            if np.all(uvalues_ == uvalues):
+                return ids
+        except TypeError:
+            pass
+    ids = np.zeros(len(values), dtype='int')
+    for i, value in enumerate(uvalues):
+        ids[array_whereequal(values, value)] = i
+    return ids
+
+
+def _grouped_uniquemerge2literal(values, group_ids, ngroups):
+    """`_uniquemerge2literal` of the values of all groups at once.
+
+    Raises TypeError or ValueError if `values` cannot be handled this way,
+    i.e. are not sortable and 1D.
     """
-    # Taken from MDP (LGPL)
-    pool = dict(a_dict)
-    args = []
-    for func, all_args in pool.items():
-        # check the size of the list in the second item of the tuple
-        args_with_fun = [(func, arg) for arg in all_args]
-        args.append(args_with_fun)
-    for i in _product(args):
-        yield dict(i)
-
-
-def _product(iterable):
-    # MDP took it and adapted it from itertools 2.6 (Python license)
-    # PyMVPA took it from MDP (LGPL)
-    pools = tuple(iterable)
-    result = [[]]
-    for pool in pools:
-        result = [x+[y] for x in result for y in pool]
-    for prod in result:
-        yield tuple(prod)
+    values = np.asanyarray(values)
+    if values.ndim != 1 or values.dtype == np.dtype('object'):
+        raise ValueError("Can only merge 1D non-object arrays")
+    uvalues, value_ids = np.unique(values, return_inverse=True)
+    nuvalues = len(uvalues)
+    # unique (group, value) pairs, sorted by group and value
+    pairs = np.unique(group_ids * nuvalues + value_ids)
+    pair_values = pairs % nuvalues
+    nvalues = np.bincount(pairs // nuvalues, minlength=ngroups)
+    first = np.concatenate(([0], np.cumsum(nvalues)[:-1]))
+    merged = list(uvalues[pair_values[first]])
+    for g in np.flatnonzero(nvalues > 1):
+        merged[g] = '+'.join([str(l) for l in
+                    uvalues[pair_values[first[g]:first[g] + nvalues[g]]]])
+    return merged
+
+
+def _grouped_shape(counts, ndim, axis):
+    """Shape counts to broadcast along the grouped axis"""
+    shape = [1] * ndim
+    shape[axis] = len(counts)
+    return counts.reshape(shape)
+
+
+def _grouped_sum(data, counts, axis):
+    bounds = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    # same result dtype as np.sum
+    dtype = np.sum(data[:0], axis=axis).dtype
+    return np.add.reduceat(data, bounds, axis=axis, dtype=dtype)
+
+
+def _grouped_mean(data, counts, axis):
+    bounds = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    # same result dtype as np.mean
+    if np.issubdtype(data.dtype, np.inexact):
+        dtype = data.dtype
+    else:
+        dtype = np.dtype('float64')
+    sums = np.add.reduceat(data, bounds, axis=axis, dtype=dtype)
+    return sums / _grouped_shape(counts, data.ndim, axis).astype(dtype)
+
+
+def _grouped_var(data, counts, axis):
+    bounds = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    means = _grouped_mean(data, counts, axis)
+    dev = data - np.repeat(means, counts, axis=axis)
+    dev *= dev
+    return np.add.reduceat(dev, bounds, axis=axis) \
+           / _grouped_shape(counts, data.ndim, axis).astype(means.dtype)
+
+
+def _grouped_std(data, counts, axis):
+    return np.sqrt(_grouped_var(data, counts, axis))
+
+
+def _grouped_min(data, counts, axis):
+    bounds = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    return np.minimum.reduceat(data, bounds, axis=axis)
+
+
+def _grouped_max(data, counts, axis):
+    bounds = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    return np.maximum.reduceat(data, bounds, axis=axis)
+
+
+_grouped_reducers = {
+    np.sum: _grouped_sum,
+    np.mean: _grouped_mean,
+    np.var: _grouped_var,
+    np.std: _grouped_std,
+    np.amin: _grouped_min,
+    np.amax: _grouped_max,
+    }
+"""Functions computing `fx` for sorted groups along some axis of 2D data,
+given the number of elements in each group"""
 
 
 
@@ -15,6 +15,7 @@ from mvpa2.base import externals
 from mvpa2.base.param import Parameter
 from mvpa2.base.types import is_datasetlike
 from mvpa2.mappers.projection import ProjectionMapper
+from mvpa2.misc.linalg import svd as linalg_svd
 
 from mvpa2.base import warning
 if __debug__:
@@ -54,9 +55,19 @@ class ProcrusteanMapper(ProjectionMapper):
                  doc="""Cutoff for 'small' singular values to regularize the
                      inverse. See :class:`~numpy.linalg.lstsq` for more
                      information.""")
-    svd = Parameter('numpy', allowedtype='string (numpy, scipy, dgesvd)',
+    svd = Parameter('numpy',
+                 allowedtype='string (numpy, scipy, dgesvd, randomized, gram)',
                  doc="""Implementation of SVD to use. dgesvd requires ctypes to
-                 be available.""")
+                 be available. 'randomized' and 'gram' compute only the
+                 components spanned by the training samples (plus up to
+                 `svd_rank` leading ones), which is much faster whenever
+                 there are fewer samples than features. See
+                 :func:`~mvpa2.misc.linalg.svd` for details.""")
+    svd_rank = Parameter(None, allowedtype='None or int', min=1,
+                 doc="""Number of leading SVD components to estimate the
+                 transformation from. If None, all components are used. Values
+                 lower than the number of features yield a transformation of
+                 reduced rank.""")
     def __init__(self, space='targets', **kwargs):
         ProjectionMapper.__init__(self, space=space, **kwargs)
 
@@ -69,6 +80,25 @@ class ProcrusteanMapper(ProjectionMapper):
             self.params.svd = 'numpy'
 
 
+    def _reduced_svd(self, target, source):
+        """SVD of ``target.T * source`` with the selected engine.
+
+        With less samples than features the cross-product has a rank of at
+        most the number of samples, hence it gets decomposed through its
+        QR-factorized core without ever computing the cross-product itself.
+        """
+        params = self.params
+        nsamples, nfeatures = source.shape
+        if nsamples < nfeatures:
+            qt, rt = np.linalg.qr(target.T)
+            qs, rs = np.linalg.qr(source.T)
+            U, s, Vh = linalg_svd(np.dot(rt, rs.T), engine=params.svd,
+                                  rank=params.svd_rank)
+            return np.dot(qt, U), s, np.dot(Vh, qs.T)
+        return linalg_svd(np.dot(target.T, source), engine=params.svd,
+                          rank=params.svd_rank)
+
+
     def _train(self, source):
         params = self.params
         # Since it is unsupervised, we don't care about labels
@@ -145,7 +175,15 @@ class ProcrusteanMapper(ProjectionMapper):
         else:
             # Orthogonal transformation
             # figure out optimal rotation
-            if params.svd == 'numpy':
+            if params.svd in ('randomized', 'gram') \
+                   or params.svd_rank is not None:
+                if not params.reflection:
+                    raise ValueError(
+                        "reflection=False requires a full SVD, hence cannot "
+                        "be combined with svd=%r or svd_rank=%r"
+                        % (params.svd, params.svd_rank))
+                U, s, Vh = self._reduced_svd(target, source)
+            elif params.svd == 'numpy':
                 U, s, Vh = np.linalg.svd(np.dot(target.T, source),
                                full_matrices=False)
             elif params.svd == 'scipy':
@@ -11,9 +11,16 @@ __docformat__ = 'restructuredtext'
 
 import numpy as np
 
+from mvpa2.base import externals
 from mvpa2.base.dochelpers import enhanced_doc_string
 from mvpa2.mappers.base import Mapper, accepts_dataset_as_samples
 
+if externals.exists('scipy'):
+    from scipy.sparse import issparse
+else:
+    def issparse(a):
+        return False
+
 
 if __debug__:
     from mvpa2.base import debug
@@ -39,11 +46,17 @@ class ProjectionMapper(Mapper):
     Forward and back-projection matrices (a.k.a. *projection* and
     *reconstruction*) are available via the `proj` and `recon`
     properties.
+
+    Projection matrices might also be sparse (any scipy.sparse matrix, CSR
+    preferably), e.g. for averaging features within regions of interest.
+    Offsets are projected instead of subtracted from the data whenever this
+    does not sacrifice precision, hence forward- and reverse-mapping
+    amount to a single matrix product.
     """
 
     _DEV__doc__ = """Think about renaming `demean`, may be `translation`?"""
 
-    def __init__(self, demean=True, **kwargs):
+    def __init__(self, demean=True, dtype=None, **kwargs):
         """Initialize the ProjectionMapper
 
         Parameters
@@ -51,8 +64,13 @@ class ProjectionMapper(Mapper):
         demean : bool
           Either data should be demeaned while computing
           projections and applied back while doing reverse()
+        dtype : dtype or None
+          Floating point precision of the mapping, e.g. 'float32' to halve
+          memory demands and bandwidth.  If None, the common type of the
+          data and the projection matrix is used.
         """
         Mapper.__init__(self, **kwargs)
+        self.dtype = dtype
 
         # by default we want to wipe the feature attributes out during mapping
         self._fa_filter = []
@@ -103,42 +121,33 @@ class ProjectionMapper(Mapper):
     def _forward_data(self, data):
         if self._proj is None:
             raise RuntimeError, "Mapper needs to be train before used."
+        if self._demean:
+            return _project(data, self._proj, self._offset_in,
+                            self._offset_out, self.dtype)
+        return _project(data, self._proj, dtype=self.dtype)
 
-        # local binding
-        demean = self._demean
-
-        d = np.asmatrix(data)
-
-        # Remove input offset if present
-        if demean and self._offset_in is not None:
-            d = d - self._offset_in
-
-        # Do forward projection
-        res = (d * self._proj).A
-
-        # Add output offset if present
-        if demean and self._offset_out is not None:
-            res += self._offset_out
 
-        return res
+    def _get_fused_ops(self, data, shape):
+        if self._proj is None or not shape == (self._proj.shape[0],) \
+           or issparse(self._proj) or not self.dtype is None:
+            return None
+        proj = np.asarray(self._proj)
+        offset = None
+        if self._demean and self._offset_in is not None:
+            offset = -np.dot(np.asarray(self._offset_in), proj)
+        if self._demean and self._offset_out is not None:
+            offset = (0 if offset is None else offset) \
+                     + np.asarray(self._offset_out)
+        return [('project', proj, offset)]
 
 
     def _reverse_data(self, data):
         if self._proj is None:
             raise RuntimeError, "Mapper needs to be trained before used."
-        d = np.asmatrix(data)
-        # Remove offset if present in output space
-        if self._demean and self._offset_out is not None:
-            d = d - self._offset_out
-
-        # Do reverse projection
-        res = (d * self.recon).A
-
-        # Add offset in input space
-        if self._demean and self._offset_in is not None:
-            res += self._offset_in
-
-        return res
+        if self._demean:
+            return _project(data, self.recon, self._offset_out,
+                            self._offset_in, self.dtype)
+        return _project(data, self.recon, dtype=self.dtype)
 
 
     ##REF: Name was automagically refactored
@@ -147,7 +156,11 @@ class ProjectionMapper(Mapper):
         By default -- pseudoinverse of projection matrix.  Might be overridden
         in derived classes for efficiency.
         """
-        return np.linalg.pinv(self._proj)
+        proj = self._proj
+        if issparse(proj):
+            # pseudoinverses of sparse matrices are dense in general
+            proj = proj.toarray()
+        return np.linalg.pinv(proj)
 
 
     ##REF: Name was automagically refactored
@@ -163,3 +176,59 @@ class ProjectionMapper(Mapper):
 
     proj  = property(fget=lambda self: self._proj, doc="Projection matrix")
     recon = property(fget=_get_recon, doc="Backprojection matrix")
+
+
+
+def _project(data, proj, offset_in=None, offset_out=None, dtype=None):
+    """Compute ``(data - offset_in) * proj + offset_out``.
+
+    Double precision data is not demeaned, but the projected input offset
+    is subtracted after the matrix product, saving a copy of the data.
+    In any other case the input offset is subtracted from a (necessary or
+    cheap) copy in the target precision.
+
+    Parameters
+    ----------
+    data : array
+    proj : array, matrix, or scipy.sparse matrix
+    offset_in, offset_out : array or None
+    dtype : dtype or None
+      Precision of the computation.  If None, the common (floating point)
+      type of data and projection.
+    """
+    data = np.asarray(data)
+    if dtype is None:
+        dtype = np.promote_types(np.result_type(data, proj.dtype), 'float32')
+    else:
+        dtype = np.dtype(dtype)
+        if proj.dtype != dtype:
+            proj = proj.astype(dtype)
+    copied = False
+    if data.dtype != dtype:
+        data = data.astype(dtype)
+        copied = True
+    offset = None
+    if offset_in is not None:
+        offset_in = np.asarray(offset_in).ravel()
+        if dtype == np.float64:
+            offset = -_dot(offset_in[np.newaxis], proj)[0]
+        else:
+            if not copied:
+                data = data.copy()
+            data -= offset_in
+    if offset_out is not None:
+        offset_out = np.asarray(offset_out).ravel()
+        offset = offset_out if offset is None else offset + offset_out
+    res = _dot(data, proj)
+    if offset is not None:
+        res += offset
+    return res
+
+
+def _dot(a, b):
+    """Matrix product of an array and a dense or sparse matrix as array"""
+    if issparse(b):
+        # sparse matrices only know how to multiply from the left
+        return np.ascontiguousarray(np.asarray(b.T.dot(a.T)).T)
+    return np.asarray(np.dot(a, b))
+
@@ -27,10 +27,17 @@ class SimpleSOMMapper(Mapper):
 
     This SOM implementation uses squared Euclidean distance to determine
     the best matching Kohonen unit and a Gaussian neighborhood influence
-    kernel.
+    kernel.  Training is done in batch mode: the best matching units of all
+    samples are determined at once and the weight updates of the whole
+    batch are accumulated by matrix products.
     """
+
+    _bmu_block_size = 2 ** 20
+    """Maximal number of elements in a block of the sample-unit distance
+    matrix when determining best matching units"""
+
     def __init__(self, kshape, niter, learning_rate=0.005,
-                 iradius=None):
+                 iradius=None, batch_size=None):
         """
         Parameters
         ----------
@@ -48,6 +55,11 @@ class SimpleSOMMapper(Mapper):
           will continuously decreased during network training. If `None`
           (default) the radius is set equal to the longest edge of the
           Kohonen layer.
+        batch_size : int or None
+          If `None` (default), the Kohonen layer is updated once per
+          iteration with the cumulative deltas of all training samples.
+          Otherwise, training is done online in mini-batches, i.e. the layer
+          is updated after each consecutive block of `batch_size` samples.
         """
         # init base class
         Mapper.__init__(self)
@@ -65,6 +77,9 @@ class SimpleSOMMapper(Mapper):
         # number of training iterations
         self.niter = niter
 
+        # number of samples per update of the Kohonen layer
+        self.batch_size = batch_size
+
         # precompute whatever can be done
         # scalar for decay of learning rate and radius across all iterations
         self.iter_scale = self.niter / np.log(self.radius)
@@ -85,10 +100,8 @@ class SimpleSOMMapper(Mapper):
         # XXX initialize with clever default, e.g. plain of first two PCA
         # components
         self._K = np.random.standard_normal(tuple(self.kshape) + (samples.shape[1],))
-
-        # units weight vector deltas for batch training
-        # (height x width x #features)
-        unit_deltas = np.zeros(self._K.shape, dtype='float')
+        # flat view of the Kohonen layer (#units x #features)
+        K = self._K.reshape(-1, samples.shape[1])
 
         # precompute distance kernel between elements in the Kohonen layer
         # that will remain constant throughout the training
@@ -96,6 +109,15 @@ class SimpleSOMMapper(Mapper):
         # XXX maybe do other than squared Euclidean?
         dqd = np.fromfunction(lambda x, y: (x**2 + y**2)**0.5,
                              self.kshape, dtype='float')
+        # absolute row and column offsets between all pairs of units to
+        # unfold the quadrant into the full unit x unit kernel
+        urows, ucols = np.indices(self.kshape).reshape(2, -1)
+        drows = np.abs(urows[:, np.newaxis] - urows)
+        dcols = np.abs(ucols[:, np.newaxis] - ucols)
+
+        batch_size = self.batch_size
+        if batch_size is None:
+            batch_size = len(samples)
 
         # for all iterations
         for it in xrange(1, self.niter + 1):
@@ -103,38 +125,32 @@ class SimpleSOMMapper(Mapper):
             # has to be recomputed since kernel shrinks over time
             k = self._compute_influence_kernel(it, dqd)
 
-            # for all training vectors
-            for s in samples:
-                # determine closest unit (as element coordinate)
-                b = self._get_bmu(s)
-                # train all units at once by unfolding the kernel (from the
-                # single quadrant that is precomputed), cutting it to the
-                # right shape and simply multiply it to the difference of target
-                # and all unit weights....
-                infl = np.vstack((
-                        np.hstack((
-                            # upper left
-                            k[b[0]:0:-1, b[1]:0:-1],
-                            # upper right
-                            k[b[0]:0:-1, :self.kshape[1] - b[1]])),
-                        np.hstack((
-                            # lower left
-                            k[:self.kshape[0] - b[0], b[1]:0:-1],
-                            # lower right
-                            k[:self.kshape[0] - b[0], :self.kshape[1] - b[1]]))
-                               ))
-                unit_deltas += infl[:,:,np.newaxis] * (s - self._K)
-
-            # apply cumulative unit deltas
-            self._K += unit_deltas
+            for start in xrange(0, len(samples), batch_size):
+                batch = samples[start:start + batch_size]
+                # determine closest units for all samples at once
+                bmus = self._get_bmus(batch)
+                # number and sum of samples per best matching unit hit
+                # by this batch
+                order = np.argsort(bmus, kind='mergesort')
+                units, bounds = np.unique(bmus[order], return_index=True)
+                sums = np.add.reduceat(batch[order], bounds, axis=0)
+                counts = np.diff(np.append(bounds, len(batch)))
+                # influence of those best matching units (columns) on all
+                # units (rows)
+                infl = k[drows[:, units], dcols[:, units]]
+                # train all units at once: each unit is moved towards all
+                # samples, weighted by the influence of their best matching
+                # unit -- i.e. sum_s infl[u, bmu(s)] * (s - K[u])
+                unit_deltas = np.dot(infl, sums) \
+                              - np.dot(infl, counts)[:, np.newaxis] * K
+
+                # apply cumulative unit deltas
+                K += unit_deltas
 
             if __debug__:
                 debug("SOM", "Iteration %d/%d done: ||unit_deltas||=%g" %
                       (it, self.niter, np.sqrt(np.sum(unit_deltas **2))))
 
-            # reset unit deltas
-            unit_deltas.fill(0.)
-
 
     ##REF: Name was automagically refactored
     def _compute_influence_kernel(self, iter, dqd):
@@ -187,13 +203,44 @@ class SimpleSOMMapper(Mapper):
         return (np.divide(loc, self.kshape[1]).astype('int'), loc % self.kshape[1])
 
 
+    def _get_bmus(self, samples):
+        """Returns the flat IDs of the best matching units of all samples.
+
+        Same as `_get_bmu`, but distances are computed in blocks of samples
+        at once.
+
+        Parameters
+        ----------
+        samples : array (nsamples x nfeatures)
+          Target samples.
+
+        Returns
+        -------
+        array of int
+          Indices into the flattened Kohonen layer.
+        """
+        K = self.K.reshape(-1, self.K.shape[-1])
+        # squared Euclidean distance without the per-sample constant ||s||^2
+        # which does not change the closest unit
+        knorms = (K ** 2).sum(axis=1)
+        bmus = np.empty(len(samples), dtype='int')
+        bsize = max(1, self._bmu_block_size // len(K))
+        for start in xrange(0, len(samples), bsize):
+            block = samples[start:start + bsize]
+            bmus[start:start + bsize] = \
+                    np.argmin(knorms - 2 * np.dot(block, K.T), axis=1)
+        return bmus
+
+
     def _forward_data(self, data):
         """Map data from the IN dataspace into OUT space.
 
         Mapping is performs by simple determining the best matching Kohonen
         unit for each data sample.
         """
-        return np.array([self._get_bmu(d) for d in data])
+        # assumes 2D Kohonen layer
+        return np.transpose(np.unravel_index(self._get_bmus(data),
+                                             tuple(self.kshape)))
 
 
     def _reverse_data(self, data):
@@ -212,6 +259,8 @@ class SimpleSOMMapper(Mapper):
         s += 'kshape=%s, niter=%i, learning_rate=%f, iradius=%f)' \
                 % (str(tuple(self.kshape)), self.niter, self.lrate,
                    self.radius)
+        if self.batch_size is not None:
+            s = s[:-1] + ', batch_size=%i)' % self.batch_size
         return s
 
 
@@ -12,7 +12,7 @@ __docformat__ = 'restructuredtext'
 
 import numpy as np
 from mvpa2.base.dochelpers import borrowdoc
-from mvpa2.mappers.projection import ProjectionMapper
+from mvpa2.mappers.projection import ProjectionMapper, issparse
 
 if __debug__:
     from mvpa2.base import debug
@@ -23,11 +23,16 @@ class StaticProjectionMapper(ProjectionMapper):
     """
 
     @borrowdoc(ProjectionMapper)
-    def __init__(self, proj, **kwargs):
+    def __init__(self, proj, recon=None, **kwargs):
         """Initialize the StaticProjectionMapper
 
         Parameters
         ----------
+        proj : array or scipy.sparse matrix
+          Projection matrix (input features x output features).
+        recon : array, scipy.sparse matrix, or None
+          Reconstruction matrix for reverse-mapping. If None, the
+          pseudo-inverse of the projection matrix is used.
         **kwargs:
           All keyword arguments are passed to the ProjectionMapper
           constructor.
@@ -35,20 +40,15 @@ class StaticProjectionMapper(ProjectionMapper):
         """
         ProjectionMapper.__init__(self,  auto_train=True, **kwargs)
         self._proj = proj
+        self._recon = recon
 
     def _train(self, dummyds):
         """Do Nothing
         """
         if __debug__:
             if "MAP_" in debug.active:
+                proj = self._proj
+                if issparse(proj):
+                    proj = proj.toarray()
                 debug("MAP_", "Mixing matrix has %s shape and norm=%f" %
-                      (self._proj.shape, np.linalg.norm(self._proj)))
-
-
-
-    def _compute_recon(self):
-        """Computing the inverse of the projection matrix for reverse
-        """
-        return np.linalg.pinv(self._proj)
-
-
+                      (proj.shape, np.linalg.norm(proj)))
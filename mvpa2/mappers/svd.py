@@ -14,9 +14,11 @@ import numpy as np
 #import scipy.linalg as spl
 
 from mvpa2.base.dochelpers import borrowdoc
+from mvpa2.base.param import Parameter
 from mvpa2.mappers.base import accepts_dataset_as_samples
 from mvpa2.mappers.projection import ProjectionMapper
 from mvpa2.featsel.helpers import ElementSelector
+from mvpa2.misc.linalg import svd as linalg_svd
 
 if __debug__:
     from mvpa2.base import debug
@@ -26,6 +28,16 @@ class SVDMapper(ProjectionMapper):
     """Mapper to project data onto SVD components estimated from some dataset.
     """
 
+    svd = Parameter('numpy',
+                 allowedtype='string (numpy, scipy, dgesvd, randomized, gram)',
+                 doc="""Implementation of SVD to use. 'randomized' and 'gram'
+                 are much faster if only a few leading components are needed
+                 (see `svd_rank`), or the data matrix is very wide or tall.
+                 See :func:`~mvpa2.misc.linalg.svd` for details.""")
+    svd_rank = Parameter(None, allowedtype='None or int', min=1,
+                 doc="""Number of leading SVD components to estimate. If None,
+                 all components are computed.""")
+
     @borrowdoc(ProjectionMapper)
     def __init__(self, **kwargs):
         """Initialize the SVDMapper
@@ -52,13 +64,13 @@ class SVDMapper(ProjectionMapper):
         X = self._demean_data(X)
 
         # singular value decomposition
-        U, SV, Vh = np.linalg.svd(X, full_matrices=0)
-        #U, SV, Vh = spl.svd(X, full_matrices=0)
+        U, SV, Vh = linalg_svd(X, engine=self.params.svd,
+                               rank=self.params.svd_rank)
 
         # store the final matrix with the new basis vectors to project the
         # features onto the SVD components. And store its .H right away to
         # avoid computing it in forward()
-        self._proj = Vh.H
+        self._proj = np.asmatrix(Vh).H
 
         # also store singular values of all components
         self._sv = SV
@@ -16,6 +16,7 @@ if externals.exists('pywt', raise_=True):
     import pywt
 
 import numpy as np
+from itertools import product
 
 from mvpa2.base import warning
 from mvpa2.mappers.base import Mapper
@@ -118,8 +119,60 @@ def _get_indexes(shape, dim):
                     break
 
 
+def _dwt(data, wavelet, mode):
+    """Single level DWT along the last axis of all elements of `data`
+    """
+    if externals.exists('pywt dwt axis'):
+        return pywt.dwt(data, wavelet, mode, axis=-1)
+    # transform each element separately, but into preallocated storage
+    rows = data.reshape(-1, data.shape[-1])
+    a, d = None, None
+    for i, row in enumerate(rows):
+        a_, d_ = pywt.dwt(row, wavelet, mode)
+        if a is None:
+            a = np.empty((len(rows), len(a_)))
+            d = np.empty((len(rows), len(d_)))
+        a[i], d[i] = a_, d_
+    return (a.reshape(data.shape[:-1] + a.shape[-1:]),
+            d.reshape(data.shape[:-1] + d.shape[-1:]))
+
+
+def _idwt(a, d, wavelet, mode):
+    """Single level inverse DWT along the last axis of all elements
+    """
+    if externals.exists('pywt dwt axis'):
+        return pywt.idwt(a, d, wavelet, mode, axis=-1)
+    a_rows = a.reshape(-1, a.shape[-1])
+    d_rows = d.reshape(-1, d.shape[-1])
+    rec = None
+    for i in xrange(len(a_rows)):
+        rec_ = pywt.idwt(a_rows[i], d_rows[i], wavelet, mode)
+        if rec is None:
+            rec = np.empty((len(a_rows), len(rec_)))
+        rec[i] = rec_
+    return rec.reshape(a.shape[:-1] + rec.shape[-1:])
+
+
+def _iter_wp_levels(data, wavelet, mode, maxlevel):
+    """Generator for the nodes of each level of a wavelet packet decomposition
+
+    Decomposition is done along the last axis, for all elements of `data` at
+    once.  Nodes of a level are provided in 'natural' order, i.e. ordered by
+    their path as in `pywt.WaveletPacket.get_level()`.
+    """
+    nodes = [data]
+    for level in xrange(maxlevel):
+        nodes = [part for node in nodes
+                        for part in _dwt(node, wavelet, mode)]
+        yield nodes
+
+
 class WaveletPacketMapper(_WaveletMapper):
     """Convert signal into an overcomplete representaion using Wavelet packet
+
+    Decomposition and reconstruction are done level by level for all
+    channels (elements along the other dimensions) at once -- directly
+    along the transformed dimension if the available pywt supports it.
     """
 
     def __init__(self, level=None, **kwargs):
@@ -138,100 +191,79 @@ class WaveletPacketMapper(_WaveletMapper):
         self.__level = level
 
 
-    # XXX too much of duplications between such methods -- it begs
-    #     refactoring
     ##REF: Name was automagically refactored
     def __forward_single_level(self, data):
         if __debug__:
             debug('MAP', "Converting signal using DWP (single level)")
 
-        wp = None
-
         level = self.__level
-        wavelet = self._wavelet
-        mode = self._mode
         dim = self._dim
 
-        level_paths = None
-        for indexes in _get_indexes(data.shape, self._dim):
-            if __debug__:
-                debug('MAP_', " %s" % (indexes,), lf=False, cr=True)
-            WP = pywt.WaveletPacket(
-                data[indexes], wavelet=wavelet,
-                mode=mode, maxlevel=level)
-
-            level_nodes = WP.get_level(level)
-            if level_paths is None:
-                # Needed for reconstruction
-                self.__level_paths = np.array([node.path for node in level_nodes])
-            level_datas = np.array([node.data for node in level_nodes])
-
-            if wp is None:
-                newdim = data.shape
-                newdim = newdim[:dim] + level_datas.shape + newdim[dim+1:]
-                if __debug__:
-                    debug('MAP_', "Initializing storage of size %s for single "
-                          "level (%d) mapping of data of size %s" % (newdim, level, data.shape))
-                wp = np.empty( tuple(newdim) )
-
-            wp[indexes] = level_datas
+        # operate on all channels at once along the last axis
+        x = np.rollaxis(np.asarray(data, dtype='float'), dim, data.ndim)
+        # only the nodes of the last level are of interest
+        level_nodes = [x]
+        for i in xrange(level):
+            level_nodes = [part for node in level_nodes
+                           for part in _dwt(node, self._wavelet, self._mode)]
+
+        # Needed for reconstruction
+        self.__level_paths = np.array(
+            [''.join(path) for path in product('ad', repeat=level)])
+
+        newdim = data.shape
+        newdim = newdim[:dim] + (len(level_nodes), level_nodes[0].shape[-1]) \
+                 + newdim[dim+1:]
+        if __debug__:
+            debug('MAP_', "Initializing storage of size %s for single "
+                  "level (%d) mapping of data of size %s" % (newdim, level, data.shape))
+        wp = np.empty(newdim)
+        # view with nodes and their coefficients along the last axes
+        wp_ = np.rollaxis(np.rollaxis(wp, dim, wp.ndim), dim, wp.ndim)
+        for i, node in enumerate(level_nodes):
+            wp_[..., i, :] = node
 
         return wp
 
 
     ##REF: Name was automagically refactored
     def __forward_multiple_levels(self, data):
-        wp = None
-        levels_length = None                # total length at each level
-        levels_lengths = None                # list of lengths per each level
-        for indexes in _get_indexes(data.shape, self._dim):
-            if __debug__:
-                debug('MAP_', " %s" % (indexes,), lf=False, cr=True)
-            WP = pywt.WaveletPacket(
-                data[indexes],
-                wavelet=self._wavelet,
-                mode=self._mode, maxlevel=self._maxlevel)
-
-            if levels_length is None:
-                levels_length = [None] * WP.maxlevel
-                levels_lengths = [None] * WP.maxlevel
-
-            levels_datas = []
-            for level in xrange(WP.maxlevel):
-                level_nodes = WP.get_level(level+1)
-                level_datas = [node.data for node in level_nodes]
-
-                level_lengths = [len(x) for x in level_datas]
-                level_length = np.sum(level_lengths)
-
-                if levels_lengths[level] is None:
-                    levels_lengths[level] = level_lengths
-                elif levels_lengths[level] != level_lengths:
-                    raise RuntimeError, \
-                          "ADs of same level of different samples should have same number of elements." \
-                          " Got %s, was %s" % (level_lengths, levels_lengths[level])
-
-                if levels_length[level] is None:
-                    levels_length[level] = level_length
-                elif levels_length[level] != level_length:
-                    raise RuntimeError, \
-                          "Levels of different samples should have same number of elements." \
-                          " Got %d, was %d" % (level_length, levels_length[level])
-
-                level_data = np.hstack(level_datas)
-                levels_datas.append(level_data)
-
-            # assert(len(data) == levels_length)
-            # assert(len(data) >= Ntimepoints)
-            if wp is None:
-                newdim = list(data.shape)
-                newdim[self._dim] = np.sum(levels_length)
-                wp = np.empty( tuple(newdim) )
-            wp[indexes] = np.hstack(levels_datas)
+        dim = self._dim
+        ntimepoints = data.shape[dim]
+        maxlevel = self._maxlevel
+        if maxlevel is None:
+            maxlevel = pywt.dwt_max_level(ntimepoints,
+                                          pywt.Wavelet(self._wavelet).dec_len)
+
+        # lengths of the nodes of each level
+        levels_lengths = []
+        nnodes, length = 1, ntimepoints
+        for level in xrange(maxlevel):
+            nnodes *= 2
+            length = pywt.dwt_coeff_len(length,
+                                        pywt.Wavelet(self._wavelet).dec_len,
+                                        self._mode)
+            levels_lengths.append([length] * nnodes)
+        levels_length = [np.sum(l) for l in levels_lengths]
+
+        newdim = list(data.shape)
+        newdim[dim] = np.sum(levels_length)
+        wp = np.empty(tuple(newdim))
+        # view with the coefficients along the last axis
+        wp_ = np.rollaxis(wp, dim, wp.ndim)
+
+        # operate on all channels at once along the last axis
+        x = np.rollaxis(np.asarray(data, dtype='float'), dim, data.ndim)
+        offset = 0
+        for level_nodes in _iter_wp_levels(x, self._wavelet, self._mode,
+                                           maxlevel):
+            for node in level_nodes:
+                wp_[..., offset:offset + node.shape[-1]] = node
+                offset += node.shape[-1]
+        assert(offset == wp.shape[dim])
 
         self.levels_lengths, self.levels_length = levels_lengths, levels_length
         if __debug__:
-            debug('MAP_', "")
             debug('MAP', "Done convertion into wp. Total size %s" % str(wp.shape))
         return wp
 
@@ -250,28 +282,23 @@ class WaveletPacketMapper(_WaveletMapper):
     #
     ##REF: Name was automagically refactored
     def __reverse_single_level(self, wp):
+        dim = self._dim
 
-        # local bindings
-        level_paths = self.__level_paths
-
-        # define wavelet packet to use
-        WP = pywt.WaveletPacket(
-            data=None, wavelet=self._wavelet,
-            mode=self._mode, maxlevel=self.__level)
+        # all nodes (in order of self.__level_paths) with their coefficients
+        # along the last axis
+        wp = np.rollaxis(np.rollaxis(wp, dim, wp.ndim), dim, wp.ndim)
+        nodes = [wp[..., i, :] for i in xrange(wp.shape[-2])]
+        # reconstruct level by level for all channels at once
+        while len(nodes) > 1:
+            nodes = [_idwt(nodes[i], nodes[i + 1], self._wavelet, self._mode)
+                     for i in xrange(0, len(nodes), 2)]
 
         # prepare storage
         signal_shape = wp.shape[:1] + self._inshape[1:]
-        signal = np.zeros(signal_shape)
+        signal = np.empty(signal_shape)
         Ntime_points = self._intimepoints
-        for indexes in _get_indexes(signal_shape,
-                                   self._dim):
-            if __debug__:
-                debug('MAP_', " %s" % (indexes,), lf=False, cr=True)
-
-            for path, level_data in zip(level_paths, wp[indexes]):
-                WP[path] = level_data
-
-            signal[indexes] = WP.reconstruct(True)[:Ntime_points]
+        np.rollaxis(signal, dim, signal.ndim)[...] = \
+                nodes[0][..., :Ntime_points]
 
         return signal
 
@@ -14,9 +14,11 @@ import numpy as np
 
 from mvpa2.base import warning
 from mvpa2.base.dochelpers import _str, borrowkwargs, _repr_attrs
+from mvpa2.base.types import is_datasetlike
 from mvpa2.mappers.base import accepts_dataset_as_samples, Mapper
 from mvpa2.datasets.base import Dataset
 from mvpa2.datasets.miscfx import get_nsamples_per_attr, get_samples_by_attr
+from mvpa2.misc.support import get_group_slicers
 from mvpa2.support import copy
 
 
@@ -34,8 +36,10 @@ class ZScoreMapper(Mapper):
     per-chunk definitions), or to select a specific subset of samples from
     which these parameters should be estimated.
 
-    If necessary, data is upcasted into a configurable datatype to prevent
-    information loss.
+    If necessary, integer data is upcasted into a configurable datatype to
+    prevent information loss.  Floating point data (e.g. float32) is
+    Z-scored in its own precision, while the parameters are estimated with
+    double precision accumulators.
 
     Notes
     -----
@@ -49,7 +53,7 @@ class ZScoreMapper(Mapper):
     Reverse-mapping is currently not implemented.
     """
     def __init__(self, params=None, param_est=None, chunks_attr='chunks',
-                 dtype='float64', **kwargs):
+                 dtype='float64', inplace=False, **kwargs):
         """
         Parameters
         ----------
@@ -73,6 +77,10 @@ class ZScoreMapper(Mapper):
         dtype : Numpy dtype, optional
           Target dtype that is used for upcasting, in case integer data is to be
           Z-scored.
+        inplace : bool
+          If True, samples are Z-scored in-place, instead of on a copy,
+          reducing memory demands.  Integer data arrays cannot be Z-scored
+          in-place.
         """
         Mapper.__init__(self, **kwargs)
 
@@ -81,16 +89,15 @@ class ZScoreMapper(Mapper):
         self.__param_est = param_est
         self.__params_dict = None
         self.__dtype = dtype
-
-        # secret switch to perform in-place z-scoring
-        self._secret_inplace_zscore = False
+        self.inplace = inplace
 
 
     def __repr__(self, prefixes=[]):
         return super(ZScoreMapper, self).__repr__(
             prefixes=prefixes
             + _repr_attrs(self, ['params', 'param_est', 'chunks_attr'])
-            + _repr_attrs(self, ['dtype'], default='float64'))
+            + _repr_attrs(self, ['dtype'], default='float64')
+            + _repr_attrs(self, ['inplace'], default=False))
 
 
     def __str__(self):
@@ -116,20 +123,17 @@ class ZScoreMapper(Mapper):
             if not param_est is None:
                 est_attr, est_attr_values = param_est
                 # which samples to use for estimation
-                est_ids = set(get_samples_by_attr(ds, est_attr,
-                                                  est_attr_values))
+                est_ids = get_samples_by_attr(ds, est_attr, est_attr_values)
             else:
                 est_ids = slice(None)
 
             # now we can either do it one for all, or per chunk
             if not chunks_attr is None:
-                # per chunk estimate
-                params = {}
-                for c in ds.sa[chunks_attr].unique:
-                    slicer = np.where(ds.sa[chunks_attr].value == c)[0]
-                    if not isinstance(est_ids, slice):
-                        slicer = list(est_ids.intersection(set(slicer)))
-                    params[c] = self._compute_params(ds.samples[slicer])
+                # per chunk estimate, all chunks at once
+                chunks, groups = np.unique(ds.sa[chunks_attr].value,
+                                           return_inverse=True)
+                params = dict(zip(chunks, self._compute_grouped_params(
+                    ds.samples[est_ids], groups[est_ids], len(chunks))))
             else:
                 # global estimate
                 params = {'__all__': self._compute_params(ds.samples[est_ids])}
@@ -164,7 +168,7 @@ class ZScoreMapper(Mapper):
             raise RuntimeError, \
                   "ZScoreMapper needs to be trained before call to forward"
 
-        if self._secret_inplace_zscore:
+        if self.inplace:
             mds = ds
         else:
             # shallow copy to put the new stuff in
@@ -181,15 +185,22 @@ class ZScoreMapper(Mapper):
             mds.samples = self._zscore(mds.samples, *params['__all__'])
         else:
             # per chunk z-scoring
-            for c in mds.sa[chunks_attr].unique:
+            chunks, groups = np.unique(mds.sa[chunks_attr].value,
+                                       return_inverse=True)
+            for c in chunks:
                 if not c in params:
                     raise RuntimeError(
                         "%s has no parameters for chunk '%s'. It probably "
                         "wasn't present in the training dataset!?"
                         % (self.__class__.__name__, c))
-                slicer = np.where(mds.sa[chunks_attr].value == c)[0]
-                mds.samples[slicer] = self._zscore(mds.samples[slicer],
-                                                   *params[c])
+            for c, slicer in zip(chunks, get_group_slicers(groups,
+                                                            len(chunks))):
+                if isinstance(slicer, slice):
+                    # contiguous chunk -- operate on a view
+                    self._zscore(mds.samples[slicer], *params[c])
+                else:
+                    mds.samples[slicer] = self._zscore(mds.samples[slicer],
+                                                       *params[c])
 
         return mds
 
@@ -212,12 +223,12 @@ class ZScoreMapper(Mapper):
         # mappers should not modify the input data
         # cast the data to float, since in-place operations below to not upcast!
         if np.issubdtype(data.dtype, np.integer):
-            if self._secret_inplace_zscore:
+            if self.inplace:
                 raise TypeError(
                     "Cannot perform inplace z-scoring since data is of integer "
                     "type. Please convert to float before calling zscore")
             mdata = data.astype(self.__dtype)
-        elif self._secret_inplace_zscore:
+        elif self.inplace:
             mdata = data
         else:
             # do not call .copy() directly, since it might not be an array
@@ -227,8 +238,72 @@ class ZScoreMapper(Mapper):
         return mdata
 
 
+    def _get_fused_ops(self, data, shape):
+        params = self.__params_dict
+        if params is None or not len(shape) == 1:
+            return None
+        if not is_datasetlike(data) and (not self.__chunks_attr is None
+                                         or not self.__param_est is None):
+            # let _forward_data() complain
+            return None
+        for mean, std in params.itervalues():
+            if np.ndim(mean) and len(mean) != shape[0] \
+               or np.ndim(std) and len(std) != shape[0]:
+                return None
+        if '__all__' in params:
+            return [('scale',) + _get_scaling(*params['__all__'])
+                    + (self.__dtype,)]
+        return [('chunkscale', self.__chunks_attr,
+                 dict([(c, _get_scaling(*p)) for c, p in params.iteritems()]),
+                 self.__dtype)]
+
+
     def _compute_params(self, samples):
-        return (np.mean(samples, axis=0), np.std(samples, axis=0))
+        dtype = _get_params_dtype(samples)
+        return (np.mean(samples, axis=0, dtype='float64').astype(dtype),
+                np.std(samples, axis=0, dtype='float64').astype(dtype))
+
+
+    def _compute_grouped_params(self, samples, groups, ngroups):
+        """Estimate (mean, std) for all groups of samples at once.
+
+        Parameters
+        ----------
+        samples : array
+        groups : array of int
+          Group index (0 ... ngroups-1) of each sample.
+        ngroups : int
+
+        Returns
+        -------
+        list of tuples(mean, std)
+          Parameters for each group (NaN for groups without samples).
+        """
+        dtype = _get_params_dtype(samples)
+        if not np.all(groups[1:] >= groups[:-1]):
+            # bring samples of each group together
+            order = np.argsort(groups, kind='mergesort')
+            samples, groups = samples[order], groups[order]
+        counts = np.bincount(groups, minlength=ngroups)
+        present = counts > 0
+        bounds = np.concatenate(([0], np.cumsum(counts)[:-1]))[present]
+        counts = counts[present][:, np.newaxis]
+
+        means = np.empty((ngroups,) + samples.shape[1:])
+        stds = np.empty(means.shape)
+        means.fill(np.nan)
+        stds.fill(np.nan)
+        if len(bounds):
+            means[present] = np.add.reduceat(samples, bounds, axis=0,
+                                             dtype='float64') / counts
+            # second pass over the deviations for numerical stability
+            dev = samples - means[groups]
+            dev **= 2
+            stds[present] = np.sqrt(np.add.reduceat(dev, bounds, axis=0,
+                                                    dtype='float64') / counts)
+        means = means.astype(dtype)
+        stds = stds.astype(dtype)
+        return [(m, s) for m, s in zip(means, stds)]
 
 
     def _zscore(self, samples, mean, std):
@@ -262,6 +337,29 @@ class ZScoreMapper(Mapper):
     dtype = property(fget=lambda self:self.__dtype)
 
 
+def _get_params_dtype(samples):
+    """Floating point data keeps its precision, anything else is float64"""
+    if np.issubdtype(samples.dtype, np.floating):
+        return samples.dtype
+    return np.dtype('float64')
+
+
+def _get_scaling(mean, std):
+    """Z-scoring as (scale, shift) of ``samples * scale + shift``"""
+    if not np.ndim(std):
+        if std == 0:
+            # everything is set to zero
+            return 0., 0.
+        scale = 1. / std
+    else:
+        std = np.asanyarray(std, dtype='float64')
+        # invariant features are only de-meaned
+        scale = np.ones(std.shape)
+        std_nz = std != 0
+        scale[std_nz] /= std[std_nz]
+    return scale, -np.asanyarray(mean, dtype='float64') * scale
+
+
 @borrowkwargs(ZScoreMapper, '__init__')
 def zscore(ds, **kwargs):
     """In-place Z-scoring of a `Dataset` or `ndarray`.
@@ -277,8 +375,7 @@ def zscore(ds, **kwargs):
     **kwargs
       For all other arguments, please see the documentation of `ZScoreMapper`.
     """
-    zm = ZScoreMapper(**kwargs)
-    zm._secret_inplace_zscore = True
+    zm = ZScoreMapper(inplace=True, **kwargs)
     # train
     if isinstance(ds, Dataset):
         zm.train(ds)
@@ -14,7 +14,6 @@ import numpy as np
 
 from mvpa2.base import externals
 from mvpa2.measures.base import FeaturewiseMeasure
-from mvpa2.base.dataset import vstack
 from mvpa2.datasets.base import Dataset
 
 # TODO: Extend with access to functionality from scipy.stats?
@@ -28,6 +27,144 @@ from mvpa2.datasets.base import Dataset
 #
 # and may be some others
 
+def _grouped_stats(samples, groups, ngroups, block_size=1024):
+    """Per-group counts and sums, and total sum of squares of samples.
+
+    Parameters
+    ----------
+    samples : array, shape (nsamples, nfeatures)
+      Might be memory-mapped -- it is read in blocks of `block_size`
+      samples.  Statistics are accumulated in double precision.
+    groups : array, shape (nlabelings, nsamples)
+      Group index of each sample, for every labeling.
+    ngroups : int
+
+    Returns
+    -------
+    counts : array, shape (nlabelings, ngroups)
+    sums : array, shape (nlabelings, ngroups, nfeatures)
+    sumsq : array, shape (nfeatures,)
+      Sums (of squares) are relative to the first sample, which keeps them
+      small and F-scores are invariant to such a shift.
+    """
+    nlabelings, nsamples = groups.shape
+    nfeatures = samples.shape[1]
+    # give each labeling its own set of columns in the indicator matrix
+    columns = groups + (np.arange(nlabelings) * ngroups)[:, None]
+    counts = np.bincount(columns.ravel(), minlength=nlabelings * ngroups)
+    sums = np.zeros((nlabelings * ngroups, nfeatures))
+    sumsq = np.zeros(nfeatures)
+    ref = np.asarray(samples[0], dtype=float)
+    for start in xrange(0, nsamples, block_size):
+        stop = min(start + block_size, nsamples)
+        block = np.asarray(samples[start:stop], dtype=float) - ref
+        indicator = np.zeros((stop - start, nlabelings * ngroups))
+        indicator[np.arange(stop - start)[:, None],
+                  columns[:, start:stop].T] = 1
+        sums += np.dot(indicator.T, block)
+        sumsq += np.sum(block * block, axis=0)
+    return (counts.reshape(nlabelings, ngroups).astype(float),
+            sums.reshape(nlabelings, ngroups, nfeatures),
+            sumsq)
+
+
+def _fscores(counts, sums, sostot, sstot, nsamples):
+    """F-scores from group counts (..., ngroups) and sums (..., ngroups, nf)
+
+    Empty groups are ignored.  Returns F-scores (..., nf) and the between
+    and within degrees of freedom (...,).
+    """
+    # This code is based on SciPy's stats.f_oneway()
+    # Copyright (c) Gary Strangman.  All rights reserved
+    # License: BSD
+    #
+    # However, it got tweaked and optimized to better fit into PyMVPA.
+    nonempty = counts > 0
+    # between group sum of squares
+    ssbn = np.sum(sums * sums / np.where(nonempty, counts, 1)[..., None],
+                  axis=-2)
+    ssbn -= sostot
+    # within
+    sswn = sstot - ssbn
+
+    # degrees of freedom
+    na = np.sum(nonempty, axis=-1)
+    dfbn = na - 1.
+    dfwn = nsamples - na
+
+    # mean sums of squares
+    olderr = np.seterr(invalid='ignore', divide='ignore')
+    try:
+        msb = ssbn / dfbn[..., None]
+        msw = sswn / dfwn[..., None]
+        f = msb / msw
+    finally:
+        np.seterr(**olderr)
+    # assure no NaNs -- otherwise it leads instead of
+    # sane unittest failure (check of NaNs) to crazy
+    #   File "mtrand.pyx", line 1661, in mtrand.shuffle
+    #  TypeError: object of type 'numpy.int64' has no len()
+    # without any sane backtrace
+    f[np.isnan(f)] = 0
+    return f, dfbn, dfwn
+
+
+def compute_fscores(samples, labels, compound=False, block_size=1024):
+    """One-way ANOVA F-scores of all features for one or many labelings.
+
+    Per-group counts and sums are computed once for all labelings (e.g.
+    permutations of the targets) with a single pass over the samples.
+
+    Parameters
+    ----------
+    samples : array, shape (nsamples, nfeatures)
+      Any float type, or memory-mapped.
+    labels : array, shape (nsamples,) or (nlabelings, nsamples)
+      Group labels.
+    compound : bool
+      If True, compute F-scores of all one-vs-rest comparisons of the
+      unique labels instead.
+    block_size : int
+      Number of samples processed at once.
+
+    Returns
+    -------
+    f : array, shape (nlabelings, nfeatures), or with compound
+      (nlabelings, nlabels, nfeatures)
+    dfbn, dfwn : array
+      Degrees of freedom between and within groups (shape of `f` without
+      the last dimension).
+    ul : array
+      Unique labels (all labelings together), i.e. the comparisons of the
+      compound F-scores.
+    """
+    labels = np.asanyarray(labels)
+    ul, groups = np.unique(labels, return_inverse=True)
+    groups = groups.reshape((-1, len(samples)))
+    nsamples = float(len(samples))
+    counts, sums, sumsq = _grouped_stats(samples, groups, len(ul),
+                                         block_size=block_size)
+    # total squares of sums
+    total = np.sum(sums[0], axis=0)
+    sostot = total * total / nsamples
+    # total sum of squares
+    sstot = sumsq - sostot
+
+    if compound:
+        # sums of all other groups as sums of the preceding and following
+        # ones -- exactly the other group for binary problems
+        before = np.zeros(sums.shape)
+        before[:, 1:] = np.cumsum(sums[:, :-1], axis=1)
+        after = np.zeros(sums.shape)
+        after[:, :-1] = np.cumsum(sums[:, :0:-1], axis=1)[:, ::-1]
+        sums = np.concatenate((sums[:, :, None], (before + after)[:, :, None]),
+                              axis=2)
+        counts = np.concatenate((counts[:, :, None],
+                                 (nsamples - counts)[:, :, None]), axis=2)
+    f, dfbn, dfwn = _fscores(counts, sums, sostot, sstot, nsamples)
+    return f, dfbn, dfwn, ul
+
+
 class OneWayAnova(FeaturewiseMeasure):
     """`FeaturewiseMeasure` that performs a univariate ANOVA.
 
@@ -67,62 +204,14 @@ class OneWayAnova(FeaturewiseMeasure):
 
 
     def _call(self, dataset):
-        # This code is based on SciPy's stats.f_oneway()
-        # Copyright (c) Gary Strangman.  All rights reserved
-        # License: BSD
-        #
-        # However, it got tweaked and optimized to better fit into PyMVPA.
-
-        # number of groups
-        targets_sa = dataset.sa[self.get_space()]
-        labels = targets_sa.value
-        ul = targets_sa.unique
-
-        na = len(ul)
-        bign = float(dataset.nsamples)
-        alldata = dataset.samples
-
-        # total squares of sums
-        sostot = np.sum(alldata, axis=0)
-        sostot *= sostot
-        sostot /= bign
-
-        # total sum of squares
-        sstot = np.sum(alldata * alldata, axis=0) - sostot
-
-        # between group sum of squares
-        ssbn = 0
-        for l in ul:
-            # all samples for the respective label
-            d = alldata[labels == l]
-            sos = np.sum(d, axis=0)
-            sos *= sos
-            ssbn += sos / float(len(d))
-
-        ssbn -= sostot
-        # within
-        sswn = sstot - ssbn
-
-        # degrees of freedom
-        dfbn = na-1
-        dfwn = bign - na
-
-        # mean sums of squares
-        msb = ssbn / float(dfbn)
-        msw = sswn / float(dfwn)
-        f = msb / msw
-        # assure no NaNs -- otherwise it leads instead of
-        # sane unittest failure (check of NaNs) to crazy
-        #   File "mtrand.pyx", line 1661, in mtrand.shuffle
-        #  TypeError: object of type 'numpy.int64' has no len()
-        # without any sane backtrace
-        f[np.isnan(f)] = 0
+        f, dfbn, dfwn, ul = compute_fscores(
+            dataset.samples, dataset.sa[self.get_space()].value)
 
         if externals.exists('scipy'):
             from scipy.stats import fprob
-            return Dataset(f[np.newaxis], fa={'fprob': fprob(dfbn, dfwn, f)})
+            return Dataset(f, fa={'fprob': fprob(dfbn[0], dfwn[0], f[0])})
         else:
-            return Dataset(f[np.newaxis])
+            return Dataset(f)
 
 
 class CompoundOneWayAnova(OneWayAnova):
@@ -142,25 +231,13 @@ class CompoundOneWayAnova(OneWayAnova):
         """Computes featurewise f-scores using compound comparisons."""
 
         targets_sa = dataset.sa[self.get_space()]
-        orig_labels = targets_sa.value
-        labels = orig_labels.copy()
-
-        # Lets create a very shallow copy of a dataset with just
-        # samples and targets_attr
-        dataset_mod = Dataset(dataset.samples,
-                              sa={self.get_space() : labels})
-        results = []
-        for ul in targets_sa.unique:
-            labels[orig_labels == ul] = 1
-            labels[orig_labels != ul] = 2
-            f_ds = OneWayAnova._call(self, dataset_mod)
-            if 'fprob' in f_ds.fa:
-                # rename the fprob attribute to something label specific
-                # to survive final aggregation stage
-                f_ds.fa['fprob_' + str(ul)] = f_ds.fa.fprob
-                del f_ds.fa['fprob']
-            results.append(f_ds)
-
-        results = vstack(results)
-        results.sa[self.get_space()] = targets_sa.unique
-        return results
+        f, dfbn, dfwn, ul = compute_fscores(dataset.samples, targets_sa.value,
+                                            compound=True)
+        fa = {}
+        if externals.exists('scipy'):
+            from scipy.stats import fprob
+            for i, l in enumerate(ul):
+                # label specific p-values
+                fa['fprob_' + str(l)] = fprob(dfbn[0, i], dfwn[0, i], f[0, i])
+
+        return Dataset(f[0], sa={self.get_space(): ul}, fa=fa)
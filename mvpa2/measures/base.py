@@ -29,6 +29,7 @@ from mvpa2.misc.args import group_kwargs
 from mvpa2.misc.attrmap import AttributeMap
 from mvpa2.misc.errorfx import mean_mismatch_error
 from mvpa2.base.types import asobjarray
+from mvpa2.kernels.base import prepare_sample_ids
 
 from mvpa2.base.dochelpers import enhanced_doc_string, _str, _repr_attrs
 from mvpa2.base import externals, warning
@@ -288,6 +289,10 @@ class RepeatedMeasure(Measure):
         # precharge conditional attributes
         ca.datasets = []
 
+        # allow to match generated datasets against each other (e.g. for
+        # a CachedKernel to reuse kernel values across all the runs)
+        ds = prepare_sample_ids(ds, node)
+
         # run the node an all generated datasets
         results = []
         for i, sds in enumerate(generator.generate(ds)):
@@ -472,6 +477,65 @@ class CrossValidation(RepeatedMeasure):
         return super(CrossValidation, self)._call(ds)
 
 
+    def call_candidates(self, ds, selected, candidates):
+        """Cross-validate the learner on a number of candidate feature sets.
+
+        Every candidate feature set consists of all `selected` features plus
+        a single feature from `candidates`.  Learners providing
+        ``predict_candidates()`` (e.g. GNB, LDA, RidgeReg) compute the
+        predictions for all candidates of a fold from the sufficient
+        statistics of a single pass over the data, instead of getting
+        retrained for every candidate.
+
+        Parameters
+        ----------
+        ds : Dataset
+          Input dataset with all features.
+        selected : list
+          Feature ids included in every candidate feature set.
+        candidates : list
+          Feature ids to be added to the `selected` ones one at a time.
+
+        Returns
+        -------
+        list or None
+          Result datasets, one per candidate, matching the results of calling
+          this measure with the corresponding feature subsets of `ds`.  None
+          if the learner does not support candidate evaluation.
+        """
+        learner = self.learner
+        if not hasattr(learner, 'predict_candidates') \
+           or learner.get_postproc() is not None:
+            return None
+        # local binding
+        splitter = self.splitter
+        errorfx = self.errorfx
+        space = self.get_space()
+        tattr = learner.get_space()
+
+        # always untrain to wipe out previous stats
+        self.untrain()
+        ds = prepare_sample_ids(ds, learner)
+
+        results = [[] for c in candidates]
+        for i, sds in enumerate(self._generator.generate(ds)):
+            dsgen = splitter.generate(sds)
+            dstrain = dsgen.next()
+            dstest = dsgen.next()
+            predictions = learner.predict_candidates(dstrain, dstest,
+                                                     selected, candidates)
+            for cresults, pred in zip(results, predictions):
+                res = Dataset(np.asanyarray(pred)[:, None],
+                              sa={tattr: dstest.sa[tattr].value})
+                if errorfx is not None:
+                    res = errorfx(res)
+                if space:
+                    res.set_attr(space, (i,))
+                cresults.append(res)
+
+        return [self._postcall(ds, vstack(cresults)) for cresults in results]
+
+
     def _repetition_postcall(self, ds, node, result):
         # local binding
         ca = self.ca
@@ -0,0 +1,211 @@
+# emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vi: set ft=python sts=4 ts=4 sw=4 et:
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See COPYING file distributed along with the PyMVPA package for the
+#   copyright and license terms.
+#
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+"""An efficient implementation of searchlight for representational
+similarity analysis.
+"""
+
+__docformat__ = 'restructuredtext'
+
+import numpy as np
+
+from mvpa2.base.dochelpers import borrowkwargs, _repr_attrs
+from mvpa2.datasets.base import Dataset
+from mvpa2.measures.searchlight import BaseSearchlight
+from mvpa2.misc.neighborhood import IndexQueryEngine, Sphere
+from mvpa2.misc.stats import DSMatrix, condensed_index, standardize_rows
+
+if __debug__:
+    from mvpa2.base import debug
+    import time as time
+
+__all__ = [ "RSASearchlight", 'sphere_rsasearchlight' ]
+
+class RSASearchlight(BaseSearchlight):
+    """Efficient implementation of a representational similarity `Searchlight`.
+
+    For every ROI the dissimilarity matrix (DSM) of all samples is
+    correlated with one or more target DSMs.  In contrast to a generic
+    :class:`~mvpa2.measures.searchlight.Searchlight` running a DSM measure,
+    the target DSMs are ranked and standardized only once, each ROI's
+    DSM is derived from a single product of its sample x feature block
+    with itself, and the DSMs of `roi_batch_size` ROIs are correlated with
+    all targets at once.
+    """
+
+    # TODO: implement parallelization (see #67) and then uncomment
+    __init__doc__exclude__ = ['nproc']
+
+    @borrowkwargs(BaseSearchlight, '__init__')
+    def __init__(self, target_dsm, qe, dsm_metric='correlation',
+                 comparison_metric='spearman', roi_batch_size=256,
+                 **kwargs):
+        """Initialize a RSASearchlight
+
+        Parameters
+        ----------
+        target_dsm : array or DSMatrix
+          Target dissimilarity matrix in condensed form (upper triangle
+          without diagonal, see `mvpa2.misc.stats.condensed_dsm`) or a
+          2D array of several of them (one per row).
+        qe : `QueryEngine`
+          Query engine which would provide neighborhood information
+        dsm_metric : {'correlation', 'euclidean'}
+          Dissimilarity of samples within an ROI: one minus their Pearson
+          correlation, or their euclidean distance.
+        comparison_metric : {'spearman', 'pearson'}
+          Correlation of ROI DSMs with the target DSMs.
+        roi_batch_size : int
+          Number of ROIs whose DSMs are compared with the targets at once.
+        """
+
+        # init base class first
+        BaseSearchlight.__init__(self, qe, **kwargs)
+
+        if not self.nproc in (None, 1):
+            raise NotImplementedError, "For now only nproc=1 (or None for " \
+                  "autodetection) is supported by RSASearchlight"
+        if not dsm_metric in ('correlation', 'euclidean'):
+            raise ValueError("Unknown dsm_metric %r" % dsm_metric)
+        if not comparison_metric in ('spearman', 'pearson'):
+            raise ValueError("Unknown comparison_metric %r"
+                             % comparison_metric)
+
+        if isinstance(target_dsm, DSMatrix):
+            target_dsm = target_dsm.get_condensed_form()
+        self._target_dsm = target_dsm
+        self._dsm_metric = dsm_metric
+        self._comparison_metric = comparison_metric
+        self._roi_batch_size = roi_batch_size
+        # ranked (if needed) and standardized only once
+        self.__targets = standardize_rows(
+            target_dsm, rank=comparison_metric == 'spearman')
+
+
+    def __repr__(self, prefixes=[]):
+        return super(RSASearchlight, self).__repr__(
+            prefixes=prefixes
+            + _repr_attrs(self, ['target_dsm'])
+            + _repr_attrs(self, ['dsm_metric'], default='correlation')
+            + _repr_attrs(self, ['comparison_metric'], default='spearman')
+            + _repr_attrs(self, ['roi_batch_size'], default=256)
+            )
+
+
+    def _sl_call(self, dataset, roi_ids, nproc):
+        """Call to RSASearchlight
+        """
+        # Local bindings
+        qe = self.queryengine
+        targets = self.__targets
+        batch_size = self._roi_batch_size
+
+        if __debug__:
+            time_start = time.time()
+
+        X = dataset.samples
+        if len(X.shape) != 2:
+            raise ValueError(
+                  'Unlike a classifier, %s (for now) operates on already'
+                  'flattened datasets' % (self.__class__.__name__))
+        nsamples = len(X)
+        rows, cols = condensed_index(nsamples)
+        if targets.shape[1] != len(rows):
+            raise ValueError(
+                "Target DSMs of length %d do not match the %d pairs of %d "
+                "samples" % (targets.shape[1], len(rows), nsamples))
+
+        if self._dsm_metric == 'euclidean':
+            # distances don't change, but cancellation in the products does
+            X = X - X.mean(axis=0)
+        else:
+            X = X.astype(float)
+
+        if __debug__:
+            debug('SLC', 'Deducing neighbors information for %i ROIs'
+                  % (len(roi_ids),))
+        roi_fids = [qe.query_byid(f) for f in roi_ids]
+        self.ca.roi_feature_ids = roi_fids
+        roi_sizes = []
+        if self.ca.is_enabled('roi_sizes'):
+            roi_sizes = [len(x) for x in roi_fids]
+        # Since this is ad-hoc implementation of the searchlight, we are not
+        # passing those via ds.a  but rather assign directly to self.ca
+        self.ca.roi_sizes = roi_sizes
+
+        results = np.zeros((len(targets), len(roi_ids)))
+        grams = np.empty((min(batch_size, len(roi_ids)), nsamples, nsamples))
+        diag = np.arange(nsamples)
+        # ROIs without variance have no defined correlation
+        olderr = np.seterr(invalid='ignore', divide='ignore')
+        try:
+            for start in xrange(0, len(roi_ids), batch_size):
+                batch = roi_fids[start:start + batch_size]
+                if __debug__:
+                    debug('SLC', "  Doing ROIs %i-%i out of %i"
+                          % (start, start + len(batch), len(roi_ids)))
+                for i, fids in enumerate(batch):
+                    block = X[:, fids]
+                    if self._dsm_metric == 'correlation':
+                        block -= block.mean(axis=1)[:, None]
+                    grams[i] = np.dot(block, block.T)
+                products = grams[:len(batch), rows, cols]
+                sqnorms = grams[:len(batch), diag, diag]
+                if self._dsm_metric == 'correlation':
+                    norms = np.sqrt(sqnorms)
+                    dsms = 1 - products / (norms[:, rows] * norms[:, cols])
+                else:
+                    dsms = sqnorms[:, rows] + sqnorms[:, cols] - 2 * products
+                    dsms = np.sqrt(np.maximum(dsms, 0))
+                dsms = standardize_rows(
+                    dsms, rank=self._comparison_metric == 'spearman')
+                results[:, start:start + len(batch)] = np.dot(targets, dsms.T)
+        finally:
+            np.seterr(**olderr)
+
+        if __debug__:
+            debug('SLC', "%s._call() is done in %.3g sec" %
+                  (self.__class__.__name__, time.time() - time_start))
+
+        return Dataset(results)
+
+    target_dsm = property(fget=lambda self: self._target_dsm)
+    dsm_metric = property(fget=lambda self: self._dsm_metric)
+    comparison_metric = property(fget=lambda self: self._comparison_metric)
+    roi_batch_size = property(fget=lambda self: self._roi_batch_size)
+
+
+@borrowkwargs(RSASearchlight, '__init__', exclude=['roi_ids'])
+def sphere_rsasearchlight(target_dsm, radius=1, center_ids=None,
+                          space='voxel_indices', *args, **kwargs):
+    """Creates a `RSASearchlight` to correlate the dissimilarity matrices
+    of all possible spheres of a certain size within a dataset with target
+    dissimilarity matrices.
+
+    Parameters
+    ----------
+    radius : float
+      All features within this radius around the center will be part
+      of a sphere.
+    center_ids : list of int
+      List of feature ids (not coordinates) the shall serve as sphere
+      centers. By default all features will be used (it is passed
+      roi_ids argument for Searchlight).
+    space : str
+      Name of a feature attribute of the input dataset that defines the spatial
+      coordinates of all features.
+    **kwargs
+      In addition this class supports all keyword arguments of
+      :class:`~mvpa2.measures.rsasearchlight.RSASearchlight`.
+    """
+    # build a matching query engine from the arguments
+    kwa = {space: Sphere(radius)}
+    qe = IndexQueryEngine(**kwa)
+    # init the searchlight with the queryengine
+    return RSASearchlight(target_dsm, qe,
+                          roi_ids=center_ids, *args, **kwargs)
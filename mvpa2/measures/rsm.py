@@ -14,9 +14,9 @@ __docformat__ = 'restructuredtext'
 
 import numpy as np
 from mvpa2.measures.base import Measure
-from mvpa2.misc.stats import DSMatrix
+from mvpa2.misc.stats import condensed_dsm, condensed_index, \
+     standardize_rows, compare_dsms
 from mvpa2.datasets.base import Dataset
-import copy
 
 class RSMMeasure(Measure):
     """RSMMeasure creates a DatasetMeasure object
@@ -38,45 +38,35 @@ class RSMMeasure(Measure):
 
 
     def __call__(self, dataset):
-        dsm_all = []
-        rsm_all = []
         nsubjs = self.nsubjs
-        # create the dissimilarity matrix for each subject's data in the input dataset
+        # condensed dissimilarity matrix for each subject's data in the
+        # input dataset
         ''' TODO: How to handle Nan? should we uncomment the workarounds?
         '''
+        dsm_all = []
         for i in xrange(nsubjs):
-            if self.dset_metric == 'pearson':
-                self.dset_dsm = np.corrcoef(dataset.samples[i*dataset.nsamples/nsubjs:((i+1)*dataset.nsamples/nsubjs),:])
-            else:
-                self.dset_dsm = DSMatrix(dataset.samples[i*dataset.nsamples/nsubjs:((i+1)*dataset.nsamples/nsubjs),:], self.dset_metric)
-                self.dset_dsm = self.dset_dsm.full_matrix
-            orig_dsmatrix = copy.deepcopy(np.matrix(self.dset_dsm))
-            #orig_dsmatrix[np.isnan(orig_dsmatrix)] = 0
-            #orig_dsmatrix[orig_dsmatrix == 0] = -2
-            #orig_tri = np.triu(orig_dsmatrix, k=self.k)
-            #vector_form = orig_tri[abs(orig_tri) > 0]
-            #vector_form[vector_form == -2] = 0
-            vector_form = orig_dsmatrix[np.tri(len(orig_dsmatrix),k=-1*self.k,dtype=bool)]
-            vector_form = np.asarray(vector_form)
-            dset_vec = vector_form[0]
-            dsm_all.append(dset_vec)
+            samples = dataset.samples[i*dataset.nsamples/nsubjs:
+                                      (i+1)*dataset.nsamples/nsubjs]
+            dsm = condensed_dsm(samples, self.dset_metric)
+            if i == 0:
+                rows, cols = condensed_index(len(samples))
+                # pairs at least k off the diagonal
+                offdiag = cols - rows >= self.k
+                ndiag = len(samples) if self.k <= 0 else 0
+                # 'pearson' yields similarities
+                diagonal = float(self.dset_metric == 'pearson')
+            dsm = dsm[offdiag]
+            if ndiag:
+                dsm = np.r_[np.repeat(diagonal, ndiag), dsm]
+            dsm_all.append(dsm)
         dsm_all = np.vstack(dsm_all)
-        #print dsm_all.shape
         if self.compare_ave:
-            for i in xrange(nsubjs):
-                dsm_temp = nsubjs*np.mean(dsm_all, axis=0) - dsm_all[i,:]
-                rsm = np.corrcoef(dsm_temp, dsm_all[i,:])
-                rsm_all.append(rsm[0,1])
+            # correlate each subject with the sum of all others
+            others = np.sum(dsm_all, axis=0) - dsm_all
+            rsm_all = np.sum(standardize_rows(others)
+                             * standardize_rows(dsm_all), axis=1)
         else:
-            rsm = np.corrcoef(dsm_all)
-            rsm = np.matrix(rsm)
-            #rsm[np.isnan(rsm)] = 0
-            #rsm[rsm == 0] = -2
-            #rsm = np.triu(rsm, k=1)
-            #rsm = rsm[abs(rsm) > 0]
-            #rsm[rsm == -2] = 0
-            rsm = rsm[np.tri(len(rsm),k=-1,dtype=bool)]
-            rsm = np.asarray(rsm)
-            rsm_all = rsm[0]
+            rsm = compare_dsms(dsm_all, metric='pearson')
+            rsm_all = rsm[np.tril_indices(len(rsm), -1)]
 
         return Dataset(rsm_all)
@@ -0,0 +1,123 @@
+# emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vi: set ft=python sts=4 ts=4 sw=4 et:
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See COPYING file distributed along with the PyMVPA package for the
+#   copyright and license terms.
+#
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+"""Selectable engines for (truncated) singular value decompositions"""
+
+__docformat__ = 'restructuredtext'
+
+import numpy as np
+
+from mvpa2.base import externals
+
+if __debug__:
+    from mvpa2.base import debug
+
+__all__ = ['svd', 'svd_engines']
+
+svd_engines = ('numpy', 'scipy', 'dgesvd', 'randomized', 'gram')
+"""Known SVD engines"""
+
+
+def svd(a, engine='numpy', rank=None, oversampling=10, niter=2):
+    """Thin singular value decomposition with a selectable engine.
+
+    Parameters
+    ----------
+    a : array, shape (M, N)
+      Matrix to decompose.
+    engine : {'numpy', 'scipy', 'dgesvd', 'randomized', 'gram'}
+      'numpy' and 'scipy' use LAPACK's divide-and-conquer driver (gesdd),
+      'dgesvd' the ctypes wrapper of LAPACK's dgesvd.  'randomized'
+      approximates the leading `rank` components from the range of `a`
+      applied to random vectors (Halko et al., 2011).  'gram' computes the
+      eigendecomposition of the smaller of the two Gram matrices -- fast for
+      very wide or tall matrices, but only accurate for singular values well
+      above the square root of the machine precision (relative to the
+      largest one).
+    rank : int or None
+      Number of leading components to return.  If None, all min(M, N)
+      components are computed.
+    oversampling : int
+      Number of additional random vectors for the 'randomized' engine.
+    niter : int
+      Number of power iterations for the 'randomized' engine.  Increases
+      accuracy for slowly decaying spectra.
+
+    Returns
+    -------
+    U : array, shape (M, K)
+    s : array, shape (K,)
+      Singular values in descending order.
+    Vh : array, shape (K, N)
+      K is min(M, N), or `rank` if that is smaller.
+    """
+    a = np.asarray(a)
+    if not np.issubdtype(a.dtype, np.inexact):
+        a = a.astype(float)
+    k = min(a.shape)
+    if rank is not None:
+        k = min(k, rank)
+
+    if engine == 'numpy':
+        U, s, Vh = np.linalg.svd(a, full_matrices=False)
+    elif engine == 'scipy':
+        # would raise exception if not present
+        externals.exists('scipy', raise_=True)
+        import scipy.linalg
+        U, s, Vh = scipy.linalg.svd(a, full_matrices=False)
+    elif engine == 'dgesvd':
+        from mvpa2.support.lapack_svd import svd as dgesvd
+        U, s, Vh = dgesvd(a, full_matrices=False, algo='svd')
+    elif engine == 'randomized':
+        U, s, Vh = _randomized_svd(a, k, oversampling, niter)
+    elif engine == 'gram':
+        U, s, Vh = _gram_svd(a)
+    else:
+        raise ValueError("Unknown SVD engine %r. Known are: %s"
+                         % (engine, ', '.join(svd_engines)))
+
+    if __debug__:
+        debug('SVD', "%s SVD of %s matrix into %d components"
+              % (engine, a.shape, k))
+    return U[:, :k], s[:k], Vh[:k]
+
+
+def _randomized_svd(a, k, oversampling, niter):
+    """Randomized range finder followed by an exact SVD in the found range
+    """
+    m, n = a.shape
+    if m < n:
+        # operate on the tall matrix
+        Vh, s, U = _randomized_svd(a.T, k, oversampling, niter)
+        return U.T, s, Vh.T
+    nvectors = min(k + oversampling, n)
+    Q = np.linalg.qr(np.dot(a, np.random.normal(size=(n, nvectors))))[0]
+    for i in xrange(niter):
+        # re-orthonormalize to not lose the smaller components
+        Q = np.linalg.qr(np.dot(a.T, Q))[0]
+        Q = np.linalg.qr(np.dot(a, Q))[0]
+    Ub, s, Vh = np.linalg.svd(np.dot(Q.T, a), full_matrices=False)
+    return np.dot(Q, Ub), s, Vh
+
+
+def _gram_svd(a):
+    """SVD via eigendecomposition of the smaller Gram matrix
+    """
+    m, n = a.shape
+    if m > n:
+        Vh, s, U = _gram_svd(a.T)
+        return U.T, s, Vh.T
+    evals, U = np.linalg.eigh(np.dot(a, a.T))
+    # descending order
+    evals, U = evals[::-1], U[:, ::-1]
+    s = np.sqrt(np.maximum(evals, 0))
+    # right singular vectors for all non-vanishing singular values
+    nonzero = s > s[0] * np.finfo(a.dtype).eps * max(m, n)
+    Vh = np.zeros((m, n), dtype=np.result_type(a, U))
+    Vh[nonzero] = np.dot(U[:, nonzero].T, a) / s[nonzero][:, np.newaxis]
+    return U, s, Vh
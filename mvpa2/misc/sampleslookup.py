@@ -8,13 +8,72 @@
 ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
 """Helper to map and validate samples' origids into indices"""
 
+import hashlib
 import numpy as np
 
 if __debug__:
     from mvpa2.base import debug
 
+
+def get_fingerprint(ds, nvalues=4096):
+    """Cheap fingerprint of the samples of a dataset
+
+    In contrast to `hash(ds)` (which is based on the id of the instance and
+    might get reused by another instance after the dataset was garbage
+    collected), the fingerprint is based on the content: shape and dtype of
+    the samples, and up to `nvalues` of their values spread uniformly
+    across the whole array.  Hence its computation time does not depend on
+    the size of the dataset.
+    """
+    samples = np.asanyarray(ds.samples)
+    digest = hashlib.sha1()
+    digest.update(repr((samples.shape, samples.dtype.str)))
+    if samples.size:
+        ids = np.unique(np.linspace(0, samples.size - 1,
+                                    min(nvalues, samples.size))
+                        .astype(np.intp))
+        digest.update(np.ascontiguousarray(samples.flat[ids]).tostring())
+    return digest.hexdigest()
+
+
+def assure_sample_ids(ds):
+    """Assure that samples of a dataset can be identified later on
+
+    Initializes samples' origids (integer indices of the samples) and
+    dataset's `magic_id` (see :func:`get_fingerprint`) unless present, so
+    datasets derived from `ds` (e.g. splits or permutations of it) could be
+    matched against each other, e.g. by a
+    :class:`~mvpa2.kernels.base.CachedKernel`.
+    """
+    if not 'origids' in ds.sa:
+        if __debug__:
+            debug('SAL', "Generating dataset origids for %(ds)s",
+                  msgargs=dict(ds=ds))
+        # integer ids are unique within the dataset, and that is all we
+        # need since magic_id identifies the dataset itself
+        ds.sa['origids'] = np.arange(len(ds))
+    if not 'magic_id' in ds.a:
+        if __debug__:
+            debug('SAL', "Generating dataset magic_id for %(ds)s",
+                  msgargs=dict(ds=ds))
+        ds.a.update({'magic_id': get_fingerprint(ds)})
+
+
+def _kind(a):
+    """Kind of the array's dtype with all integer types deemed the same"""
+    kind = a.dtype.kind
+    if kind in 'iu':
+        return 'i'
+    return kind
+
+
 class SamplesLookup(object):
     """Map to translate sample origids into unique indices.
+
+    Lookup is vectorized: integer origids (as generated by
+    :func:`assure_sample_ids`) which are dense enough get mapped via a
+    direct offset table, any other origids (e.g. strings generated by
+    `Dataset.init_origids`) via binary search in the sorted origids.
     """
 
     def __init__(self, ds):
@@ -25,58 +84,102 @@ class SamplesLookup(object):
             Dataset for which to create the map
         """
 
-        # TODO: Generate origids and magic_id in Dataset!!
-        # They are simply added here for development convenience, but they
-        # should be removed.  We should also consider how exactly to calculate
-        # the magic ids and sample ids as this is not necessarily the fastest/
-        # most robust method --SG
-        try:
-            sample_ids = ds.sa.origids
-        except AttributeError:
-            # origids not yet generated
-            if __debug__:
-                debug('SAL',
-                      "Generating dataset origids in SamplesLookup for %(ds)s",
-                      msgargs=dict(ds=ds))
-
-            ds.init_origids('samples')  # XXX may be both?
-            sample_ids = ds.sa.origids
-
-        try:
-            self._orig_ds_id = ds.a.magic_id
-        except AttributeError:
-            ds.a.update({'magic_id': hash(ds)})
-            self._orig_ds_id = ds.a.magic_id
-            if __debug__:
-                debug('SAL',
-                      "Generating dataset magic_id in SamplesLookup for %(ds)s",
-                      msgargs=dict(ds=ds))
-
-        nsample_ids = len(sample_ids)
-        self._map = dict(zip(sample_ids,
-                             range(nsample_ids)))
+        assure_sample_ids(ds)
+        self._orig_ds_id = ds.a.magic_id
+        self._ids = np.asanyarray(ds.sa.origids)
+        self._build()
         if __debug__:
             # some sanity checks
-            if len(self._map) != nsample_ids:
+            if len(np.unique(self._ids)) != len(self._ids):
                 raise ValueError, \
                     "Apparently samples' origids are not uniquely identifying" \
                     " samples in %s.  You must change them so they are unique" \
                     ". Use ds.init_origids('samples')" % ds
 
+    def _build(self):
+        """Prepare lookup structures for the known origids"""
+        ids = self._ids
+        self._offsets = self._sorted_ids = self._sorted_indices = None
+        if ids.dtype.kind in 'iu' and len(ids) \
+               and ids.min() >= 0 and ids.max() < 2 * len(ids):
+            offsets = np.empty(ids.max() + 1, dtype=np.intp)
+            offsets.fill(-1)
+            offsets[ids] = np.arange(len(ids))
+            self._offsets = offsets
+        else:
+            self._sorted_indices = order = np.argsort(ids, kind='mergesort')
+            self._sorted_ids = ids[order]
+
+    def __len__(self):
+        return len(self._ids)
+
+    def lookup_ids(self, origids):
+        """Return indices of `origids` (-1 for unknown ones)
+        """
+        origids = np.asanyarray(origids)
+        res = np.empty(len(origids), dtype=np.intp)
+        if not len(origids):
+            return res
+        if self._offsets is not None:
+            offsets = self._offsets
+            if origids.dtype.kind not in 'iu':
+                res.fill(-1)
+                return res
+            inrange = (origids >= 0) & (origids < len(offsets))
+            res.fill(-1)
+            res[inrange] = offsets[origids[inrange]]
+        else:
+            sorted_ids = self._sorted_ids
+            if not len(sorted_ids) \
+                   or _kind(sorted_ids) != _kind(origids):
+                res.fill(-1)
+                return res
+            pos = np.searchsorted(sorted_ids, origids)
+            pos[pos == len(sorted_ids)] = 0
+            res[:] = self._sorted_indices[pos]
+            res[sorted_ids[pos] != origids] = -1
+        return res
+
+    def is_derived(self, ds):
+        """Whether `ds` originates from the dataset the lookup was created for
+        """
+        return 'magic_id' in ds.a and ds.a.magic_id == self._orig_ds_id
+
+    def get_missing(self, ds):
+        """Return boolean mask of samples in `ds` which are not indexed yet
+        """
+        if not self.is_derived(ds):
+            raise KeyError, \
+                  'Dataset %s is not indexed by %s' % (ds, self)
+        return self.lookup_ids(ds.sa.origids) < 0
+
+    def extend(self, ds):
+        """Index additional samples of a derived dataset
+
+        Samples of `ds` which are already indexed are ignored.  New samples
+        get consecutive indices following the already known ones.
+        """
+        new = self.get_missing(ds)
+        if np.any(new):
+            self._ids = np.concatenate((self._ids, ds.sa.origids[new]))
+            self._build()
+
     def __call__(self, ds):
         """
         .. note:
            Will raise KeyError if lookup for sample_ids fails, or ds has not
            been mapped at all
            """
-        if (not 'magic_id' in ds.a) or ds.a.magic_id != self._orig_ds_id:
+        if not self.is_derived(ds):
             raise KeyError, \
                   'Dataset %s is not indexed by %s' % (ds, self)
 
-        _map = self._map
         _origids = ds.sa.origids
-
-        res = np.array([_map[i] for i in _origids])
+        res = self.lookup_ids(_origids)
+        if np.any(res < 0):
+            raise KeyError, \
+                  'Samples %s of dataset %s are not indexed by %s' \
+                  % (_origids[res < 0], ds, self)
         if __debug__:
             debug('SAL',
                   "Successful lookup: %(inst)s on %(ds)s having "
@@ -18,7 +18,6 @@ if externals.exists('scipy', raise_=True):
     __scipy_prior0101 =  externals.versions['scipy'] < '0.10.1'
 
 import numpy as np
-import copy
 
 def chisquare(obs, exp='uniform'):
     """Compute the chisquare value of a contingency table with arbitrary
@@ -83,9 +82,193 @@ def chisquare(obs, exp='uniform'):
     return chisq, st.chisqprob(chisq, np.sum(exp_nonzeros) - 1)
 
 
+dsm_metrics = ('euclidean', 'spearman', 'pearson', 'correlation',
+               'confusion')
+"""Known metrics of `DSMatrix` and `condensed_dsm`"""
+
+
+def rankdata_rows(data):
+    """Rank the elements of each row, assigning average ranks to ties.
+
+    Vectorized equivalent of applying `scipy.stats.rankdata` to every row.
+
+    Parameters
+    ----------
+    data : array, shape (M, N)
+
+    Returns
+    -------
+    array, shape (M, N)
+      1-based ranks in floating point.
+    """
+    data = np.atleast_2d(data)
+    nrows, ncols = data.shape
+    order = np.argsort(data, axis=1, kind='mergesort')
+    rows = np.arange(nrows)[:, None]
+    sdata = data[rows, order]
+    idx = np.arange(ncols)
+    # first and last sorted position of the tie group of each element
+    starts = np.ones(sdata.shape, dtype=bool)
+    starts[:, 1:] = sdata[:, 1:] != sdata[:, :-1]
+    ends = np.ones(sdata.shape, dtype=bool)
+    ends[:, :-1] = starts[:, 1:]
+    first = np.maximum.accumulate(np.where(starts, idx, 0), axis=1)
+    last = np.minimum.accumulate(
+        np.where(ends, idx, ncols - 1)[:, ::-1], axis=1)[:, ::-1]
+    ranks = np.empty(data.shape, dtype=float)
+    ranks[rows, order] = (first + last) / 2.0 + 1
+    return ranks
+
+
+def standardize_rows(data, rank=False):
+    """Center rows and scale them to unit norm.
+
+    Dot products of standardized rows are Pearson correlations (or
+    Spearman correlations if `rank` is True) of the original rows.
+
+    Parameters
+    ----------
+    data : array, shape (M, N)
+    rank : bool
+      Whether to rank-transform the rows first.
+    """
+    data = np.atleast_2d(data)
+    if rank:
+        data = rankdata_rows(data)
+    else:
+        data = data.astype(float)
+    data = data - data.mean(axis=1)[:, None]
+    # constant rows have no defined correlation -- let them produce NaNs
+    olderr = np.seterr(invalid='ignore', divide='ignore')
+    try:
+        data /= np.sqrt(np.sum(data * data, axis=1))[:, None]
+    finally:
+        np.seterr(**olderr)
+    return data
+
+
+def condensed_index(n, k=1):
+    """Row and column indices of the upper triangle of an n x n matrix.
+
+    The order matches the condensed form of `condensed_dsm` (and
+    `scipy.spatial.distance.pdist`) for k=1.
+    """
+    return np.triu_indices(n, k)
+
+
+def condensed_dsm(data, metric='spearman', block_size=1024):
+    """Condensed dissimilarity matrix of a set of vectors.
+
+    Parameters
+    ----------
+    data : array, shape (M,) or (M, N)
+      M vectors (exemplars) of N features each.
+    metric : str
+      One of `dsm_metrics`.  'spearman' and 'correlation' yield one minus
+      the Spearman and Pearson correlations respectively, 'pearson' the
+      Pearson correlation itself (for compatibility with `DSMatrix`),
+      'euclidean' the euclidean distance, and 'confusion' 0 for identical
+      and 1 for different vectors.
+    block_size : int
+      Number of vectors processed at once, bounding the memory needed for
+      intermediate results to `block_size` times M (times N for
+      'confusion').
+
+    Returns
+    -------
+    array, shape (M * (M - 1) / 2,)
+      Upper triangle (without diagonal) in row-major order.
+    """
+    data = np.asanyarray(data)
+    if data.ndim < 2:
+        data = data[:, None]
+    if not metric in dsm_metrics:
+        raise ValueError("Unknown metric %r. Known are: %s"
+                         % (metric, ', '.join(dsm_metrics)))
+    n = len(data)
+    if metric in ('spearman', 'pearson', 'correlation'):
+        # rank (once), center and scale all vectors -- correlations are
+        # plain dot products then
+        data = standardize_rows(data, rank=metric == 'spearman')
+    elif metric == 'euclidean':
+        data = data.astype(float)
+        sqnorms = np.sum(data * data, axis=1)
+
+    rows, cols = condensed_index(n)
+    out = np.empty(len(rows))
+    # offset of each row's entries in the condensed form
+    offsets = np.r_[0, np.cumsum(np.arange(n - 1, 0, -1))]
+    for start in xrange(0, max(n - 1, 0), block_size):
+        stop = min(start + block_size, n - 1)
+        block = slice(offsets[start], offsets[stop])
+        if metric == 'confusion':
+            values = np.any(data[start:stop, None] != data[None], axis=2)
+        else:
+            values = np.dot(data[start:stop], data.T)
+            if metric == 'euclidean':
+                values *= -2
+                values += sqnorms[start:stop, None]
+                values += sqnorms[None]
+                np.sqrt(np.maximum(values, 0), values)
+            elif metric != 'pearson':
+                values = 1 - values
+        out[block] = values[rows[block] - start, cols[block]]
+    return out
+
+
+def squareform_dsm(condensed, diagonal=0):
+    """Full symmetric matrix from a condensed dissimilarity matrix.
+    """
+    condensed = np.asanyarray(condensed)
+    # solve n * (n - 1) / 2 == len(condensed)
+    n = int(round((1 + np.sqrt(1 + 8 * len(condensed))) / 2))
+    if n * (n - 1) / 2 != len(condensed):
+        raise ValueError("%d is not a valid length of a condensed matrix"
+                         % len(condensed))
+    full = np.empty((n, n), dtype=condensed.dtype)
+    rows, cols = condensed_index(n)
+    full[rows, cols] = condensed
+    full[cols, rows] = condensed
+    full[np.diag_indices(n)] = diagonal
+    return full
+
+
+def compare_dsms(dsms, targets=None, metric='spearman'):
+    """Correlate many (condensed) dissimilarity matrices at once.
+
+    Parameters
+    ----------
+    dsms : array, shape (M, P)
+      M dissimilarity matrices in vector (e.g. condensed) form.
+    targets : array, shape (T, P) or (P,), optional
+      Matrices to compare against.  If None, all `dsms` are compared with
+      each other.
+    metric : {'spearman', 'pearson'}
+      Correlation measure.  Each matrix is ranked only once.
+
+    Returns
+    -------
+    array, shape (M, T) or (M, M)
+      Correlation coefficients.
+    """
+    if not metric in ('spearman', 'pearson'):
+        raise ValueError("Unknown metric %r to compare DSMs with" % metric)
+    rank = metric == 'spearman'
+    dsms = standardize_rows(dsms, rank=rank)
+    if targets is None:
+        targets = dsms
+    else:
+        targets = standardize_rows(targets, rank=rank)
+    return np.dot(dsms, targets.T)
+
+
 class DSMatrix(object):
     """DSMatrix allows for the creation of dissilimarity matrices using
        arbitrary distance metrics.
+
+    Only the condensed upper triangle is computed and stored; the full
+    matrix is constructed on first access.  All forms are plain ndarrays
+    (no `numpy.matrix`), i.e. `get_vector_form()` is 1D.
     """
 
     # metric is a string
@@ -99,71 +282,34 @@ class DSMatrix(object):
            and n is the number of features per exemplar
         metric : string
            Distance metric to use (e.g., 'euclidean', 'spearman', 'pearson',
-           'confusion')
+           'correlation', 'confusion')
         """
         # init members
-        self.full_matrix = []
+        self._full_matrix = None
         self.u_triangle = None
         self.vector_form = None
 
         # this one we know straight away, so set it
         self.metric = metric
 
-        # size of dataset (checking if we're dealing with a column vector only)
-        num_exem = np.shape(data_vectors)[0]
-        flag_1d = False
-        # changed 4/26/09 to new way of figuring out if array is 1-D
-        #if (isinstance(data_vectors, np.ndarray)):
-        if (not(num_exem == np.size(data_vectors))):
-            num_features = np.shape(data_vectors)[1]
-        else:
-            flag_1d = True
-            num_features = 1
-
-        # generate output (dissimilarity) matrix
-        dsmatrix = np.mat(np.zeros((num_exem, num_exem)))
-
-        if (metric == 'euclidean'):
-            #print 'Using Euclidean distance metric...'
-            # down rows
-            for i in range(num_exem):
-                # across columns
-                for j in range(num_exem):
-                    if (not(flag_1d)):
-                        dsmatrix[i, j] = np.linalg.norm(
-                            data_vectors[i, :] - data_vectors[j, :])
-                    else:
-                        dsmatrix[i, j] = np.linalg.norm(
-                            data_vectors[i] - data_vectors[j])
-
-        elif (metric == 'spearman'):
-            #print 'Using Spearman rank-correlation metric...'
-            # down rows
-            for i in range(num_exem):
-                # across columns
-                for j in range(num_exem):
-                    dsmatrix[i, j] = 1 - st.spearmanr(
-                        data_vectors[i,:], data_vectors[j,:])[0]
-
-        elif (metric == 'pearson'):
-            dsmatrix = np.corrcoef(data_vectors)
-
-        elif (metric == 'confusion'):
-            #print 'Using confusion correlation metric...'
-            # down rows
-            for i in range(num_exem):
-                # across columns
-                for j in range(num_exem):
-                    if (not(flag_1d)):
-                        dsmatrix[i, j] = 1 - int(
-                            np.floor(np.sum((
-                                data_vectors[i, :] == data_vectors[j, :]
-                                ).astype(np.int32)) / num_features))
-                    else:
-                        dsmatrix[i, j] = 1 - int(
-                            data_vectors[i] == data_vectors[j])
-
-        self.full_matrix = dsmatrix
+        self.condensed = condensed_dsm(data_vectors, metric)
+        self.nexemplars = len(data_vectors)
+
+    def _get_diagonal(self):
+        if self.metric == 'pearson':
+            # similarities
+            return 1.
+        return 0.
+
+    @property
+    def full_matrix(self):
+        if self._full_matrix is None:
+            if self.nexemplars == 1:
+                self._full_matrix = np.atleast_2d(self._get_diagonal())
+            else:
+                self._full_matrix = squareform_dsm(self.condensed,
+                                                   self._get_diagonal())
+        return self._full_matrix
 
     ##REF: Name was automagically refactored
     def get_triangle(self):
@@ -173,42 +319,20 @@ class DSMatrix(object):
 
         return self.u_triangle
 
-    # create the dissimilarity matrix on the (upper) triangle of the two
-    # two dissimilarity matrices; we can just reuse the same dissimilarity
-    # matrix code, but since it will return a matrix, we need to pick out
-    # either dsm[0,1] or dsm[1,0]
-    # note:  this is a bit of a kludge right now, but it's the only way to solve
-    # certain problems:
-    #  1.  Set all 0-valued elements in the original matrix to -1 (an impossible
-    #        value for a dissimilarity matrix)
-    #  2.  Find the upper triangle of the matrix
-    #  3.  Create a vector from the upper triangle, but only with the
-    #      elements whose absolute value is greater than 0 -- this
-    #      will keep everything from the original matrix that wasn't
-    #      part of the zero'ed-out portion when we took the upper
-    #      triangle
-    #  4.  Set all the -1-valued elements in the vector to 0 (their
-    #      original value)
-    #  5.  Cast to numpy array
     ##REF: Name was automagically refactored
     def get_vector_form(self):
+        """Upper triangle including the diagonal in row-major order"""
         if (self.vector_form is not None):
             return self.vector_form
 
-        orig_dsmatrix = copy.deepcopy(self.get_full_matrix())
-
-        orig_dsmatrix[orig_dsmatrix == 0] = -1
-
-        orig_tri = np.triu(orig_dsmatrix)
-
-        vector_form = orig_tri[abs(orig_tri) > 0]
-
-        vector_form[vector_form == -1] = 0
-
-        self.vector_form = np.asarray(vector_form)
+        self.vector_form = self.full_matrix[np.triu_indices(self.nexemplars)]
 
         return self.vector_form
 
+    def get_condensed_form(self):
+        """Upper triangle without the diagonal in row-major order"""
+        return self.condensed
+
     # XXX is there any reason to have these get* methods
     #     instead of plain access to full_matrix and method?
     ##REF: Name was automagically refactored
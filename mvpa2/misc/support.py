@@ -14,6 +14,7 @@ import itertools
 import math
 import random
 import re, os, sys
+import threading
 
 # for SmartVersion
 from distutils.version import Version
@@ -798,3 +799,114 @@ def get_nelements_per_value(data):
 
     return result
 
+
+def get_group_slicers(groups, ngroups):
+    """Returns selectors of the elements of each group.
+
+    Groups of consecutive elements are selected by slices (i.e. yield
+    views when used for indexing), all others by index arrays, which are
+    determined in a single sort.
+
+    Parameters
+    ----------
+    groups : array of int
+      Group index (0 ... ngroups-1) of each element, e.g. as returned by
+      ``np.unique(..., return_inverse=True)``.
+    ngroups : int
+      Number of groups.
+
+    Returns
+    -------
+    list of slices or index arrays
+      Selector of the elements of each group, preserving their order.
+    """
+    # starts of runs of the same group
+    starts = np.concatenate(([0], np.flatnonzero(groups[1:] != groups[:-1]) + 1))
+    if len(starts) == ngroups:
+        # each group is a single run
+        slicers = [None] * ngroups
+        for start, stop in zip(starts, np.concatenate((starts[1:],
+                                                       [len(groups)]))):
+            slicers[groups[start]] = slice(start, stop)
+        return slicers
+    counts = np.bincount(groups, minlength=ngroups)
+    order = np.argsort(groups, kind='mergesort')
+    return np.split(order, np.cumsum(counts)[:-1])
+
+
+def get_nproc(nproc):
+    """Resolve the number of workers to use.
+
+    ``None`` stands for all available cores, any other value is returned
+    unchanged.
+    """
+    if nproc is None:
+        try:
+            import multiprocessing
+            nproc = multiprocessing.cpu_count()
+        except (ImportError, NotImplementedError):
+            nproc = 1
+    return nproc
+
+
+def parallel_map(fx, items, nproc=1):
+    """Apply a function to every item using a pool of threads.
+
+    All workers live in the same process, hence any data `fx` operates
+    on is shared without copying or pickling.  Computation overlaps
+    whenever `fx` spends its time in code releasing the interpreter lock
+    (NumPy/BLAS routines, ctypes calls, libsvm).
+
+    Parameters
+    ----------
+    fx : callable
+      Function of a single argument.
+    items : iterable
+      Arguments to call `fx` with.
+    nproc : None or int
+      Maximal number of concurrent workers.  If None -- as many as there
+      are cores.  With ``nproc=1`` items get processed sequentially in the
+      calling thread.
+
+    Returns
+    -------
+    list
+      Results of `fx` in the order of `items`.  The first exception raised
+      by any worker gets re-raised in the caller.
+    """
+    items = list(items)
+    nproc = min(get_nproc(nproc), len(items))
+    if nproc <= 1:
+        return [fx(item) for item in items]
+
+    results = [None] * len(items)
+    errors = []
+    todo = iter(enumerate(items))
+    lock = threading.Lock()
+
+    def worker():
+        while not errors:
+            lock.acquire()
+            try:
+                try:
+                    i, item = todo.next()
+                except StopIteration:
+                    return
+            finally:
+                lock.release()
+            try:
+                results[i] = fx(item)
+            except:
+                errors.append(sys.exc_info())
+
+    if __debug__:
+        debug('PARALLEL', "Processing %d items using %d threads"
+              % (len(items), nproc))
+    threads = [threading.Thread(target=worker) for i in xrange(nproc)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    if errors:
+        raise errors[0][0], errors[0][1], errors[0][2]
+    return results
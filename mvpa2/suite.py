@@ -169,6 +169,7 @@ from mvpa2.misc.neighborhood import *
 from mvpa2.measures.searchlight import *
 from mvpa2.measures.gnbsearchlight import *
 from mvpa2.measures.nnsearchlight import *
+from mvpa2.measures.rsasearchlight import *
 from mvpa2.measures.corrstability import *
 
 __sdebug('misc')
@@ -169,3 +169,22 @@ def test_datasetmapping():
     # feature axis should match
     assert_equal(ds.shape[1:], bflatrev.shape[1:])
 
+
+
+def test_strided_boxcars():
+    data = np.arange(60).reshape(20, 3)
+    boxlength = 3
+    for startpoints, shared in (([2, 6, 10, 14], True),   # regular epochs
+                                ([2, 5, 8], True),        # consecutive
+                                ([2, 4, 6], False),       # overlapping
+                                ([2, 9, 10], False)):     # irregular
+        bm = BoxcarMapper(startpoints, boxlength)
+        bm.train(data)
+        mdata = bm.forward(data)
+        assert_array_equal(
+            mdata, [data[s:s + boxlength] for s in startpoints])
+        assert_equal(np.may_share_memory(mdata, data), shared)
+    # flattening consecutive boxcars does not need a copy either
+    cm = ChainMapper([BoxcarMapper([2, 5, 8], boxlength), FlattenMapper()])
+    cm.train(data)
+    ok_(np.may_share_memory(cm.forward(data), data))
@@ -32,7 +32,8 @@ from mvpa2.base.learner import DegenerateInputError, FailedToTrainError, \
 from mvpa2.clfs.meta import CombinedClassifier, \
      BinaryClassifier, MulticlassClassifier, \
      SplitClassifier, MappedClassifier, FeatureSelectionClassifier, \
-     TreeClassifier, RegressionAsClassifier, MaximalVote
+     TreeClassifier, RegressionAsClassifier, MaximalVote, \
+     MaximalEstimate
 from mvpa2.measures.base import TransferMeasure, ProxyMeasure, CrossValidation
 from mvpa2.mappers.flatten import mask_mapper
 from mvpa2.misc.attrmap import AttributeMap
@@ -438,6 +439,39 @@ class ClassifiersTests(unittest.TestCase):
         #                     msg="Should classify correctly")
 
 
+    @sweepargs(clf_=clfswh['binary', '!meta', '!non-deterministic'][:3])
+    def test_split_classifier_parallel(self, clf_):
+        ds = datasets['uni2%s' % self._get_clf_ds(clf_)]
+        enable_ca = ['stats', 'training_stats', 'splits',
+                     'split_training_times', 'split_predicting_times']
+        clf = SplitClassifier(clf=clf_.clone(), enable_ca=enable_ca)
+        clf_p = SplitClassifier(clf=clf_.clone(), nproc=3,
+                                enable_ca=enable_ca)
+        clf.train(ds)
+        clf_p.train(ds)
+        # same splits in the same order
+        assert_equal(len(clf_p.ca.splits), len(ds.UC))
+        for s, s_p in zip(clf.ca.splits, clf_p.ca.splits):
+            assert_array_equal(s[1].chunks, s_p[1].chunks)
+        assert_array_equal(clf.ca.stats.matrix, clf_p.ca.stats.matrix)
+        assert_array_equal(clf.ca.training_stats.matrix,
+                           clf_p.ca.training_stats.matrix)
+        # splits are not kept around unless requested
+        clf_s = SplitClassifier(clf=clf_.clone(), enable_ca=['stats'])
+        clf_s.train(ds)
+        assert_array_equal(clf.ca.stats.matrix, clf_s.ca.stats.matrix)
+        pset = list(clf_s.partitioner.generate(ds))[0]
+        split, targets, predictions, estimates = clf_s._train_split((0, pset))
+        assert_true(split is None)
+        assert_array_equal(targets, clf.ca.splits[0][1].targets)
+        assert_equal(len(predictions), len(targets))
+        for c in clf, clf_p:
+            for times in (c.ca.split_training_times,
+                          c.ca.split_predicting_times):
+                assert_equal(len(times), len(ds.UC))
+                assert_true(np.all(np.asarray(times) >= 0))
+
+
     def test_mapped_classifier(self):
         samples = np.array([ [ 0,  0, -1], [ 1, 0, 1],
                             [-1, -1,  1], [-1, 0, 1],
@@ -710,6 +744,78 @@ class ClassifiersTests(unittest.TestCase):
         # TODO: test combiners, e.g. MaximalVote and ca they store
 
 
+    @sweepargs(clf=clfswh['linear', 'binary', '!meta'][:2])
+    def test_multiclass_classifier_parallel(self, clf):
+        ds = datasets['uni4small']
+        mclf = MulticlassClassifier(clf=clf)
+        mclf_p = MulticlassClassifier(clf=clf, nproc=3)
+        assert_true('nproc=3' in repr(mclf_p))
+        mclf.train(ds)
+        mclf_p.train(ds)
+        assert_equal(len(mclf_p.clfs), 6)
+        assert_true(np.all([c.trained for c in mclf_p.clfs]))
+        assert_array_equal(mclf.predict(ds), mclf_p.predict(ds))
+
+
+    @sweepargs(clf=clfswh['linear', 'binary', '!meta'][:2])
+    def test_multiclass_classifier_1vsall(self, clf):
+        ds = datasets['uni4medium']
+        mclf = MulticlassClassifier(clf=clf, bclf_type="1-vs-all",
+                                    nproc=2)
+        mclf.train(ds)
+        assert_equal(len(mclf.clfs), len(ds.uniquetargets))
+        for bclf, l in zip(mclf.clfs, ds.uniquetargets):
+            assert_equal(bclf.poslabels, [l])
+            assert_equal(len(bclf.neglabels), len(ds.uniquetargets) - 1)
+        predictions = mclf.predict(ds)
+        assert_equal(len(predictions), len(ds))
+        # should be well above chance on training data
+        assert_true(np.mean(predictions == ds.targets) > 0.5)
+
+        # samples close to the centroid of three classes in the corners of
+        # a triangle are rejected by all binary classifiers, so a maximal
+        # vote would be a tie among all labels
+        centers = np.array([[0, 1.], [-0.87, -0.5], [0.87, -0.5]])
+        angles = np.linspace(0, 2 * np.pi, 12, endpoint=False)
+        ring = 0.3 * np.c_[np.cos(angles), np.sin(angles)]
+        train = dataset_wizard(np.vstack([c + ring for c in centers]),
+                               targets=np.repeat(['a', 'b', 'c'], 12))
+        test = dataset_wizard(0.15 * centers, targets=['a', 'b', 'c'])
+        mclf = MulticlassClassifier(
+            clf=clf, bclf_type="1-vs-all",
+            combiner=MaximalEstimate(enable_ca=['estimates']))
+        mclf.train(train)
+        predictions = mclf.predict(test)
+        for bclf in mclf.clfs:
+            assert_false(bclf.poslabels[0] in sum(bclf.ca.predictions, []))
+        assert_array_equal(predictions, test.targets)
+        assert_equal(mclf.combiner.ca.estimates.shape, (3, 3))
+
+        self.assertRaises(ValueError, MulticlassClassifier, clf,
+                          bclf_type="1-vs-none")
+
+
+    def test_multiclass_classifier_1vsall_nonnumeric(self):
+        from mvpa2.clfs.knn import kNN
+        ds = datasets['uni4medium']
+        # kNN estimates are dicts of per-label votes -- no maximal estimate
+        mclf = MulticlassClassifier(
+            clf=kNN(k=5), bclf_type="1-vs-all",
+            combiner=MaximalEstimate())
+        mclf.train(ds)
+        self.assertRaises(ValueError, mclf.predict, ds)
+        # so by default predictions fall back to the maximal vote
+        mclf = MulticlassClassifier(clf=kNN(k=5), bclf_type="1-vs-all")
+        mclf_vote = MulticlassClassifier(clf=kNN(k=5), bclf_type="1-vs-all",
+                                         combiner=MaximalVote())
+        mclf.train(ds)
+        mclf_vote.train(ds)
+        predictions = mclf.predict(ds)
+        assert_true(isinstance(mclf.combiner, MaximalVote))
+        assert_array_equal(predictions, mclf_vote.predict(ds))
+        assert_true(np.mean(predictions == ds.targets) > 0.5)
+
+
     # XXX meta should also work but TODO
     @sweepargs(clf=clfswh['svm', '!meta'])
     def test_svms(self, clf):
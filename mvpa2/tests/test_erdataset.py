@@ -64,6 +64,11 @@ def test_erdataset():
     assert_array_equal(erds.sa.orig_duration, [evs[0]['duration']])
     assert_array_almost_equal(erds.sa.orig_offset, [2.4])
     assert_array_equal(erds.sa.time, [np.arange(2.5, 11, 2.5)])
+    # several events are converted at once
+    evs2 = [{'onset': o, 'duration': 6.2} for o in (4.9, 10.0, 21.3)]
+    erds = eventrelated_dataset(ds, evs2, time_attr='time')
+    assert_array_equal(erds.sa.event_onsetidx, [1, 4, 8])
+    assert_array_almost_equal(erds.sa.orig_offset, [2.4, 0, 1.3])
     # now with closest match
     erds = eventrelated_dataset(ds, evs, time_attr='time', match='closest')
     expected_nsamples = 3
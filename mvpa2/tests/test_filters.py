@@ -12,10 +12,13 @@
 from mvpa2.testing import *
 skip_if_no_external('scipy')
 
+import os
+import tempfile
 import numpy as np
 
 from mvpa2.datasets import Dataset, vstack
-from mvpa2.mappers.filters import FFTResampleMapper
+from mvpa2.mappers.filters import FFTResampleMapper, FIRFilterMapper, \
+     IIRFilterMapper, PolyphaseResampleMapper
 
 def test_resample():
     time = np.linspace(0, 2*np.pi, 100)
@@ -56,3 +59,123 @@ def test_resample():
     # each individual chunks should be identical to previous dataset
     assert_array_almost_equal(mds.samples, mcds.samples[:10])
     assert_array_almost_equal(mds.samples, mcds.samples[10:])
+
+
+def _get_chunked_signal_ds():
+    time = np.linspace(0, 20 * np.pi, 500)
+    signal = np.vstack((np.sin(time), np.cos(3 * time))).T
+    samples = signal + np.random.normal(size=signal.shape).cumsum(axis=0)
+    return Dataset(np.vstack((samples, samples[::-1])),
+                   sa={'chunks': np.repeat([0, 1], len(samples)),
+                       'time': np.tile(time, 2)})
+
+
+def _interleave_chunks(ds):
+    # interleave both chunks, but keep the order of samples within them
+    ids = np.arange(len(ds)).reshape(2, 25, 20).transpose(1, 0, 2).ravel()
+    return ds[ids], ids
+
+
+def test_iir_filter():
+    from scipy.signal import filtfilt
+    ds = _get_chunked_signal_ds()
+    for padtype in ('odd', None):
+        # tiny blocks, carrying the filter state across all of them
+        fm = IIRFilterMapper(3, (1, 10), sampling_rate=100.,
+                             padtype=padtype, chunks_attr='chunks',
+                             block_size=17)
+        fds = fm.forward(ds)
+        assert_equal(fds.shape, ds.shape)
+        assert_array_equal(fds.sa.time, ds.sa.time)
+        for c in (0, 1):
+            chunk = ds.sa.chunks == c
+            assert_array_almost_equal(
+                fds.samples[chunk],
+                filtfilt(fm._b, fm._a, ds.samples[chunk], axis=0,
+                         padtype=padtype))
+        # filtered samples stay in place
+        ids_ds, ids = _interleave_chunks(ds)
+        assert_array_almost_equal(fm.forward(ids_ds).samples,
+                                  fds.samples[ids])
+    # chunks need to be longer than the signal extension
+    assert_raises(ValueError, IIRFilterMapper(3, 0.1, btype='lowpass', padlen=500).forward,
+                  ds.samples[:500])
+
+
+def test_fir_filter():
+    ds = _get_chunked_signal_ds()
+    fm = FIRFilterMapper(51, 0.2, btype='lowpass', padtype=None,
+                         chunks_attr='chunks', block_size=10)
+    fds = fm.forward(ds)
+    assert_equal(fds.shape, ds.shape)
+    for c in (0, 1):
+        samples = ds.samples[ds.sa.chunks == c]
+        # zero-phase: output aligned with the input
+        ref = np.transpose([np.convolve(s, fm._taps, mode='same')
+                            for s in samples.T])
+        assert_array_almost_equal(fds.samples[ds.sa.chunks == c], ref)
+    ids_ds, ids = _interleave_chunks(ds)
+    assert_array_almost_equal(fm.forward(ids_ds).samples, fds.samples[ids])
+    # the block size has no effect on the results
+    fm = FIRFilterMapper(51, (1, 10), sampling_rate=100.)
+    assert_array_almost_equal(
+        fm.forward(ds.samples),
+        FIRFilterMapper(51, (1, 10), sampling_rate=100.,
+                        block_size=7).forward(ds.samples))
+    assert_raises(ValueError, FIRFilterMapper, 50, 0.2)
+    assert_raises(ValueError, FIRFilterMapper, 51, 0.2, btype='lowpas')
+    assert_raises(ValueError, FIRFilterMapper, 51, 0.2, btype='bandpass')
+
+
+def test_polyphase_resample():
+    ds = _get_chunked_signal_ds()
+    for up, down in ((1, 4), (2, 5), (3, 2)):
+        rm = PolyphaseResampleMapper(up, down, chunks_attr='chunks',
+                                     attr_strategy='sample', block_size=9)
+        rds = rm.forward(ds)
+        nout = int(np.ceil(500. * up / down))
+        assert_equal(rds.shape, (2 * nout, ds.nfeatures))
+        assert_array_equal(rds.sa.chunks, np.repeat([0, 1], nout))
+        assert_array_equal(rds.sa.time[:nout],
+                           ds.sa.time[np.arange(nout) * down // up])
+        # reference: filter the zero-stuffed signal and pick every down-th
+        # sample
+        upsampled = np.zeros((500 * up, ds.nfeatures))
+        upsampled[::up] = ds.samples[:500]
+        delay = len(rm._taps) // 2
+        ref = np.transpose([np.convolve(s, rm._taps)[delay::down][:nout]
+                            for s in upsampled.T])
+        assert_array_almost_equal(rds.samples[:nout], ref)
+        # not affected by interleaved chunks
+        assert_array_almost_equal(rm.forward(_interleave_chunks(ds)[0]),
+                                  rds.samples)
+    # signal is preserved in the pass band
+    time = np.linspace(0, 2 * np.pi, 200, endpoint=False)
+    rds = PolyphaseResampleMapper(5, 2).forward(np.sin(time)[:, None])
+    assert_array_almost_equal(rds[20:-20, 0],
+                              np.sin(np.linspace(0, 2 * np.pi, 500,
+                                                 endpoint=False))[20:-20],
+                              decimal=2)
+
+
+def test_filters_memmap():
+    ds = _get_chunked_signal_ds()
+    tmpfile = tempfile.mktemp('mvpa', 'test_filters')
+    try:
+        samples = np.memmap(tmpfile, dtype='float32', mode='w+',
+                            shape=ds.shape)
+        samples[:] = ds.samples
+        mmds = Dataset(samples, sa=ds.sa)
+        for m in (IIRFilterMapper(3, 0.1, btype='highpass',
+                                  chunks_attr='chunks'),
+                  FIRFilterMapper(31, (0.1, 0.5), chunks_attr='chunks'),
+                  PolyphaseResampleMapper(1, 3, chunks_attr='chunks')):
+            m.block_size = 64
+            res = m.forward(mmds)
+            assert_equal(res.samples.dtype, np.float32)
+            assert_false(isinstance(res.samples, np.memmap))
+            assert_array_almost_equal(res.samples, m.forward(ds).samples,
+                                      decimal=4)
+        del samples, mmds
+    finally:
+        os.remove(tmpfile)
@@ -65,6 +65,30 @@ def test_samplesgroup_mapper():
     ok_(len(mapped) == 3)
     ok_(not None in mapped.sa.origids)
 
+def test_samplesgroup_mapper_unsorted():
+    # interleaved groups, and an attribute that is not uniform within groups
+    ds = dataset_wizard(samples=np.arange(24.).reshape(12, 2),
+                        targets=[2, 0, 1] * 4,
+                        chunks=[1, 1, 0, 0, 1, 1, 0, 0, 1, 1, 0, 0])
+    ds.sa['runtype'] = ['a', 'b'] * 6
+    # each group consists of two samples, e.g. targets=0, chunks=0 of
+    # samples 7 and 10
+    for fx, csamples in (
+        (np.mean, [[17, 18], [13, 14], [9, 10], [5, 6], [13, 14], [9, 10]]),
+        (np.sum, [[34, 36], [26, 28], [18, 20], [10, 12], [26, 28], [18, 20]]),
+        (np.var, [[9, 9], [81, 81], [9, 9], [9, 9], [9, 9], [81, 81]]),
+        (np.std, [[3, 3], [9, 9], [3, 3], [3, 3], [3, 3], [9, 9]]),
+        (np.min, [[14, 15], [4, 5], [6, 7], [2, 3], [10, 11], [0, 1]]),
+        (np.max, [[20, 21], [22, 23], [12, 13], [8, 9], [16, 17], [18, 19]])):
+        for f in (fx, lambda x: fx(x)):
+            # going through apply_along_axis with the lambda
+            mds = FxMapper('samples', f, uattrs=['targets', 'chunks'])(ds)
+            assert_array_almost_equal(mds.samples, csamples)
+            assert_array_equal(mds.targets, [0, 1, 2, 0, 1, 2])
+            assert_array_equal(mds.chunks, [0, 0, 0, 1, 1, 1])
+            assert_array_equal(mds.sa.runtype, ['a+b'] * 6)
+
+
 def test_featuregroup_mapper():
     ds = Dataset(np.arange(24).reshape(3,8))
     ds.fa['roi'] = [0, 1] * 4
@@ -84,6 +108,18 @@ def test_featuregroup_mapper():
     # FAs should simply remain the same
     assert_array_equal(mds.sa.chunks, np.arange(3))
 
+    # absent combinations of attribute values yield no feature (as no
+    # sample would be yielded for samples groups)
+    ds.fa['h'] = [0, 0, 1, 1, 2, 0, 2, 0]
+    mds = mean_group_feature(['roi', 'h'])(ds)
+    assert_equal(mds.shape, (3, 5))
+    assert_array_almost_equal(mds.samples,
+                              [[0, 2, 5, 13 / 3., 3],
+                               [8, 10, 13, 37 / 3., 11],
+                               [16, 18, 21, 61 / 3., 19]])
+    assert_array_equal(mds.fa.roi, [0, 0, 0, 1, 1])
+    assert_array_equal(mds.fa.h, [0, 1, 2, 0, 1])
+
     # now without grouping
     m = mean_feature()
     # forwarding just the samples should yield the same result
@@ -11,8 +11,10 @@
 from mvpa2.base import externals
 from mvpa2.misc import data_generators
 from mvpa2.misc.attrmap import AttributeMap
-from mvpa2.kernels.np import GeneralizedLinearKernel
-from mvpa2.clfs.gpr import GPR
+from mvpa2.kernels.np import GeneralizedLinearKernel, \
+     SquaredExponentialKernel
+from mvpa2.clfs.gpr import GPR, GPRLinearWeights
+from mvpa2.kernels.np import LinearKernel
 
 from mvpa2.testing import *
 from mvpa2.testing.datasets import datasets
@@ -35,6 +37,62 @@ class GPRTests(unittest.TestCase):
     def test_linear(self):
         pass
 
+    def test_inducing(self):
+        # smooth 1D problem -- half of the samples should be plenty
+        dataset = data_generators.sin_modulated(60, 1)
+        clf = GPR(SquaredExponentialKernel(), sigma_noise=0.3, lm=1e-6,
+                  enable_ca=['predicted_variances', 'log_marginal_likelihood'])
+        clf.train(dataset)
+        y = clf.predict(dataset.samples)
+        var = clf.ca.predicted_variances
+        lml = clf.ca.log_marginal_likelihood
+
+        clf_ind = GPR(SquaredExponentialKernel(), sigma_noise=0.3, lm=1e-6,
+                      inducing=30,
+                      enable_ca=['predicted_variances',
+                                 'log_marginal_likelihood'])
+        clf_ind.train(dataset)
+        assert_equal(len(clf_ind._train_fv), 30)
+        y_ind = clf_ind.predict(dataset.samples)
+        assert_array_equal(y_ind.shape, dataset.targets.shape)
+        assert_array_almost_equal(y_ind, y, decimal=2)
+        var_ind = clf_ind.ca.predicted_variances
+        self.assertTrue(np.all(var_ind > 0))
+        assert_array_almost_equal(var_ind, var, decimal=2)
+        self.assertTrue(np.isfinite(clf_ind.ca.log_marginal_likelihood))
+        self.assertTrue(abs(clf_ind.ca.log_marginal_likelihood - lml)
+                        < 0.1 * abs(lml))
+
+        # no approximation if there are fewer samples than inducing points
+        clf_all = GPR(SquaredExponentialKernel(), sigma_noise=0.3, lm=1e-6,
+                      inducing=100)
+        clf_all.train(dataset)
+        assert_array_almost_equal(clf_all.predict(dataset.samples), y)
+
+    def test_inducing_linear_weights(self):
+        # as many inducing points as features span the whole space of a
+        # linear model, so the approximation is exact
+        ds = datasets['uni2small'][:, :3].copy()
+        ds.targets = np.dot(ds.samples, [1., -2., 0.5]) \
+                     + np.random.normal(scale=0.1, size=len(ds))
+        sens = []
+        for inducing in (None, 3):
+            clf = GPR(LinearKernel(), sigma_noise=0.1, lm=1e-10,
+                      inducing=inducing)
+            clf.train(ds)
+            ana = GPRLinearWeights(clf, enable_ca=['variances'])
+            weights = ana(ds)
+            sens.append((weights.samples, ana.ca.variances))
+        assert_array_almost_equal(sens[0][0], sens[1][0], decimal=4)
+        assert_array_almost_equal(sens[0][1], sens[1][1], decimal=4)
+        # the approximation provides no gradient for model selection
+        clf = GPR(LinearKernel(), inducing=3)
+        assert_raises(ValueError, clf.get_sensitivity_analyzer,
+                      flavor='model_select')
+        clf.train(ds)
+        assert_raises(ValueError,
+                      clf.compute_gradient_log_marginal_likelihood)
+
     def __test_gpr_model_selection(self):
         """Smoke test for running model selection while getting GPRWeights
 
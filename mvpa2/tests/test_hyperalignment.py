@@ -8,6 +8,9 @@
 ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
 """Unit tests for PyMVPA ..."""
 
+import os
+import shutil
+import tempfile
 import unittest
 import numpy as np
 
@@ -22,7 +25,8 @@ from mvpa2.misc.data_generators import random_affine_transformation
 from mvpa2.misc.fx import get_random_rotation
 
 # Somewhat slow but provides all needed ;)
-from mvpa2.testing import sweepargs, reseed_rng
+from mvpa2.testing import sweepargs, reseed_rng, skip_if_no_external
+from mvpa2.testing.tools import assert_array_almost_equal
 from mvpa2.testing.datasets import datasets
 
 from mvpa2.generators.partition import NFoldPartitioner
@@ -170,6 +174,54 @@ class HyperAlignmentTests(unittest.TestCase):
         self.assertEqual(rerrors.shape, (1, n))
 
 
+    @sweepargs(zscore_all=(False, True))
+    @reseed_rng()
+    def test_parallel_and_custom_combiner(self, zscore_all):
+        ds4l = datasets['uni4large']
+        dss = [random_affine_transformation(ds4l) for i in xrange(4)]
+        kwargs = dict(zscore_all=zscore_all, level2_niter=2,
+                      enable_ca=['training_residual_errors'])
+        ha = Hyperalignment(**kwargs)
+        mappers = ha(dss)
+        # aligning datasets concurrently or combining all projections at once
+        # only changes the order of the summation
+        for ha_ in (Hyperalignment(nproc=3, **kwargs),
+                    Hyperalignment(combiner2=lambda l: np.mean(l, axis=0),
+                                   **kwargs)):
+            mappers_ = ha_(dss)
+            assert_array_almost_equal(ha_.commonspace, ha.commonspace)
+            assert_array_almost_equal(ha_.ca.training_residual_errors.samples,
+                                      ha.ca.training_residual_errors.samples)
+            for ds, m, m_ in zip(dss, mappers, mappers_):
+                assert_array_almost_equal(m_.forward(ds.samples),
+                                          m.forward(ds.samples))
+
+
+    @reseed_rng()
+    def test_datasets_on_disk(self):
+        skip_if_no_external('h5py')
+        from mvpa2.base.hdf5 import h5save
+        ds4l = datasets['uni4large']
+        dss = [random_affine_transformation(ds4l) for i in xrange(3)]
+        tempdir = tempfile.mkdtemp()
+        try:
+            fnames = [os.path.join(tempdir, 'ds%i.hdf5' % i)
+                      for i in xrange(len(dss))]
+            for ds, fname in zip(dss, fnames):
+                h5save(fname, ds)
+            ha = Hyperalignment(zscore_all=True)
+            mappers = ha(dss)
+            ha_ = Hyperalignment(zscore_all=True, nproc=2)
+            # mix of datasets on disk and in memory
+            mappers_ = ha_(fnames[:2] + dss[2:])
+            assert_array_almost_equal(ha_.commonspace, ha.commonspace)
+            for ds, m, m_ in zip(dss, mappers, mappers_):
+                assert_array_almost_equal(m_.forward(ds.samples),
+                                          m.forward(ds.samples))
+        finally:
+            shutil.rmtree(tempdir)
+
+
     def _test_on_swaroop_data(self):
         #
         print "Running swaroops test on data we don't have"
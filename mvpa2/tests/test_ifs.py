@@ -22,6 +22,11 @@ from mvpa2.generators.splitters import Splitter
 from mvpa2.featsel.helpers import FixedNElementTailSelector
 from mvpa2.mappers.fx import mean_sample, BinaryFxNode
 from mvpa2.misc.errorfx import mean_mismatch_error
+from mvpa2.misc.data_generators import normal_feature_dataset
+from mvpa2.clfs.gnb import GNB
+from mvpa2.clfs.gda import LDA
+from mvpa2.clfs.knn import kNN
+from mvpa2.clfs.ridge import RidgeReg
 
 
 
@@ -88,6 +93,70 @@ class IFSTests(unittest.TestCase):
         self.assertTrue((resds.samples[:,0] == signal.samples[:,0]).all())
 
 
+    @sweepargs(clf=[GNB(), GNB(common_variance=True), LDA()])
+    @reseed_rng()
+    def test_cv_candidates(self, clf):
+        ds = normal_feature_dataset(perlabel=12, nlabels=3, nchunks=4,
+                                    nfeatures=6, snr=1,
+                                    nonbogus_features=[0, 1, 2])
+        cv = CrossValidation(clf, NFoldPartitioner(), postproc=mean_sample())
+        for selected in ([], [1], [4, 0]):
+            candidates = [i for i in range(ds.nfeatures) if not i in selected]
+            results = cv.call_candidates(ds, selected, candidates)
+            assert_equal(len(results), len(candidates))
+            for c, res in zip(candidates, results):
+                assert_array_almost_equal(res.samples,
+                                          cv(ds[:, selected + [c]]).samples)
+        # no shortcut for other learners
+        cv = CrossValidation(kNN(), NFoldPartitioner())
+        assert_equal(cv.call_candidates(ds, [], range(ds.nfeatures)), None)
+
+
+    @reseed_rng()
+    def test_ridge_candidates(self):
+        ds = normal_feature_dataset(perlabel=12, nlabels=2, nchunks=4,
+                                    nfeatures=6)
+        ds.sa.targets = np.random.normal(size=len(ds))
+        train, test = ds[ds.sa.chunks != 0], ds[ds.sa.chunks == 0]
+        for clf in (RidgeReg(), RidgeReg(lm=2.)):
+            for selected in ([], [1], [4, 0]):
+                candidates = [i for i in range(ds.nfeatures)
+                              if not i in selected]
+                predictions = clf.predict_candidates(train, test, selected,
+                                                     candidates)
+                for c, pred in zip(candidates, predictions):
+                    clf.train(train[:, selected + [c]])
+                    assert_array_almost_equal(
+                            pred, clf.predict(test[:, selected + [c]]))
+
+
+    @reseed_rng()
+    def test_ifs_candidate_evaluation(self):
+        ds = normal_feature_dataset(perlabel=10, nlabels=2, nchunks=5,
+                                    nfeatures=10, snr=3,
+                                    nonbogus_features=[2, 7])
+        ds.sa['purpose'] = np.where(ds.sa.chunks < 4, 'train', 'test')
+        pmeasure = ProxyMeasure(GNB(),
+                                postproc=BinaryFxNode(mean_mismatch_error,
+                                                      'targets'))
+        cv = CrossValidation(GNB(), NFoldPartitioner(), postproc=mean_sample())
+        histories = []
+        # shortcut via sufficient statistics, per-candidate evaluation
+        # (ProxyMeasure has no call_candidates()) and in parallel
+        for fmeasure, nproc in ((cv, 1), (ProxyMeasure(cv), 1),
+                                (ProxyMeasure(cv), 3)):
+            ifs = IFS(fmeasure, pmeasure,
+                      Splitter('purpose', attr_values=['train', 'test']),
+                      fselector=FixedNElementTailSelector(1, tail='lower',
+                                                          mode='select'),
+                      nproc=nproc)
+            ifs.train(ds)
+            histories.append((ifs.ca.errors, ifs(ds).samples))
+        for errors, samples in histories[1:]:
+            assert_array_almost_equal(errors, histories[0][0])
+            assert_array_equal(samples, histories[0][1])
+
+
 def suite():
     return unittest.makeSuite(IFSTests)
 
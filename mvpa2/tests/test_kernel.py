@@ -19,7 +19,9 @@ from mvpa2.clfs.distance import squared_euclidean_distance, \
      pnorm_w, pnorm_w_python
 
 import mvpa2.kernels.np as npK
-from mvpa2.kernels.base import PrecomputedKernel, CachedKernel
+from mvpa2.kernels.base import PrecomputedKernel, CachedKernel, KernelCache
+from mvpa2.misc.sampleslookup import SamplesLookup, assure_sample_ids, \
+     get_fingerprint
 try:
     import mvpa2.kernels.sg as sgK
     _has_sg = True
@@ -165,10 +167,229 @@ class KernelTests(unittest.TestCase):
         ck.compute(d2)
         self.assertTrue(ck._recomputed,
                         "CachedKernel did not automatically recompute new data")
+        # kernels of different datasets do not override each other
+        ck.compute(d)
+        self.failIf(ck._recomputed,
+                    "CachedKernel recomputed old data which is still cached")
+        self.kernel_equiv(rk, ck)
+
+        # but in-place changes must be noticed
+        d.samples[0] += 1
         ck.compute(d)
         self.assertTrue(ck._recomputed,
-                        "CachedKernel did not recompute old data which had\n" +\
-                        "previously been computed, but had the cache overriden")
+                        "CachedKernel did not notice in-place change of data")
+        rk.compute(d)
+        self.kernel_equiv(rk, ck)
+
+    @sweepargs(init=(False, True))
+    def test_samples_lookup(self, init):
+        d = Dataset(np.random.randn(30, 4))
+        if init:
+            # string origids
+            d.init_origids('samples')
+        lookup = SamplesLookup(d)
+        assert_equal(len(lookup), 30)
+        ids = np.random.permutation(30)[:20]
+        assert_array_equal(lookup(d[ids]), ids)
+        assert_array_equal(lookup(d[::-1]), np.arange(30)[::-1])
+        # copies carry the same identity
+        assert_true(lookup.is_derived(d.copy()))
+        # but unrelated datasets do not
+        assert_false(lookup.is_derived(Dataset(np.random.randn(30, 4))))
+
+        # index only a part, and extend later on
+        d1, d2 = d[10:], d[:15]
+        lookup = SamplesLookup(d1)
+        assert_array_equal(lookup.get_missing(d2), np.arange(15) < 10)
+        assert_raises(KeyError, lookup, d2)
+        lookup.extend(d2)
+        assert_equal(len(lookup), 30)
+        assert_array_equal(lookup(d2), [20 + i for i in range(10)]
+                                       + range(5))
+        assert_array_equal(lookup(d1), np.arange(20))
+
+    def test_fingerprint(self):
+        d = Dataset(np.random.randn(100, 20))
+        assert_equal(get_fingerprint(d), get_fingerprint(d.copy()))
+        assert_false(get_fingerprint(d) == get_fingerprint(d[:-1]))
+        d2 = d.copy()
+        d2.samples[-1, -1] += 1
+        assert_false(get_fingerprint(d) == get_fingerprint(d2))
+
+    @reseed_rng()
+    def test_cached_kernel_incremental(self):
+        nchunks = 4
+        d = Dataset(np.random.randn(12 * nchunks, 7))
+        d.sa.chunks = np.arange(len(d)) % nchunks
+        # establish identity of samples before splitting (as done by
+        # CrossValidation and MCNullDist)
+        assure_sample_ids(d)
+        rk = npK.RbfKernel(sigma=2.0)
+        ck = CachedKernel(kernel=npK.RbfKernel(sigma=2.0),
+                          cache=KernelCache())
+        # no precomputation on the full dataset -- train/test kernels of
+        # the folds extend the cached matrix
+        for i in xrange(nchunks):
+            train = d[d.sa.chunks != i]
+            test = d[d.sa.chunks == i]
+            ck.compute(train)
+            self.assertEqual(ck._recomputed, i == 0)
+            rk.compute(train)
+            assert_array_almost_equal(rk.as_np()._k, ck._k)
+            ck.compute(train, test)
+            self.assertEqual(ck._recomputed, i == 0)
+            rk.compute(train, test)
+            assert_array_almost_equal(rk.as_np()._k, ck._k)
+        assert_equal(len(ck.cache), 1)
+
+        # other parameter values get cached alongside
+        ck.params.sigma = 1.0
+        ck.compute(d)
+        self.assertTrue(ck._recomputed)
+        assert_equal(len(ck.cache), 2)
+        ck.params.sigma = 2.0
+        ck.compute(d)
+        self.failIf(ck._recomputed)
+
+    def test_kernel_cache_eviction(self):
+        d1 = Dataset(np.random.randn(20, 3))
+        d2 = Dataset(np.random.randn(20, 3))
+        # enough room for a single 20x20 kernel and its samples
+        cache = KernelCache(maxbytes=20 * 23 * 8)
+        ck = CachedKernel(kernel=npK.LinearKernel(), cache=cache)
+        ck.compute(d1)
+        assert_equal(len(cache), 1)
+        ck.compute(d2)
+        assert_equal(len(cache), 1)
+        self.failIf(cache.nbytes > cache.maxbytes)
+        ck.compute(d2)
+        self.failIf(ck._recomputed)
+        # d1 got evicted
+        ck.compute(d1)
+        self.assertTrue(ck._recomputed)
+        cache.clear()
+        assert_equal(len(cache), 0)
+        assert_equal(cache.nbytes, 0)
+
+    @reseed_rng()
+    def test_cached_kernel_cv(self):
+        from mvpa2.clfs.gpr import GPR
+        from mvpa2.measures.base import CrossValidation
+        from mvpa2.generators.partition import NFoldPartitioner
+        from mvpa2.misc.errorfx import corr_error
+        ds = datasets['sin_modulated'].copy()
+        ds.sa['chunks'] = np.arange(len(ds)) % 4
+        cache = KernelCache()
+        ck = CachedKernel(kernel=npK.RbfKernel(sigma=1.0), cache=cache)
+        res = [CrossValidation(GPR(k), NFoldPartitioner(),
+                               errorfx=corr_error)(ds).samples
+               for k in (npK.RbfKernel(sigma=1.0), ck)]
+        assert_array_almost_equal(res[0], res[1])
+        # all folds shared a single cached kernel
+        assert_equal(len(cache), 1)
+        # samples identity was established on a copy only
+        self.failIf('origids' in ds.sa)
+        self.failIf('magic_id' in ds.a)
+
+    def test_sample_ids_only_for_cached_kernel(self):
+        from mvpa2.clfs.gnb import GNB
+        from mvpa2.clfs.gpr import GPR
+        from mvpa2.measures.base import CrossValidation
+        from mvpa2.generators.partition import NFoldPartitioner
+        from mvpa2.kernels.base import holds_cached_kernel, \
+             prepare_sample_ids
+        ds = datasets['uni2small'].copy()
+        ck = CachedKernel(kernel=npK.LinearKernel())
+        self.failIf(holds_cached_kernel(GNB()))
+        self.failIf(holds_cached_kernel(GPR(npK.LinearKernel())))
+        self.assertTrue(holds_cached_kernel(GPR(ck)))
+        self.assertTrue(holds_cached_kernel(
+            CrossValidation(GPR(ck), NFoldPartitioner())))
+        # nothing to do without a cached kernel
+        self.assertTrue(prepare_sample_ids(ds, GNB()) is ds)
+        CrossValidation(GNB(), NFoldPartitioner())(ds)
+        self.failIf('origids' in ds.sa)
+        self.failIf('magic_id' in ds.a)
+        ds_ids = prepare_sample_ids(ds, GPR(ck))
+        self.failIf(ds_ids is ds)
+        self.failIf('origids' in ds.sa)
+        self.failIf('magic_id' in ds.a)
+        self.assertTrue('magic_id' in ds_ids.a)
+        assert_array_equal(ds_ids.sa.origids, np.arange(len(ds)))
+        # samples themselves are not copied
+        self.assertTrue(ds_ids.samples.base is ds.samples)
+        # already identified datasets are passed through
+        self.assertTrue(prepare_sample_ids(ds_ids, GPR(ck)) is ds_ids)
+
+    def test_cached_kernel_computes_unlocked(self):
+        import threading
+        cache = KernelCache()
+        # whether the cache could be used by another thread while computing
+        unlocked = []
+        class ProbeKernel(npK.LinearKernel):
+            def _compute(self, d1, d2):
+                def probe():
+                    if cache.lock.acquire(False):
+                        cache.lock.release()
+                        unlocked.append(True)
+                    else:
+                        unlocked.append(False)
+                t = threading.Thread(target=probe)
+                t.start()
+                t.join()
+                npK.LinearKernel._compute(self, d1, d2)
+        d = Dataset(np.random.randn(20, 3))
+        assure_sample_ids(d)
+        ck = CachedKernel(kernel=ProbeKernel(), cache=cache)
+        ck.compute(d[:10])
+        # extension by new samples
+        ck.compute(d[5:], d[:10])
+        assert_array_almost_equal(ck._k, np.dot(d.samples[5:],
+                                                d.samples[:10].T))
+        assert_equal(len(unlocked), 3)
+        self.assertTrue(np.all(unlocked))
+
+        # concurrent extensions of the same cached kernel
+        from mvpa2.misc.support import parallel_map
+        d = Dataset(np.random.randn(60, 3))
+        assure_sample_ids(d)
+        subsets = [d[i::4] for i in range(4)] + [d[10:50]]
+        cks = [CachedKernel(kernel=npK.LinearKernel(), cache=cache)
+               for s in subsets]
+        parallel_map(lambda ck_s: ck_s[0].compute(ck_s[1]), zip(cks, subsets),
+                     nproc=5)
+        for ck, s in zip(cks, subsets):
+            assert_array_almost_equal(ck._k, np.dot(s.samples, s.samples.T))
+        ck = CachedKernel(kernel=npK.LinearKernel(), cache=cache)
+        ck.compute(d)
+        assert_array_almost_equal(ck._k, np.dot(d.samples, d.samples.T))
+        # all samples are known by now
+        self.failIf(ck._recomputed)
+
+    def test_kernel_cache_threads(self):
+        import threading
+        cache = KernelCache(maxbytes=5 * 10 * 8)
+        errors = []
+        def worker(offset):
+            try:
+                for i in xrange(200):
+                    key = ('ds', (offset + i) % 13)
+                    if cache.get(key) is None:
+                        cache.put(key, np.zeros(10))
+                    if not i % 50:
+                        cache.shrink()
+            except Exception, e:
+                errors.append(e)
+        threads = [threading.Thread(target=worker, args=(i,))
+                   for i in xrange(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert_equal(errors, [])
+        self.failIf(cache.nbytes > cache.maxbytes)
+        cache.clear()
+        assert_equal(len(cache), 0)
 
     if _has_sg:
         # Unit tests which require shogun kernels
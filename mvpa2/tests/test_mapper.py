@@ -13,7 +13,7 @@ import numpy as np
 from numpy import array
 
 from mvpa2.testing.tools import ok_, assert_raises, assert_false, assert_equal, \
-        assert_true, assert_array_equal, nodebug
+        assert_true, assert_array_equal, assert_array_almost_equal, nodebug
 
 from mvpa2.testing.datasets import datasets
 from mvpa2.mappers.flatten import FlattenMapper
@@ -285,6 +285,120 @@ def test_chainmapper():
     tail_sfs = ds_subsel.a.mapper[-1]
     assert_equal(repr(tail_sfs), 'StaticFeatureSelection(slicearg=array([14]))')
 
+def test_chainmapper_fuse():
+    from mvpa2.mappers.base import FusedForward
+    from mvpa2.mappers.zscore import ZScoreMapper
+    from mvpa2.mappers.detrend import PolyDetrendMapper
+    from mvpa2.mappers.staticprojection import StaticProjectionMapper
+    # interleaved chunks
+    ds = Dataset(np.random.normal(size=(24, 3, 4, 2)),
+                 sa={'chunks': np.arange(24) % 3,
+                     'targets': np.arange(24)},
+                 fa={'roi': np.arange(3)})
+    proj = np.random.normal(size=(12, 4))
+
+    def get_nodes():
+        return [FlattenMapper(space='voxel'),
+                StaticFeatureSelection(slice(2, 20)),
+                ZScoreMapper(),
+                StaticFeatureSelection(np.arange(18) % 3 > 0),
+                PolyDetrendMapper(polyord=1, chunks_attr='chunks'),
+                ZScoreMapper(params=(1., 2.), chunks_attr=None),
+                StaticProjectionMapper(proj),
+                StaticFeatureSelection([0, 3])]
+
+    for dtype in (float, np.float32, int):
+        data = (ds.samples * 10).astype(dtype)
+        cds = ds.copy(deep=False)
+        cds.samples = data
+        cm = ChainMapper(get_nodes())
+        cm.train(cds)
+        mds = cm.forward(cds)
+        fcm = ChainMapper(cm.nodes, fuse=True)
+        fmds = fcm.forward(cds)
+        assert_equal(fmds.shape, mds.shape)
+        assert_equal(fmds.samples.dtype, mds.samples.dtype)
+        assert_array_almost_equal(fmds.samples, mds.samples, decimal=4)
+        assert_equal(sorted(fmds.sa.keys()), sorted(mds.sa.keys()))
+        assert_array_equal(fmds.sa.targets, mds.sa.targets)
+        assert_equal(sorted(fmds.fa.keys()), [])
+        # input is not modified
+        assert_array_equal(cds.samples, data)
+        # with attributes of the features
+        fmds = fcm[:5].forward(cds)
+        mds = cm[:5].forward(cds)
+        assert_array_almost_equal(fmds.samples, mds.samples, decimal=4)
+        for k in ('roi', 'voxel'):
+            assert_array_equal(fmds.fa[k].value, mds.fa[k].value)
+
+    # all but the detrending can be fused for plain data
+    data = ds.samples
+    nodes = get_nodes()[:4]
+    nodes[2] = ZScoreMapper(chunks_attr=None)
+    cm = ChainMapper(nodes, fuse=True)
+    cm.train(ds)
+    fused, fused_nodes = cm._get_fused(cm.nodes, data)
+    assert_equal(len(fused_nodes), 4)
+    # selections are merged into a single gather preceding the Z-scoring
+    assert_equal([op[0] for op in fused._ops], ['select', 'scale'])
+    cm.fuse = False
+    assert_array_almost_equal(ChainMapper(cm.nodes, fuse=True).forward(data),
+                              cm.forward(data))
+    # scaling is folded into projections
+    fused = FusedForward((4,))
+    fused.add([('scale', np.arange(4.), 1., 'float64'),
+               ('project', np.ones((4, 2)), None)])
+    assert_equal(len(fused), 1)
+    assert_array_almost_equal(fused(np.ones((3, 4))), [[10., 10.]] * 3)
+    # but chunk-wise Z-scoring needs a dataset
+    cm = ChainMapper(get_nodes()[:3], fuse=True)
+    cm.train(ds)
+    assert_raises(RuntimeError, cm.forward, ds.samples)
+
+
+def test_staticprojection():
+    from mvpa2.mappers.staticprojection import StaticProjectionMapper
+    from mvpa2.testing.tools import skip_if_no_external
+    skip_if_no_external('scipy')
+    import scipy.sparse as sparse
+    # average features within regions of interest
+    labels = np.arange(30) % 4
+    roi_avg = np.zeros((30, 4))
+    roi_avg[np.arange(30), labels] = 1. / np.bincount(labels)[labels]
+    data = np.random.normal(size=(10, 30)) + 1000
+    target = np.transpose([data[:, labels == l].mean(axis=1)
+                           for l in range(4)])
+    ds = Dataset(data)
+    for proj in (roi_avg, sparse.csr_matrix(roi_avg)):
+        pm = StaticProjectionMapper(proj, demean=False)
+        mapped = pm.forward(data)
+        assert_true(isinstance(mapped, np.ndarray))
+        assert_array_almost_equal(mapped, target)
+        # demeaned
+        pm = StaticProjectionMapper(proj)
+        pm.train(ds)
+        assert_array_almost_equal(pm.forward(ds).samples,
+                                  target - target.mean(axis=0))
+        # sparse reconstruction
+        pm = StaticProjectionMapper(
+                proj, recon=sparse.csr_matrix((roi_avg.T > 0).astype(float)))
+        pm.train(ds)
+        assert_array_almost_equal(pm.reverse(pm.forward(data)),
+                                  (target - target.mean(axis=0))[:, labels]
+                                  + data.mean(axis=0))
+        # single precision
+        pm = StaticProjectionMapper(proj, dtype='float32')
+        pm.train(ds)
+        mapped = pm.forward(data)
+        assert_equal(mapped.dtype, np.float32)
+        assert_array_almost_equal(mapped, target - target.mean(axis=0),
+                                  decimal=4)
+    # pseudo-inverse of a sparse projection
+    pm = StaticProjectionMapper(sparse.csr_matrix(roi_avg), demean=False)
+    assert_array_almost_equal(pm.reverse(target),
+                              target[:, labels])
+
+
 def test_sampleslicemapper():
     # this does nothing but Dataset.__getitem__ which is tested elsewhere -- but
     # at least we run it
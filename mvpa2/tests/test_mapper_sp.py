@@ -122,3 +122,34 @@ def test_polydetrend():
     # but if done inplace that is no longer true
     poly_detrend(ds, chunks_attr='chunks', polyord=1, space='time')
     assert_array_equal(ds, mds)
+
+
+def test_polydetrend_blockwise():
+    # chunks of different lengths in permuted and interleaved order
+    for chunks in (np.repeat([2, 0, 1, 3], [7, 5, 7, 6]),
+                   np.array([0, 1, 2] * 8 + [1])):
+        samples = np.random.normal(size=(len(chunks), 4))
+        ds = dataset_wizard(samples.copy(), chunks=chunks)
+        target = samples.copy()
+        for c in np.unique(chunks):
+            # polynomials of the same order span the same space
+            regs = np.vander(np.linspace(-1, 1, np.sum(chunks == c)), 3)
+            fit = np.linalg.lstsq(regs, samples[chunks == c])[0]
+            target[chunks == c] -= np.dot(regs, fit)
+        for nproc in (1, 2):
+            dm = PolyDetrendMapper(chunks_attr='chunks', polyord=2,
+                                   nproc=nproc)
+            mds = dm.forward(ds)
+            ok_(dm._regs is None)
+            assert_array_almost_equal(mds.samples, target)
+            assert_array_equal(ds.samples, samples)
+            # same residuals with a dense regressor matrix
+            ds.sa['zeros'] = np.zeros(len(ds))
+            mds = PolyDetrendMapper(chunks_attr='chunks', polyord=2,
+                                    opt_regs=['zeros']).forward(ds)
+            assert_array_almost_equal(mds.samples, target)
+        # in-place
+        dm = PolyDetrendMapper(chunks_attr='chunks', polyord=2, inplace=True)
+        mds = dm.forward(ds)
+        ok_(mds.samples is ds.samples)
+        assert_array_almost_equal(ds.samples, target)
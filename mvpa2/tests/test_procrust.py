@@ -18,7 +18,7 @@ from mvpa2.testing import *
 from mvpa2.testing.datasets import *
 from mvpa2.mappers.procrustean import ProcrusteanMapper
 
-svds = ['numpy']
+svds = ['numpy', 'randomized', 'gram']
 if externals.exists('liblapack.so'):
     svds += ['dgesvd']
 if externals.exists('scipy'):
@@ -109,6 +109,31 @@ class ProcrusteanMapperTests(unittest.TestCase):
 
 
 
+    @sweepargs(svd=('numpy', 'randomized', 'gram'))
+    @reseed_rng()
+    def test_wide_data(self, svd):
+        # less samples than features -- cross-product is of low rank
+        samples = np.random.normal(size=(20, 60))
+        ds = dataset_wizard(samples=samples,
+                            targets=np.dot(samples,
+                                           get_random_rotation(60)) + 3)
+        pm = ProcrusteanMapper()
+        pm.train(ds)
+        pm_reduced = ProcrusteanMapper(svd=svd, svd_rank=60)
+        pm_reduced.train(ds)
+        assert_array_almost_equal(pm_reduced.forward(ds.samples),
+                                  pm.forward(ds.samples))
+        assert_almost_equal(pm_reduced._scale, pm._scale)
+        # truncation to the leading components
+        pm_trunc = ProcrusteanMapper(svd=svd, svd_rank=5)
+        pm_trunc.train(ds)
+        assert_equal(np.linalg.matrix_rank(pm_trunc.proj), 5)
+        # cannot guarantee a rotation without all components
+        assert_raises(ValueError,
+                      ProcrusteanMapper(svd_rank=5, reflection=False).train,
+                      ds)
+
+
 def suite():
     return unittest.makeSuite(ProcrusteanMapperTests)
 
@@ -26,9 +26,11 @@ from mvpa2.featsel.base import \
 from mvpa2.featsel.helpers import \
      NBackHistoryStopCrit, FractionTailSelector, FixedErrorThresholdStopCrit, \
      MultiStopCrit, NStepsStopCrit, \
-     FixedNElementTailSelector, BestDetector, RangeElementSelector
+     FixedNElementTailSelector, BestDetector, RangeElementSelector, \
+     TailSelector
 
 from mvpa2.clfs.meta import FeatureSelectionClassifier, SplitClassifier
+from mvpa2.clfs.smlr import SMLR
 from mvpa2.clfs.transerror import ConfusionBasedError
 from mvpa2.misc.attrmap import AttributeMap
 from mvpa2.clfs.stats import MCNullDist
@@ -208,6 +210,38 @@ class RFETests(unittest.TestCase):
                          np.nonzero(data)[0]).all())
 
 
+    @reseed_rng()
+    def test_feature_selector_chunks(self):
+        data = np.random.normal(size=103)
+        # streamed in chunks of irregular size, plain or as datasets
+        def chunks():
+            for i, start in enumerate(range(0, len(data), 20)):
+                chunk = data[start:start + 20]
+                if i % 2:
+                    chunk = Dataset(chunk[None])
+                yield chunk
+        for selector in (FixedNElementTailSelector(7),
+                         FixedNElementTailSelector(7, tail='upper',
+                                                   mode='select'),
+                         FixedNElementTailSelector(200, mode='select'),
+                         FixedNElementTailSelector(5, sort=False),
+                         FractionTailSelector(0.3, mode='select'),
+                         RangeElementSelector(lower=0.5),
+                         RangeElementSelector(lower=-0.5, upper=0.5,
+                                              mode='discard')):
+            selected = selector(data)
+            self.assertTrue(isinstance(selected, np.ndarray))
+            if isinstance(selector, TailSelector):
+                ndiscarded = selector.ca.ndiscarded
+            assert_array_equal(np.sort(selector(chunks())), np.sort(selected))
+            if isinstance(selector, TailSelector):
+                assert_equal(selector.ca.ndiscarded, ndiscarded)
+        # tail selection is not affected by the order of the values
+        selector = FixedNElementTailSelector(10, tail='upper', mode='select')
+        assert_array_equal(selector(data),
+                           np.sort(np.argsort(data)[-10:]))
+
+
     # XXX put GPR back in after it gets fixed up
     @sweepargs(clf=clfswh['has_sensitivity', '!meta', '!gpr'])
     def test_sensitivity_based_feature_selection(self, clf):
@@ -379,6 +413,36 @@ class RFETests(unittest.TestCase):
             # use the same classifier
 
 
+    @reseed_rng()
+    def test_rfe_warm_start(self):
+        data = normal_feature_dataset(perlabel=20, nchunks=5, nfeatures=40,
+                                      nonbogus_features=[0, 1], snr=3)
+        results = []
+        for warm_start in (False, True):
+            clf = SMLR(warm_start=warm_start, convergence_tol=1e-7)
+            rfe = RFE(clf.get_sensitivity_analyzer(postproc=maxofabs_sample()),
+                      ProxyMeasure(clf,
+                                   postproc=BinaryFxNode(mean_mismatch_error,
+                                                         'targets')),
+                      Repeater(2),
+                      fselector=FractionTailSelector(0.2, mode='discard',
+                                                     tail='lower'),
+                      train_pmeasure=False,
+                      update_sensitivity=True)
+            rfe.train(data)
+            # no origids get attached to the original dataset
+            assert_false('origids' in data.fa)
+            results.append((rfe.ca.nfeatures, rfe.ca.history,
+                            rfe(data).samples))
+        # geometric schedule
+        nfeatures = results[0][0]
+        assert_equal(nfeatures[:3], [40, 32, 26])
+        # warm starts do not alter the outcome
+        assert_equal(results[0][0], results[1][0])
+        assert_array_equal(results[0][1], results[1][1])
+        assert_array_equal(results[0][2], results[1][2])
+
+
     def test_james_problem(self):
         percent = 80
         dataset = datasets['uni2small']
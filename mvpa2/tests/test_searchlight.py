@@ -29,6 +29,7 @@ from mvpa2.measures.gnbsearchlight import sphere_gnbsearchlight, \
      GNBSearchlight
 from mvpa2.clfs.gnb import GNB
 
+from mvpa2.measures.rsasearchlight import sphere_rsasearchlight
 from mvpa2.measures.nnsearchlight import sphere_m1nnsearchlight, \
      M1NNSearchlight
 from mvpa2.clfs.knn import kNN
@@ -37,7 +38,8 @@ from mvpa2.misc.neighborhood import IndexQueryEngine, Sphere
 from mvpa2.misc.errorfx import corr_error
 from mvpa2.generators.partition import NFoldPartitioner, OddEvenPartitioner
 from mvpa2.generators.permutation import AttributePermutator
-from mvpa2.measures.base import CrossValidation
+from mvpa2.measures.base import CrossValidation, Measure
+from mvpa2.misc.stats import DSMatrix, condensed_dsm, compare_dsms
 
 
 class SearchlightTests(unittest.TestCase):
@@ -588,6 +590,34 @@ class SearchlightTests(unittest.TestCase):
         assert_array_equal(res1, res2)
 
 
+    @sweepargs(dsm_metric=('correlation', 'euclidean'))
+    @sweepargs(comparison_metric=('spearman', 'pearson'))
+    def test_rsasearchlight(self, dsm_metric, comparison_metric):
+        ds = datasets['3dsmall'].copy(deep=True)[:12, :20]
+        ds.fa['voxel_indices'] = ds.fa.myspace
+        targets = np.random.normal(size=(2, 66))
+
+        class RSAMeasure(Measure):
+            is_trained = True
+            def _call(self, ds):
+                dsm = condensed_dsm(ds.samples, dsm_metric)
+                return Dataset(compare_dsms(targets, dsm, comparison_metric))
+
+        res_ref = sphere_searchlight(RSAMeasure(), radius=1)(ds)
+        sl = sphere_rsasearchlight(targets, radius=1, dsm_metric=dsm_metric,
+                                   comparison_metric=comparison_metric,
+                                   roi_batch_size=7)
+        res = sl(ds)
+        assert_equal(res.shape, (2, 20))
+        assert_array_almost_equal(res.samples, res_ref.samples)
+        # single target given as DSMatrix
+        res = sphere_rsasearchlight(DSMatrix(ds.samples[:, :5], dsm_metric),
+                                    radius=1, dsm_metric=dsm_metric,
+                                    comparison_metric=comparison_metric)(ds)
+        assert_equal(res.shape, (1, 20))
+        # not matching the number of samples
+        assert_raises(ValueError, sl, ds[:5])
+
     def test_custom_results_fx_logic(self):
         # results_fx was introduced for the blow-up-the-memory-Swaroop
         # where keeping all intermediate results of the dark-magic SL
@@ -13,6 +13,7 @@ import numpy as np
 from mvpa2.testing import *
 from mvpa2.testing.datasets import datasets
 
+from mvpa2.datasets import Dataset
 from mvpa2.clfs.smlr import SMLR
 from mvpa2.misc.data_generators import normal_feature_dataset
 
@@ -68,6 +69,113 @@ class SMLRTests(unittest.TestCase):
         self.assertTrue(sens.shape == (len(data.UT) - 1, data.nfeatures))
 
 
+    @sweepargs(implementation=('C', 'Python'))
+    @reseed_rng()
+    def test_smlr_fit_path(self, implementation):
+        data = normal_feature_dataset(perlabel=20, nlabels=3, nfeatures=10,
+                                      nchunks=5, snr=3,
+                                      nonbogus_features=[0, 1, 2])
+        lms = [10., 1., 0.1]
+        clf = SMLR(implementation=implementation, convergence_tol=1e-7)
+        path = clf.fit_path(data, lms)
+        assert_equal(len(path), len(lms))
+        # classifier is left trained for the last lm
+        assert_equal(clf.params.lm, lms[-1])
+        for lm, w in zip(lms, path):
+            clf_cold = SMLR(lm=lm, implementation=implementation,
+                            convergence_tol=1e-7)
+            clf_cold.train(data)
+            w_cold = np.vstack((clf_cold.weights, clf_cold.biases))
+            # same optimum within convergence tolerance
+            self.assertTrue(np.abs(w - w_cold).max()
+                            <= 0.01 * np.abs(w_cold).max() + 1e-10)
+        self.assertTrue(np.abs(path[-1][:-1] - clf.weights).max()
+                        <= 0.01 * np.abs(clf.weights).max() + 1e-10)
+        assert_array_equal(clf.predict(data), clf_cold.predict(data))
+
+    @reseed_rng()
+    def test_smlr_warm_start(self):
+        data = normal_feature_dataset(perlabel=20, nlabels=3, nfeatures=10,
+                                      nchunks=5, snr=3,
+                                      nonbogus_features=[0, 1, 2])
+        clf = SMLR(warm_start=True, convergence_tol=1e-5)
+        clf_cold = SMLR(convergence_tol=1e-5)
+        for lm in (1., 0.5):
+            clf.params.lm = clf_cold.params.lm = lm
+            for chunk in data.UC[:2]:
+                train = data[data.sa.chunks != chunk]
+                clf.train(train)
+                clf_cold.train(train)
+                assert_array_equal(clf.predict(data), clf_cold.predict(data))
+        # no warm start with different labels
+        clf.train(data[data.sa.targets != data.UT[0]])
+        assert_equal(clf.weights.shape[1], len(data.UT) - 1)
+
+
+    @reseed_rng()
+    def test_smlr_warm_start_feature_subset(self):
+        data = normal_feature_dataset(perlabel=20, nlabels=2, nfeatures=10,
+                                      nchunks=5, snr=3,
+                                      nonbogus_features=[0, 1])
+        data.init_origids('features')
+        clf = SMLR(warm_start=True, convergence_tol=1e-7)
+        clf_cold = SMLR(convergence_tol=1e-7)
+        clf.train(data)
+        # features get eliminated (and reordered) as in RFE
+        for ids in ([0, 1, 3, 5, 7, 9], [7, 1, 0, 3]):
+            clf.train(data[:, ids])
+            clf_cold.train(data[:, ids])
+            # weights are only determined up to a per-feature offset
+            w, w_cold = clf.weights, clf_cold.weights
+            assert_array_almost_equal(w - w[:, :1], w_cold - w_cold[:, :1],
+                                      decimal=3)
+            assert_array_equal(clf.predict(data[:, ids]),
+                               clf_cold.predict(data[:, ids]))
+
+
+    @reseed_rng()
+    def test_smlr_threads(self):
+        from mvpa2.misc.support import parallel_map
+        # enough samples for C implementation to use multiple threads
+        data = normal_feature_dataset(perlabel=1100, nlabels=4, nfeatures=6,
+                                      snr=2, nonbogus_features=[0, 1, 2, 3])
+        clf = SMLR(seed=3)
+        clf.train(data)
+        clf_mt = SMLR(seed=3, nproc=2)
+        clf_mt.train(data)
+        # only summation order might differ
+        assert_array_almost_equal(clf.weights, clf_mt.weights)
+        # concurrent fits do not interfere with each other
+        clfs = [SMLR(seed=3) for i in range(3)]
+        parallel_map(lambda c: c.train(data), clfs, nproc=3)
+        for c in clfs:
+            assert_array_equal(c.weights, clf.weights)
+
+    def test_smlr_seed(self):
+        # pin the random sequence of the C implementation: a fit with a
+        # given seed must stay reproducible across releases
+        rs = np.random.RandomState(3)
+        targets = np.repeat([0, 1, 2], 10)
+        samples = rs.randn(30, 4)
+        samples[:, 0] += targets
+        samples[:, 1] -= targets
+        data = Dataset(samples, sa={'targets': targets})
+        clf = SMLR(seed=1, implementation='C')
+        clf.train(data)
+        assert_array_almost_equal(
+            clf.weights,
+            [[-1.55047605  ,  0.          ,  1.0744557897],
+             [ 1.6548305773,  0.4054162874, -1.8625761616],
+             [ 0.          , -0.2307069808,  0.7921708061],
+             [-0.4814258617, -0.0322980369,  0.8547393586]], decimal=6)
+        assert_array_almost_equal(
+            clf.biases, [ 1.8611435506,  1.1566228121, -2.7141788225],
+            decimal=6)
+        # other seeds take another path to the optimum
+        clf_other = SMLR(seed=2, implementation='C')
+        clf_other.train(data)
+        self.failIf(np.all(clf_other.weights == clf.weights))
+
 def suite():
     return unittest.makeSuite(SMLRTests)
 
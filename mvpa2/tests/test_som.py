@@ -14,6 +14,7 @@ import numpy as np
 from mvpa2 import cfg
 from mvpa2.mappers.som import SimpleSOMMapper
 from mvpa2.datasets.base import dataset_wizard
+from mvpa2.testing.tools import assert_array_equal
 
 class SOMMapperTests(unittest.TestCase):
 
@@ -41,6 +42,48 @@ class SOMMapperTests(unittest.TestCase):
             # with bad initialisation
             self.assertTrue((np.round(rmapped) == colors).all())
 
+    def test_batch_training(self):
+        samples = np.random.normal(size=(50, 4))
+        kshape = (6, 5)
+        seed = np.random.randint(100000)
+
+        # reference: original per-sample accumulation for a single iteration
+        np.random.seed(seed)
+        K = np.random.standard_normal(kshape + (4,))
+        som = SimpleSOMMapper(kshape, 1, learning_rate=0.05)
+        dqd = np.fromfunction(lambda x, y: (x**2 + y**2)**0.5,
+                              kshape, dtype='float')
+        k = som._compute_influence_kernel(1, dqd)
+        rows, cols = np.indices(kshape)
+        deltas = np.zeros(K.shape)
+        for s in samples:
+            b = np.unravel_index(np.argmin(((K - s) ** 2).sum(axis=2)),
+                                 kshape)
+            infl = k[np.abs(rows - b[0]), np.abs(cols - b[1])]
+            deltas += infl[:, :, np.newaxis] * (s - K)
+
+        np.random.seed(seed)
+        som.train(samples)
+        self.assertTrue(np.allclose(som.K, K + deltas))
+
+        # all samples mapped at once as they would be one by one
+        assert_array_equal(som.forward(samples),
+                           [som._get_bmu(s) for s in samples])
+
+        # online mini-batches update the layer more often
+        np.random.seed(seed)
+        som_online = SimpleSOMMapper(kshape, 1, learning_rate=0.05,
+                                     batch_size=10)
+        som_online.train(samples)
+        self.assertFalse(np.allclose(som_online.K, som.K))
+        # a single mini-batch is batch training
+        np.random.seed(seed)
+        som_online = SimpleSOMMapper(kshape, 1, learning_rate=0.05,
+                                     batch_size=len(samples))
+        som_online.train(samples)
+        self.assertTrue(np.allclose(som_online.K, som.K))
+        self.assertTrue('batch_size=50' in repr(som_online))
+
 
 def suite():
     return unittest.makeSuite(SOMMapperTests)
@@ -16,7 +16,8 @@ from mvpa2.base import externals
 from mvpa2.clfs.stats import MCNullDist, FixedNullDist, NullDist
 from mvpa2.generators.permutation import AttributePermutator
 from mvpa2.datasets import Dataset
-from mvpa2.measures.anova import OneWayAnova, CompoundOneWayAnova
+from mvpa2.measures.anova import OneWayAnova, CompoundOneWayAnova, \
+     compute_fscores
 from mvpa2.misc.fx import double_gamma_hrf, single_gamma_hrf
 
 
@@ -118,6 +119,32 @@ class StatsTests(unittest.TestCase):
                         msg='In compound anova, we should get different'
                         ' results for different labels. Got %s' % ac)
 
+
+    def test_anova_batched(self):
+        ds = datasets['uni4large']
+        perms = np.array([np.random.permutation(ds.targets)
+                          for i in xrange(3)])
+        f, dfbn, dfwn, ul = compute_fscores(ds.samples, perms, block_size=7)
+        fc = compute_fscores(ds.samples, perms, compound=True)[0]
+        assert_equal(f.shape, (3, ds.nfeatures))
+        assert_equal(fc.shape, (3, 4, ds.nfeatures))
+        assert_array_equal(dfbn, 3)
+        assert_array_equal(dfwn, ds.nsamples - 4)
+        assert_array_equal(ul, ds.UT)
+        for targets, f_, fc_ in zip(perms, f, fc):
+            pds = Dataset(ds.samples, sa={'targets': targets})
+            assert_array_almost_equal(f_, OneWayAnova()(pds).samples[0])
+            assert_array_almost_equal(fc_, CompoundOneWayAnova()(pds).samples)
+        # single precision data far from zero
+        f32 = compute_fscores((ds.samples + 1000).astype(np.float32),
+                              ds.targets)[0]
+        assert_array_almost_equal(f32 / OneWayAnova()(ds).samples, 1,
+                                  decimal=2)
+        if externals.exists('scipy'):
+            fs = f_oneway(*[ds.samples[ds.targets == l] for l in ds.UT])[0]
+            assert_array_almost_equal(compute_fscores(ds.samples,
+                                                      ds.targets)[0][0], fs)
+
 def suite():
     """Create the suite"""
     return unittest.makeSuite(StatsTests)
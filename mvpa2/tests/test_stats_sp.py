@@ -16,7 +16,8 @@ from mvpa2.tests.test_stats import *
 
 from scipy import signal
 from mvpa2.clfs.stats import match_distribution, rv_semifrozen
-from mvpa2.misc.stats import chisquare
+from mvpa2.misc.stats import chisquare, DSMatrix, condensed_dsm, \
+     squareform_dsm, rankdata_rows, compare_dsms
 from mvpa2.misc.attrmap import AttributeMap
 from mvpa2.datasets.base import dataset_wizard
 from mvpa2.generators.permutation import AttributePermutator
@@ -404,6 +405,106 @@ class StatsTestsScipy(unittest.TestCase):
         assert_true(ftest.samples[0,0] > ftest.samples[0,1])
 
 
+    @sweepargs(metric=('euclidean', 'spearman', 'pearson', 'confusion'))
+    def test_dsmatrix(self, metric):
+        samples = np.round(np.random.normal(size=(12, 6)))
+        samples[4] = samples[7]
+        # reference computed pair by pair
+        ref = np.zeros((len(samples), len(samples)))
+        for i, x in enumerate(samples):
+            for j, y in enumerate(samples):
+                if metric == 'euclidean':
+                    ref[i, j] = np.linalg.norm(x - y)
+                elif metric == 'spearman':
+                    ref[i, j] = 1 - scipy.stats.spearmanr(x, y)[0]
+                elif metric == 'pearson':
+                    ref[i, j] = np.corrcoef(x, y)[0, 1]
+                else:
+                    ref[i, j] = 1 - int(np.all(x == y))
+        dsm = DSMatrix(samples, metric)
+        assert_array_almost_equal(dsm.full_matrix, ref)
+        assert_array_almost_equal(dsm.get_vector_form(),
+                                  ref[np.triu_indices(len(samples))])
+        assert_array_almost_equal(dsm.get_condensed_form(),
+                                  ref[np.triu_indices(len(samples), 1)])
+        # blocking doesn't matter
+        assert_array_almost_equal(condensed_dsm(samples, metric, block_size=5),
+                                  dsm.get_condensed_form())
+        assert_array_equal(squareform_dsm(dsm.get_condensed_form(),
+                                          dsm.full_matrix[0, 0]),
+                           dsm.full_matrix)
+        # plain arrays, no np.matrix
+        for form in (dsm.full_matrix, dsm.get_triangle()):
+            assert_equal(type(form), np.ndarray)
+        assert_equal(dsm.get_vector_form().shape,
+                     (len(samples) * (len(samples) + 1) / 2,))
+
+        # comparison of DSMs of datasets works for all metrics
+        from mvpa2.measures.ds import DSMMeasure
+        ds = Dataset(samples + np.random.normal(size=samples.shape))
+        vec = ref[np.triu_indices(len(samples))]
+        vec_ds = DSMatrix(ds.samples, metric).get_vector_form()
+        for output_metric, target in (
+            ('spearman', 1 - scipy.stats.spearmanr(vec, vec_ds)[0]),
+            ('pearson', np.corrcoef(vec, vec_ds)[0, 1])):
+            assert_almost_equal(
+                DSMMeasure(dsm, metric, output_metric)(ds), target)
+
+    def test_compare_dsms(self):
+        dsms = np.round(np.random.normal(size=(5, 20)))
+        targets = np.random.normal(size=(2, 20))
+        assert_array_equal(rankdata_rows(dsms),
+                           [scipy.stats.rankdata(d) for d in dsms])
+        rho = compare_dsms(dsms, targets)
+        assert_equal(rho.shape, (5, 2))
+        for i, d in enumerate(dsms):
+            for j, t in enumerate(targets):
+                assert_almost_equal(rho[i, j], scipy.stats.spearmanr(d, t)[0])
+        assert_array_almost_equal(compare_dsms(dsms, metric='pearson'),
+                                  np.corrcoef(dsms))
+        assert_raises(ValueError, compare_dsms, dsms, metric='kendall')
+
+    @sweepargs(dset_metric=('pearson', 'spearman', 'euclidean'))
+    def test_rsm_measure(self, dset_metric):
+        from mvpa2.measures.rsm import RSMMeasure
+        nsubjs, nsamples = 4, 8
+        # common structure plus subject specific noise
+        common = np.random.normal(size=(nsamples, 6))
+        ds = Dataset(np.vstack(
+            [common + np.random.normal(size=common.shape)
+             for i in xrange(nsubjs)]))
+        for k in (0, 1):
+            # reference: vectorized lower triangles of full matrices
+            dsm_all = []
+            for i in xrange(nsubjs):
+                samples = ds.samples[i * nsamples:(i + 1) * nsamples]
+                if dset_metric == 'pearson':
+                    full = np.corrcoef(samples)
+                else:
+                    full = np.zeros((nsamples, nsamples))
+                    for r, x in enumerate(samples):
+                        for c, y in enumerate(samples):
+                            if dset_metric == 'spearman':
+                                full[r, c] = 1 - scipy.stats.spearmanr(x, y)[0]
+                            else:
+                                full[r, c] = np.linalg.norm(x - y)
+                dsm_all.append(full[np.tri(nsamples, k=-k, dtype=bool)])
+            dsm_all = np.vstack(dsm_all)
+            assert_equal(dsm_all.shape[1],
+                         nsamples * (nsamples + 1) / 2 - k * nsamples)
+
+            rsm = RSMMeasure(dset_metric, nsubjs, compare_ave=False, k=k)(ds)
+            corr = np.corrcoef(dsm_all)
+            assert_array_almost_equal(
+                rsm.samples[:, 0], corr[np.tri(nsubjs, k=-1, dtype=bool)])
+
+            rsm = RSMMeasure(dset_metric, nsubjs, compare_ave=True, k=k)(ds)
+            assert_equal(rsm.shape, (nsubjs, 1))
+            for i in xrange(nsubjs):
+                others = np.sum(dsm_all, axis=0) - dsm_all[i]
+                assert_almost_equal(rsm.samples[i, 0],
+                                    np.corrcoef(others, dsm_all[i])[0, 1])
+
     def test_binomdist_ppf(self):
         """Test if binomial distribution works ok
 
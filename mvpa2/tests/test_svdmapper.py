@@ -99,6 +99,30 @@ class SVDMapperTests(unittest.TestCase):
         self.assertEqual(data_r.shape, (98,40))
 
 
+    @reseed_rng()
+    def test_svd_engines(self):
+        # few strong components on top of weak noise
+        data = np.dot(np.random.normal(size=(30, 4)) * [10, 8, 6, 4],
+                      np.random.normal(size=(4, 80))) \
+               + 0.01 * np.random.normal(size=(30, 80))
+        ref = SVDMapper()
+        ref.train(data)
+        for svd in ('scipy', 'randomized', 'gram'):
+            pm = SVDMapper(svd=svd)
+            pm.train(data)
+            # 'gram' is only accurate relative to the largest value
+            self.assertTrue(np.allclose(pm.sv, ref.sv, atol=1e-6 * ref.sv[0]))
+            # components are only defined up to the sign, and only the
+            # strong ones are well separated
+            self.assertTrue(np.allclose(np.abs(pm.forward(data)[:, :4]),
+                                        np.abs(ref.forward(data)[:, :4])))
+        # only the leading components
+        pm = SVDMapper(svd='randomized', svd_rank=3)
+        pm.train(data)
+        self.assertEqual(pm.proj.shape, (80, 3))
+        self.assertEqual(pm.forward(data).shape, (30, 3))
+        self.assertTrue(np.allclose(pm.sv, ref.sv[:3]))
+
 
 def suite():
     return unittest.makeSuite(SVDMapperTests)
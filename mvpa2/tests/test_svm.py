@@ -182,6 +182,63 @@ class SVMTests(unittest.TestCase):
         a[0,0] = 322           # the value which would overflow
         self.assertTrue(np.isfinite(clf._get_default_c(a)))
 
+    @reseed_rng()
+    def test_libsvm_dense_predict(self):
+        if not externals.exists('libsvm'):
+            raise SkipTest
+        from mvpa2.clfs.libsvmc import _svm
+        for ds, svm_impl in ((datasets['uni2small'], 'C_SVC'),
+                             (datasets['uni4small'], 'C_SVC'),
+                             (datasets['sin_modulated'], 'EPSILON_SVR')):
+            clf = libsvm.SVM(svm_impl=svm_impl, probability=1)
+            clf.train(ds)
+            model = clf.model
+            src = ds.samples
+            # bulk conversion produces the same problem as the row-wise one
+            labels = clf._attrmap.to_numeric(ds.targets).tolist()
+            prob = _svm.SVMProblem(labels, list(src))
+            prob_dense = _svm.SVMProblem(labels, src)
+            assert_equal(prob.maxlen, prob_dense.maxlen)
+            for p in (prob, prob_dense):
+                assert_equal(_svm.svmc.svm_problem_l_get(p.prob), len(ds))
+                y = _svm.svmc.svm_problem_y_get(p.prob)
+                assert_array_equal(
+                    [_svm.svmc.double_getitem(y, i) for i in xrange(len(ds))],
+                    labels)
+                # node values per row, up to and including the terminator
+                assert_array_equal(
+                    _svm.svmc.svm_node_matrix2numpy_array(
+                        _svm.svmc.svm_problem_x_get(p.prob),
+                        len(ds), ds.nfeatures + 1),
+                    np.hstack((src, np.zeros((len(ds), 1)))))
+            # node indices are not exposed, so train on both problems
+            # and require identical models
+            param = _svm.SVMParameter(
+                svm_type=getattr(_svm.svmc, svm_impl),
+                kernel_type=_svm.svmc.LINEAR)
+            models = [_svm.SVMModel(p, param) for p in (prob, prob_dense)]
+            preds = [m.predict_dense(src, values=True) for m in models]
+            assert_array_equal(preds[0][0], preds[1][0])
+            assert_array_equal(preds[0][1], preds[1][1])
+            # batched prediction matches per-sample prediction
+            predictions, values = model.predict_dense(src, values=True)
+            assert_array_equal(predictions, [model.predict(p) for p in src])
+            assert_array_almost_equal(
+                values, [model.predict_values_raw(p) for p in src])
+            if svm_impl == 'C_SVC':
+                pred_probs = model.predict_probability_dense(src)
+                for (pred, probs), p in zip(pred_probs, src):
+                    pred_, probs_ = model.predict_probability(p)
+                    assert_equal(pred, pred_)
+                    assert_equal(sorted(probs.keys()), sorted(probs_.keys()))
+                    for k in probs:
+                        assert_almost_equal(probs[k], probs_[k])
+            else:
+                assert_raises(TypeError, model.predict_probability_dense, src)
+            # wrong input gets refused
+            assert_raises(ValueError, _svm.svmc.svm_predict_dense,
+                          model.model, src, np.empty(len(src) + 1), None)
+
 def suite():
     return unittest.makeSuite(SVMTests)
 
@@ -12,7 +12,7 @@ from mvpa2.testing import *
 from mvpa2.testing.datasets import datasets
 skip_if_no_external('pywt')
 
-from mvpa2.base import externals
+from mvpa2.base import externals, cfg
 
 import unittest
 from mvpa2.support.copy import deepcopy
@@ -123,6 +123,73 @@ class WaveletMappersTests(unittest.TestCase):
             self.assertRaises(NotImplementedError, wdm.reverse, d3d_wd)
 
 
+    def test_wp_per_channel(self):
+        """Compare to wavelet packets of each channel separately
+        """
+        # odd number of timepoints to exercise the padding
+        data = np.random.normal(size=(3, 23, 2))
+        if externals.exists('pywt dwt axis'):
+            # transform along an axis as well as channel by channel
+            axis_support = ('yes', 'no')
+        else:
+            axis_support = ('no',)
+        cfgid = 'have pywt dwt axis'
+        old_axis_support = cfg.get('externals', cfgid)
+        try:
+            for support in axis_support:
+                cfg.set('externals', cfgid, support)
+                for dim, dd in ((1, data), (2, data.swapaxes(1, 2)),
+                                (1, data[:, :, 0])):
+                    self._test_wp_per_channel(dd, dim)
+        finally:
+            cfg.set('externals', cfgid, old_axis_support)
+
+
+    def _test_wp_per_channel(self, data, dim):
+        import pywt
+        wavelet, mode = 'sym2', 'per'
+        ntimepoints = data.shape[dim]
+        # timepoints along the last axis
+        channels = np.rollaxis(data, dim, data.ndim)
+
+        # single level
+        wdm = WaveletPacketMapper(level=2, wavelet=wavelet, mode=mode,
+                                  dim=dim)
+        wp = wdm.forward(data)
+        # nodes and their coefficients along the last axes
+        wp_ = np.rollaxis(np.rollaxis(wp, dim, wp.ndim), dim, wp.ndim)
+        self.assertEqual(wp_.shape[:-2], channels.shape[:-1])
+        for index in np.ndindex(*channels.shape[:-1]):
+            WP = pywt.WaveletPacket(channels[index], wavelet=wavelet,
+                                    mode=mode, maxlevel=2)
+            nodes = WP.get_level(2)
+            assert_array_almost_equal(wp_[index],
+                                      [node.data for node in nodes])
+        if externals.exists('pywt wp reconstruct'):
+            rec = wdm.reverse(wp)
+            self.assertEqual(rec.shape, data.shape)
+            rec_ = np.rollaxis(rec, dim, rec.ndim)
+            for index in np.ndindex(*channels.shape[:-1]):
+                WP = pywt.WaveletPacket(data=None, wavelet=wavelet,
+                                        mode=mode, maxlevel=2)
+                for node, node_data in zip(nodes, wp_[index]):
+                    WP[node.path] = node_data
+                assert_array_almost_equal(
+                    rec_[index], WP.reconstruct(True)[:ntimepoints])
+
+        # all levels
+        wdm = WaveletPacketMapper(wavelet=wavelet, mode=mode, dim=dim)
+        wp = wdm.forward(data)
+        wp_ = np.rollaxis(wp, dim, wp.ndim)
+        for index in np.ndindex(*channels.shape[:-1]):
+            WP = pywt.WaveletPacket(channels[index], wavelet=wavelet,
+                                    mode=mode)
+            coeffs = [node.data for level in xrange(WP.maxlevel)
+                                for node in WP.get_level(level + 1)]
+            assert_array_almost_equal(wp_[index], np.hstack(coeffs))
+        assert_equal(len(wdm.levels_lengths), WP.maxlevel)
+
+
     ##REF: Name was automagically refactored
     def _test_compare_to_old(self):
         """Good just to compare if I didn't screw up anything... treat
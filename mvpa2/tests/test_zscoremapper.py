@@ -185,3 +185,38 @@ def test_zscore():
 
     assert_array_almost_equal(np.std(ds, axis=0)/np.array(stds),
                               np.std(dsz, axis=0))
+
+
+def test_zscore_grouped():
+    # interleaved and permuted chunks, estimation on a subset of samples
+    chunks = np.array([2, 0, 1] * 6 + [3] * 4)
+    targets = np.arange(len(chunks)) % 4
+    for dtype in ('float64', 'float32'):
+        samples = np.random.normal(size=(len(chunks), 5)).astype(dtype)
+        ds = dataset_wizard(samples.copy(), targets=targets, chunks=chunks)
+        zm = ZScoreMapper(param_est=('targets', [0, 1, 2]))
+        zm.train(ds)
+        zds = zm.forward(ds)
+        # no upcasting of floating point data
+        assert_equal(zds.samples.dtype, np.dtype(dtype))
+        assert_array_equal(ds.samples, samples)
+        for c in np.unique(chunks):
+            est = samples[(chunks == c) & (targets < 3)].astype('float64')
+            assert_array_almost_equal(
+                zds.samples[chunks == c],
+                (samples[chunks == c] - est.mean(axis=0)) / est.std(axis=0),
+                decimal=5)
+
+    # public in-place mode
+    zm = ZScoreMapper(inplace=True)
+    ok_(zm.inplace)
+    ok_('inplace=True' in repr(zm))
+    zm.train(ds)
+    zds = zm.forward(ds)
+    ok_(zds.samples is ds.samples)
+    # contiguous chunks are z-scored in the views of the samples
+    ds = dataset_wizard(samples.copy(), targets=targets,
+                        chunks=np.repeat([3, 1], len(chunks) // 2))
+    zds = ZScoreMapper(inplace=True, auto_train=True)(ds)
+    ok_(zds.samples is ds.samples)
+    assert_array_almost_equal(zds.samples.mean(axis=0), 0, decimal=5)
@@ -45,6 +45,37 @@ for arg in ('--with-libsvm', '--with-system-libsvm'):
     # assure since default is 'auto' wouldn't fail if it is N/A
     bind_libsvm = 'system'
 
+# OpenMP might be disabled explicitly
+with_openmp = not sys.argv.count('--no-openmp')
+if not with_openmp:
+    sys.argv.remove('--no-openmp')
+
+def has_openmp():
+    """Check either C compiler supports OpenMP (GCC-style flags only)"""
+    import tempfile, shutil
+    from distutils.ccompiler import new_compiler
+    from distutils.sysconfig import customize_compiler
+    from distutils.errors import CompileError, LinkError
+    if os.name != 'posix':
+        return False
+    tmpdir = tempfile.mkdtemp()
+    try:
+        src = os.path.join(tmpdir, 'test_openmp.c')
+        open(src, 'w').write('#include <omp.h>\n'
+                             'int main(void) { return omp_get_max_threads() < 1; }\n')
+        cc = new_compiler()
+        customize_compiler(cc)
+        try:
+            objs = cc.compile([src], output_dir=tmpdir,
+                              extra_postargs=['-fopenmp'])
+            cc.link_executable(objs, os.path.join(tmpdir, 'test_openmp'),
+                               extra_postargs=['-fopenmp'])
+        except (CompileError, LinkError):
+            return False
+        return True
+    finally:
+        shutil.rmtree(tmpdir)
+
 # when no libsvm bindings are requested explicitly
 if sys.argv.count('--no-libsvm'):
     # clean argv if necessary (or distutils will complain)
@@ -88,7 +119,13 @@ libsvmc_ext = Extension(
     libraries    = libsvmc_libraries,
     language     = 'c++',
     extra_link_args = extra_link_args,
-    swig_opts    = ['-I' + d for d in libsvmc_include_dirs])
+    # -threads: release the GIL while libsvm is training/predicting
+    swig_opts    = ['-threads'] + ['-I' + d for d in libsvmc_include_dirs])
+
+# SMLR could use multiple threads to process samples
+smlrc_extra_args = []
+if with_openmp and has_openmp():
+    smlrc_extra_args = ['-fopenmp']
 
 smlrc_ext = Extension(
     'mvpa2.clfs.libsmlrc.smlrc',
@@ -96,7 +133,8 @@ smlrc_ext = Extension(
     #library_dirs = library_dirs,
     libraries = ['m'],
     # extra_compile_args = ['-O0'],
-    extra_link_args = extra_link_args,
+    extra_compile_args = smlrc_extra_args,
+    extra_link_args = extra_link_args + smlrc_extra_args,
     language = 'c')
 
 ext_modules = [smlrc_ext]